@@ -42,11 +42,23 @@ setup(
         "test": [
             "plone.app.testing",
             "unittest2",
-        ]
+            "ZEO",
+        ],
+        "numpy": [
+            "numpy",
+        ],
     },
     entry_points="""
       # -*- Entry points: -*-
       [z3c.autoinclude.plugin]
       target = plone
+      [zopectl.command]
+      import_patients = senaite.patient.scripts.import_patients:main
+      export_patients = senaite.patient.scripts.export_patients:main
+      find_duplicate_patients = senaite.patient.scripts.find_duplicate_patients:main
+      merge_patients = senaite.patient.scripts.merge_patients:main
+      propagate_patient_changes = senaite.patient.scripts.propagate_patient_changes:main
+      reindex_catalog = senaite.patient.scripts.reindex_catalog:main
+      rebuild_indexes = senaite.patient.scripts.rebuild_indexes:main
       """,
 )
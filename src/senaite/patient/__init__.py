@@ -62,6 +62,11 @@ def initialize(context):
     """Initializer called when used as a Zope 2 product."""
     logger.info("*** Initializing SENAITE PATIENT Customization package ***")
 
+    from senaite.patient import instrumentation
+    if instrumentation.ENABLED:
+        logger.info("*** Instrumentation of hot paths enabled ***")
+        instrumentation.patch_catalog()
+
     # Set add permissions
     for typename in DEFAULT_TYPES:
         permid = "Add" + typename
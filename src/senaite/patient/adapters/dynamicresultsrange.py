@@ -24,6 +24,7 @@ from bika.lims.adapters.dynamicresultsrange import DynamicResultsRange
 from bika.lims.interfaces import IDynamicResultsRange
 from senaite.core.api import dtime
 from senaite.patient.api import get_birth_date
+from senaite.patient.instrumentation import instrument
 from zope.interface import implementer
 from plone.memoize.instance import memoize
 
@@ -49,6 +50,7 @@ class PatientDynamicResultsRange(DynamicResultsRange):
         # convert to ansi to avoid TZ issues
         return dtime.to_ansi(dob)
 
+    @instrument("PatientDynamicResultsRange.match")
     def match(self, dynamic_range):
         # Check first for fields that do not require additional logic first
         is_match = super(PatientDynamicResultsRange, self).match(dynamic_range)
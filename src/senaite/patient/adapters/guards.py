@@ -18,9 +18,9 @@
 # Copyright 2020-2024 by it's authors.
 # Some rights reserved, see README and LICENSE.
 
-from bika.lims import api
 from bika.lims.interfaces import IGuardAdapter
 from senaite.patient import check_installed
+from senaite.patient.settings import get_settings
 from zope.interface import implements
 
 
@@ -46,7 +46,7 @@ class SampleGuardAdapter(object):
         temp_mrn = self.context.isMedicalRecordTemporary()
         if temp_mrn:
             # Check whether users can verify samples with a temporary MRN
-            if not api.get_registry_record("senaite.patient.verify_temp_mrn"):
+            if not get_settings().verify_temp_mrn:
                 return False
 
         return True
@@ -56,7 +56,7 @@ class SampleGuardAdapter(object):
         """
         temp_mrn = self.context.isMedicalRecordTemporary()
         if temp_mrn:
-            if not api.get_registry_record("senaite.patient.publish_temp_mrn"):
+            if not get_settings().publish_temp_mrn:
                 return False
 
         return True
@@ -27,8 +27,15 @@ from senaite.app.listing.interfaces import IListingViewAdapter
 from senaite.app.listing.utils import add_column
 from senaite.app.listing.utils import add_review_state
 from senaite.patient import check_installed
+from senaite.patient import logger
 from senaite.patient import messageFactory as _
 from senaite.patient.api import get_patient_by_mrn
+from senaite.patient.api import get_patient_by_uid
+from senaite.patient.api import get_patients_by_mrns
+from senaite.patient.api import get_patients_by_uids
+from senaite.patient.api import normalize_mrn
+from senaite.patient.instrumentation import instrument
+from senaite.patient.settings import get_settings
 from zope.component import adapts
 from zope.component import getMultiAdapter
 from zope.interface import implements
@@ -48,6 +55,11 @@ ADD_STATUSES = [{
 },
 ]
 
+# Listing attribute where the patients of the current page are kept
+PAGE_PATIENTS = "_senaite_patient_page_patients"
+
+_marker = object()
+
 # Columns to add
 ADD_COLUMNS = [
     ("Patient", {
@@ -94,9 +106,10 @@ class SamplesListingAdapter(object):
         id when the Patient assigned to the sample has a temporary Medical
         Record Number (MRN)
         """
-        return api.get_registry_record("senaite.patient.show_icon_temp_mrn")
+        return get_settings().show_icon_temp_mrn
 
     @check_installed(None)
+    @instrument("SamplesListingAdapter.folder_item")
     def folder_item(self, obj, item, index):
         if self.show_icon_temp_mrn and obj.isMedicalRecordTemporary:
             # Add an icon after the sample ID
@@ -114,8 +127,12 @@ class SamplesListingAdapter(object):
         item["MRN"] = sample_patient_mrn
         item["Patient"] = sample_patient_fullname
 
-        # get the patient object
-        patient = self.get_patient_by_mrn(sample_patient_mrn)
+        # get the patient object, samples that were not linked yet are
+        # resolved by their MRN
+        mrn = None
+        if not obj.isMedicalRecordTemporary:
+            mrn = sample_patient_mrn
+        patient = self.get_patient(obj.getPatientUID, mrn)
 
         if not patient:
             return
@@ -143,13 +160,71 @@ class SamplesListingAdapter(object):
             item["after"]["Patient"] = self.icon_tag("info", **icon_args)
 
     @viewcache
-    def get_patient_by_mrn(self, mrn):
-        if not mrn:
+    def get_patient(self, uid, mrn=None):
+        """Returns the patient with the given UID or, if no UID is given, the
+        patient with the given MRN
+        """
+        if not uid and not mrn:
             return None
         if self.is_patient_context():
             return self.context
+        key = uid or normalize_mrn(mrn)
+        patients = getattr(self.listing, PAGE_PATIENTS, None)
+        if patients is not None and key in patients:
+            return patients.get(key)
+        if uid:
+            return get_patient_by_uid(uid)
         return get_patient_by_mrn(mrn)
 
+    def prefetch_patients(self, brains):
+        """Resolves the patients of the sample brains of the page with a
+        single catalog search for the linked patient UIDs and another one for
+        the MRNs of the samples not linked yet, instead of one search per
+        row. The patients are kept in the listing, because the adapter is
+        instantiated for every row
+        """
+        uids = set()
+        mrns = set()
+        for brain in brains:
+            uid = brain.getPatientUID
+            if uid:
+                uids.add(uid)
+            elif not brain.isMedicalRecordTemporary:
+                mrn = brain.getMedicalRecordNumberValue
+                if mrn:
+                    mrns.add(normalize_mrn(mrn))
+        patients = dict.fromkeys(uids | mrns)
+        patients.update(get_patients_by_uids(uids))
+        patients.update(get_patients_by_mrns(mrns))
+        setattr(self.listing, PAGE_PATIENTS, patients)
+
+    def capture_page_brains(self):
+        """Hooks into the listing, so the patients of the brains the listing
+        fetches for the current page are prefetched, without searching again.
+
+        The listing has no public hook with the brains of the page, so its
+        `_fetch_brains` is wrapped. If it is gone, the patients are resolved
+        row by row as before
+        """
+        listing = self.listing
+        if self.is_patient_context():
+            return
+        if getattr(listing, PAGE_PATIENTS, _marker) is not _marker:
+            return
+        fetch_brains = getattr(listing, "_fetch_brains", None)
+        if not callable(fetch_brains):
+            logger.warn("Listing {} has no _fetch_brains, the patients of "
+                        "the page are not prefetched".format(repr(listing)))
+            return
+        setattr(listing, PAGE_PATIENTS, None)
+
+        def _fetch_brains(*args, **kwargs):
+            brains = fetch_brains(*args, **kwargs)
+            self.prefetch_patients(brains)
+            return brains
+
+        listing._fetch_brains = _fetch_brains
+
     @check_installed(None)
     def before_render(self):
         # Additional columns
@@ -177,6 +252,9 @@ class SamplesListingAdapter(object):
                 status.update({"columns": self.listing.columns.keys()})
             add_review_state(self.listing, status, after=after, before=before)
 
+        # prefetch the patients of the page the listing renders
+        self.capture_page_brains()
+
     def is_patient_context(self):
         """Check if the current context is a patient
         """
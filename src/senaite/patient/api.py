@@ -18,17 +18,46 @@
 # Copyright 2020-2024 by it's authors.
 # Some rights reserved, see README and LICENSE.
 
+import heapq
+import os
 import re
+from datetime import date
 from datetime import datetime
+from operator import itemgetter
 
+from Acquisition import aq_base
+from BTrees.IIBTree import IIBucket
+from BTrees.IIBTree import IISet
+from BTrees.IIBTree import intersection
+from BTrees.IIBTree import union
 from bika.lims import api
 from bika.lims import deprecated
 from dateutil.relativedelta import relativedelta
+from Products.CMFCore.indexing import processQueue
 from senaite.core.api import dtime
+from senaite.patient import logger
+from senaite.patient.cache import MRNCache
+from senaite.patient.config import MRN_CACHE_SIZE
 from senaite.patient.config import PATIENT_CATALOG
+from senaite.patient.config import SAMPLE_PATIENT_UID
+from senaite.patient.instrumentation import instrument
+from senaite.patient.mrnregistry import get_mrn_registry
 from senaite.patient.permissions import AddPatient
+from senaite.patient.phonetic import NAME_PREFIXES
+from senaite.patient.phonetic import get_name_similarity
+from senaite.patient.phonetic import get_trigrams
+from senaite.patient.phonetic import get_words
+from senaite.patient.phonetic import metaphone
+from senaite.patient.settings import get_settings
+from six import integer_types
 from six import string_types
 
+try:
+    import numpy
+except ImportError:
+    # fall back to pure-python calculation of ages
+    numpy = None
+
 CLIENT_TYPE = "Client"
 PATIENT_TYPE = "Patient"
 CLIENT_VIEW_ID = "patients"
@@ -48,14 +77,33 @@ YMD_REGEX = r'^((?P<y>(\d+))y){0,1}\s*' \
             r'((?P<m>(\d+))m){0,1}\s*' \
             r'((?P<d>(\d+))d){0,1}\s*'
 
+YMD_PATTERN = re.compile(YMD_REGEX)
+
 _marker = object()
 
+# Process-wide cache of normalized MRN -> (patient UID, inactive flag)
+mrn_cache = MRNCache(maxsize=MRN_CACHE_SIZE)
+
+# Identifiers setting and the identifier type names map built from it
+_identifier_type_names = (None, {})
+
+# Value of the TZ environment variable and the OS timezone it resolves to
+_os_timezone = (None, None)
+
+# Name indexes and the weight of their matches when ranking candidates
+NAME_INDEXES = (
+    ("patient_name_trigrams", 1),
+    ("patient_name_phonetic", 3),
+)
+
+# Number of candidates per requested result that are scored by similarity
+NAME_CANDIDATES_FACTOR = 5
+
 
 def is_patient_required():
     """Checks if the patient is required
     """
-    required = api.get_registry_record(
-        "senaite.patient.require_patient")
+    required = get_settings().require_patient
     if not required:
         return False
     return True
@@ -64,8 +112,7 @@ def is_patient_required():
 def get_patient_name_entry_mode():
     """Returns the entry mode for patient name
     """
-    entry_mode = api.get_registry_record(
-        "senaite.patient.patient_entry_mode")
+    entry_mode = get_settings().patient_entry_mode
     if not entry_mode:
         # Default to firstname + fullname
         entry_mode = "parts"
@@ -75,66 +122,345 @@ def get_patient_name_entry_mode():
 def get_patient_address_format():
     """Returns the address format
     """
-    address_format = api.get_registry_record(
-        "senaite.patient.address_format")
+    address_format = get_settings().address_format
     return address_format
 
 
 def is_gender_visible():
     """Checks whether the gender is visible
     """
-    key = "senaite.patient.gender_visible"
-    return api.get_registry_record(key, default=True)
+    return get_settings().gender_visible
 
 
 def is_future_birthdate_allowed():
     """Returns whether the introduction of a birth date in future is allowed
     """
-    key = "senaite.patient.future_birthdate"
-    return api.get_registry_record(key, default=False)
+    return get_settings().future_birthdate
 
 
 def is_age_supported():
     """Returns whether the introduction of age is supported
     """
-    key = "senaite.patient.age_supported"
-    return api.get_registry_record(key, default=True)
+    return get_settings().age_supported
 
 
 def is_age_in_years():
     """Returns whether the months and days should be omitted when displaying
     the age of a patient when is greater than one year
     """
-    key = "senaite.patient.age_years"
-    return api.get_registry_record(key, default=True)
+    return get_settings().age_years
+
+
+def is_patient_propagation_enabled():
+    """Returns whether the changes of the patient demographics are propagated
+    to the open samples of the patient
+    """
+    return get_settings().propagate_patient_changes
+
 
+def normalize_mrn(mrn):
+    """Returns the Medical Record Number as it is stored in the catalog
 
+    :param mrn: Medical record number
+    :returns: UTF-8 encoded MRN without leading and trailing whitespaces
+    """
+    return api.safe_unicode(mrn).strip().encode("utf8")
+
+
+@instrument("api.get_patient_by_mrn")
 def get_patient_by_mrn(mrn, full_object=True, include_inactive=False):
     """Get a patient by Medical Record Number
 
+    Active patients take precedence over inactive patients with the same MRN
+
     :param mrn: Unique medical record number
     :param full_object: If true, return objects instead of catalog brains
     :param include_inactive: Also find inactive patients
     :returns: Patient or None
+    :raises ValueError: if more than one patient is found
     """
+    mrn = normalize_mrn(mrn)
+    patient = None
+    if full_object:
+        patient = get_cached_patient_by_mrn(mrn)
+        if patient is None:
+            patient = get_registered_patient_by_mrn(mrn)
+        if patient is not None:
+            if include_inactive or api.is_active(patient):
+                return patient
+
+    # skip the search if no patient has this MRN or if the inactive patient
+    # found is the only one with this MRN
+    total = get_mrn_count(mrn)
+    if total == 0 or (patient is not None and total == 1):
+        return None
+
     query = {
         "portal_type": "Patient",
-        "patient_mrn": api.safe_unicode(mrn).encode("utf8"),
-        "is_active": True,
+        "patient_mrn": mrn,
     }
-    # Remove active index
-    if include_inactive:
-        query.pop("is_active", None)
     results = patient_search(query)
+    active = filter(api.is_active, results)
+    if not include_inactive:
+        results = active
     count = len(results)
     if count == 0:
         return None
     elif count > 1:
         raise ValueError(
             "Found {} Patients for MRN {}".format(count, mrn))
+
+    # remember the patient, regardless of its status, unless other patients
+    # share the same MRN
+    brain = results[0]
+    if total == 1:
+        mrn_cache.set(mrn, (api.get_uid(brain), not api.is_active(brain)))
+
     if full_object is False:
-        return results[0]
-    return api.get_object(results[0])
+        return brain
+    return api.get_object(brain)
+
+
+def get_patients_by_mrns(mrns, full_object=True, include_inactive=False):
+    """Get the patients for multiple Medical Record Numbers with a single
+    catalog search
+
+    Active patients take precedence over inactive patients with the same MRN
+
+    :param mrns: List of medical record numbers
+    :param full_object: If true, return objects instead of catalog brains
+    :param include_inactive: Also find inactive patients
+    :returns: dict of normalized MRN -> Patient for the patients found
+    """
+    mrns = set(map(normalize_mrn, filter(None, mrns)))
+    if not mrns:
+        return {}
+
+    query = {
+        "portal_type": "Patient",
+        "patient_mrn": list(mrns),
+    }
+    found = {}
+    for brain in patient_search(query):
+        mrn = normalize_mrn(brain.mrn or "")
+        found.setdefault(mrn, []).append(brain)
+
+    patients = {}
+    for mrn, brains in found.items():
+        active = filter(api.is_active, brains)
+        if len(brains) == 1:
+            # remember the patient, regardless of its status
+            brain = brains[0]
+            mrn_cache.set(mrn, (api.get_uid(brain), not api.is_active(brain)))
+        if not include_inactive:
+            brains = active
+        if not brains:
+            continue
+        brain = (active or brains)[0]
+        patients[mrn] = api.get_object(brain) if full_object else brain
+    return patients
+
+
+def get_patient_by_uid(uid, include_inactive=False):
+    """Get a patient by UID
+
+    :param uid: UID of the patient
+    :param include_inactive: Also return inactive patients
+    :returns: Patient or None
+    """
+    if not api.is_uid(uid):
+        return None
+    patient = api.get_object_by_uid(uid, default=None)
+    if patient is None or api.get_portal_type(patient) != "Patient":
+        return None
+
+    # Preserve the permission checks done by the catalog search
+    if not api.security.check_permission("View", patient):
+        return None
+
+    if not include_inactive and not api.is_active(patient):
+        return None
+    return patient
+
+
+def get_patients_by_uids(uids, full_object=True, include_inactive=False):
+    """Get the patients for multiple UIDs with a single catalog search
+
+    :param uids: List of patient UIDs
+    :param full_object: If true, return objects instead of catalog brains
+    :param include_inactive: Also find inactive patients
+    :returns: dict of UID -> Patient for the patients found
+    """
+    uids = set(filter(api.is_uid, uids))
+    if not uids:
+        return {}
+
+    query = {
+        "portal_type": "Patient",
+        "UID": list(uids),
+    }
+    patients = {}
+    for brain in patient_search(query):
+        if not include_inactive and not api.is_active(brain):
+            continue
+        uid = api.get_uid(brain)
+        patients[uid] = api.get_object(brain) if full_object else brain
+    return patients
+
+
+def get_sample_patient_uid(sample, default=None):
+    """Returns the UID of the patient linked to the sample
+
+    :param sample: sample object
+    :param default: value to return if the sample was never linked
+    :returns: UID, None if the sample has no patient or the default value
+    """
+    return getattr(aq_base(sample), SAMPLE_PATIENT_UID, default)
+
+
+def get_sample_patient(sample, include_inactive=True):
+    """Returns the patient linked to the sample
+
+    Samples that were not linked yet are resolved by their MRN
+
+    :param sample: sample object
+    :param include_inactive: Also return inactive patients
+    :returns: Patient or None
+    """
+    uid = get_sample_patient_uid(sample, default=_marker)
+    if uid is _marker:
+        mrn = sample.getMedicalRecordNumberValue()
+        if not mrn:
+            return None
+        return get_patient_by_mrn(mrn, include_inactive=include_inactive)
+    return get_patient_by_uid(uid, include_inactive=include_inactive)
+
+
+def link_sample_patient(sample, patient):
+    """Stores the UID of the patient in the sample. The sample is not
+    reindexed
+
+    :param sample: sample object
+    :param patient: patient object or None to unlink the sample
+    :returns: True if the linked patient changed
+    """
+    uid = api.get_uid(patient) if patient else None
+    if get_sample_patient_uid(sample, default=_marker) == uid:
+        return False
+    setattr(sample, SAMPLE_PATIENT_UID, uid)
+    return True
+
+
+def get_cached_patient_by_mrn(mrn):
+    """Returns the patient for the given MRN from the lookup cache
+
+    The cached entry is checked against the patient object, so entries that
+    became stale, e.g. because of an aborted transaction or changes done in
+    another ZEO client, are discarded.
+
+    :param mrn: Normalized medical record number
+    :returns: Patient or None if the MRN is not cached or stale
+    """
+    entry = mrn_cache.get(mrn)
+    if entry is None:
+        return None
+
+    uid, inactive = entry
+    patient = api.get_object_by_uid(uid, default=None)
+    if patient is None or patient.getMRN() != mrn:
+        mrn_cache.pop(mrn)
+        return None
+
+    # Preserve the permission checks done by the catalog search
+    if not api.security.check_permission("View", patient):
+        return None
+
+    active = api.is_active(patient)
+    if active == inactive:
+        # refresh the inactive flag
+        mrn_cache.set(mrn, (uid, not active))
+    return patient
+
+
+def get_registered_patient_by_mrn(mrn):
+    """Returns the patient for the given MRN from the MRN registry
+
+    :param mrn: Normalized medical record number
+    :returns: Patient or None if the MRN is not registered
+    """
+    registry = get_mrn_registry()
+    if registry is None:
+        return None
+
+    uid = registry.get(mrn)
+    if uid is None:
+        return None
+
+    patient = api.get_object_by_uid(uid, default=None)
+    if patient is None or patient.getMRN() != mrn:
+        return None
+
+    # Preserve the permission checks done by the catalog search
+    if not api.security.check_permission("View", patient):
+        return None
+
+    mrn_cache.set(mrn, (uid, not api.is_active(patient)))
+    return patient
+
+
+def register_mrn(patient):
+    """Registers the MRN of the patient in the MRN registry
+
+    :param patient: Patient object
+    :returns: False if the MRN is registered for another patient already
+    """
+    registry = get_mrn_registry()
+    if registry is None:
+        return True
+    mrn = normalize_mrn(patient.getMRN())
+    uid = api.get_uid(patient)
+    registered = registry.register(mrn, uid)
+    if not registered:
+        # discard the entry if the MRN of the registered patient changed
+        other_uid = registry.get(mrn)
+        other = api.get_object_by_uid(other_uid, default=None)
+        if other is None or normalize_mrn(other.getMRN()) != mrn:
+            registry.unregister(other_uid)
+            registered = registry.register(mrn, uid)
+    if not registered:
+        logger.warn("MRN '{}' of {} is registered for another patient"
+                    .format(mrn, api.get_path(patient)))
+    return registered
+
+
+def unregister_mrn(patient):
+    """Removes the MRN of the patient from the MRN registry
+
+    :param patient: Patient object
+    """
+    registry = get_mrn_registry()
+    if registry is None:
+        return
+    registry.unregister(api.get_uid(patient))
+
+
+def invalidate_mrn_cache(patient, *mrns):
+    """Removes the entries of the given patient from the MRN lookup cache
+
+    :param patient: Patient object
+    :param mrns: Additional medical record numbers to remove from the cache
+    """
+    mrn_cache.pop_uid(api.get_uid(patient))
+    for mrn in filter(None, mrns):
+        mrn_cache.pop(normalize_mrn(mrn))
+
+
+def get_mrn_cache_stats():
+    """Returns the hits, misses and size of the MRN lookup cache
+
+    :returns: dict with the cache statistics
+    """
+    return mrn_cache.stats()
 
 
 def get_patient_catalog():
@@ -143,6 +469,7 @@ def get_patient_catalog():
     return api.get_tool(PATIENT_CATALOG)
 
 
+@instrument("api.patient_search")
 def patient_search(query):
     """Search the patient catalog
     """
@@ -150,6 +477,93 @@ def patient_search(query):
     return catalog(query)
 
 
+def search_patients_by_name(text, limit=20, include_inactive=False):
+    """Search patients by name, tolerant to misspellings and accents
+
+    Candidates are the patients sharing name trigrams or phonetic keys with
+    the searched words. They are searched in the catalog first, so only the
+    patients the user is allowed to see are ranked by the number of keys they
+    share. The best candidates are sorted by the similarity of their fullname
+    with the searched text
+
+    :param text: searched name or the beginning of it, e.g. "Jon Smit"
+    :param limit: maximum number of results
+    :param include_inactive: Also find inactive patients
+    :returns: list of (brain, score) tuples, best matches first
+    """
+    words = get_words(text)
+    if not words:
+        return []
+
+    trigrams = set()
+    phonetic_keys = set()
+    for word in words:
+        # do not pad the end, so words are found by their beginning
+        trigrams.update(get_trigrams(word, pad_end=False))
+        key = metaphone(word)
+        if key:
+            phonetic_keys.update([prefix + key for prefix in NAME_PREFIXES])
+    tokens = {
+        "patient_name_trigrams": [t.encode("utf8") for t in trigrams],
+        "patient_name_phonetic": list(phonetic_keys),
+    }
+
+    # visible patients sharing at least one key with the searched words
+    query = {"portal_type": "Patient"}
+    if not include_inactive:
+        query["is_active"] = True
+    allowed = IISet()
+    for index_name, keys in tokens.items():
+        if not keys:
+            continue
+        results = patient_search(dict(query, **{index_name: keys}))
+        allowed = union(allowed, get_result_rids(results))
+
+    if not allowed:
+        return []
+
+    # count the keys shared by each allowed catalog record
+    catalog = get_patient_catalog()
+    counts = IIBucket()
+    for index_name, weight in NAME_INDEXES:
+        index = catalog._catalog.getIndex(index_name)
+        forward = getattr(aq_base(index), "_index", None)
+        if forward is None:
+            continue
+        for token in tokens[index_name]:
+            rids = forward.get(token)
+            if rids is None:
+                continue
+            if isinstance(rids, integer_types):
+                rids = IISet([rids])
+            for rid in intersection(allowed, rids):
+                counts[rid] = counts.get(rid, 0) + weight
+
+    size = limit * NAME_CANDIDATES_FACTOR
+    candidates = heapq.nlargest(size, counts.items(), key=itemgetter(1))
+
+    results = []
+    for rid, _ in candidates:
+        brain = catalog._catalog[rid]
+        score = get_name_similarity(text, brain.getFullname)
+        if score > 0:
+            results.append((brain, score))
+    results.sort(key=itemgetter(1), reverse=True)
+    return results[:limit]
+
+
+def get_result_rids(results):
+    """Returns the record ids of the catalog results as a set
+
+    :param results: catalog search results
+    :returns: IISet of record ids
+    """
+    rids = getattr(results, "_seq", None)
+    if rids is None:
+        rids = [brain.getRID() for brain in results]
+    return IISet(rids)
+
+
 def update_patient(patient, **values):
     """Create a new patient
     """
@@ -256,7 +670,7 @@ def get_years_months_days(period):
     raw_ymd = period.lower().strip()
 
     # extract the years, months and days
-    matches = re.search(YMD_REGEX, raw_ymd)
+    matches = YMD_PATTERN.search(raw_ymd)
     values = [matches.group(v) for v in "ymd"]
 
     # if all values are None, assume the ymd format was not valid
@@ -302,7 +716,7 @@ def get_birth_date(period, on_date=None, default=_marker):
     if not on_date:
         on_date = datetime.now()
         # apply system's current time zone
-        tz = dtime.get_os_timezone()
+        tz = get_os_timezone()
         on_date = dtime.to_zone(on_date, tz)
 
     # calculate the date when everything started
@@ -320,6 +734,140 @@ def get_age_ymd(birth_date, on_date=None):
         return None
 
 
+def get_ages(birth_dates, on_dates=None):
+    """Returns the ages in days and ymd format for multiple birth dates
+
+    The ages are calculated with NumPy if available and the results are the
+    same as those from `get_age_ymd`, but with a precision of days
+
+    :param birth_dates: list of date-like birth dates
+    :param on_dates: list of date-like values, one for each birth date, the
+        ages have to be calculated at. A single date-like value is used for
+        all birth dates. Current date if None
+    :returns: list of (days, ymd) tuples. Items are None for birth dates that
+        are missing or later than the date the age has to be calculated at
+    """
+    tz = get_os_timezone()
+    birth_dates = map(lambda value: to_naive_date(value, tz), birth_dates)
+
+    if on_dates is None or not is_list_like(on_dates):
+        on_date = to_naive_date(on_dates or datetime.now(), tz)
+        on_dates = [on_date] * len(birth_dates)
+    else:
+        on_dates = map(lambda value: to_naive_date(value, tz), on_dates)
+
+    if len(birth_dates) != len(on_dates):
+        raise ValueError("The number of birth dates and dates does not match")
+
+    if numpy is None:
+        return get_ages_python(birth_dates, on_dates)
+    return get_ages_numpy(birth_dates, on_dates)
+
+
+def get_ages_python(birth_dates, on_dates):
+    """Returns the ages in days and ymd format for the naive dates passed-in
+    """
+    ages = []
+    for dob, on_date in zip(birth_dates, on_dates):
+        if not all([dob, on_date]) or on_date < dob:
+            ages.append(None)
+            continue
+        delta = relativedelta(on_date, dob)
+        ymd = format_ymd(delta.years, delta.months, delta.days)
+        ages.append(((on_date - dob).days, ymd))
+    return ages
+
+
+def get_ages_numpy(birth_dates, on_dates):
+    """Returns the ages in days and ymd format for the naive dates passed-in,
+    calculated with NumPy's datetime64 arithmetic
+    """
+    dobs = numpy.array(birth_dates, dtype="datetime64[D]")
+    ons = numpy.array(on_dates, dtype="datetime64[D]")
+
+    # replace missing and invalid dates to keep the arithmetic clean
+    invalid = numpy.isnat(dobs) | numpy.isnat(ons) | (ons < dobs)
+    epoch = numpy.datetime64("1970-01-01", "D")
+    dobs = numpy.where(invalid, epoch, dobs)
+    ons = numpy.where(invalid, epoch, ons)
+
+    days = (ons - dobs).astype(int)
+
+    # elapsed months, with the day of birth clipped to the end of the month
+    # as relativedelta does
+    dob_months = dobs.astype("datetime64[M]")
+    dob_days = (dobs - dob_months.astype("datetime64[D]")).astype(int)
+    months = (ons.astype("datetime64[M]") - dob_months).astype(int)
+
+    def add_months(months):
+        month = dob_months + months.astype("timedelta64[M]")
+        first = month.astype("datetime64[D]")
+        last = (month + 1).astype("datetime64[D]") - 1
+        offset = numpy.minimum(dob_days, (last - first).astype(int))
+        return first + offset.astype("timedelta64[D]")
+
+    months = numpy.where(add_months(months) > ons, months - 1, months)
+    remainders = (ons - add_months(months)).astype(int)
+
+    ages = []
+    values = zip(invalid.tolist(), days.tolist(), (months // 12).tolist(),
+                 (months % 12).tolist(), remainders.tolist())
+    for is_invalid, total, years, months, rem in values:
+        if is_invalid:
+            ages.append(None)
+            continue
+        ages.append((total, format_ymd(years, months, rem)))
+    return ages
+
+
+def format_ymd(years, months, days):
+    """Returns the years, months and days in ymd format, with zeros omitted
+    """
+    ymd = filter(lambda it: it[0], zip((years, months, days), "ymd"))
+    ymd = " ".join(map(lambda it: "{}{}".format(*it), ymd))
+    return ymd or "0d"
+
+
+def to_naive_date(value, tz=None):
+    """Returns the date-like value as a date in the given timezone
+
+    :param value: date-like value
+    :param tz: timezone to convert timezone-aware values to
+    :returns: date or None
+    """
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return value
+    dt = dtime.to_dt(value)
+    if not dt:
+        return None
+    if tz and not dtime.is_timezone_naive(dt):
+        dt = dtime.to_zone(dt, tz)
+    return dt.date()
+
+
+def is_list_like(value):
+    """Returns whether the value is a list, tuple or array
+    """
+    if isinstance(value, (list, tuple)):
+        return True
+    return numpy is not None and isinstance(value, numpy.ndarray)
+
+
+def get_os_timezone():
+    """Returns the current timezone of the system
+
+    The timezone is looked up once and remembered as long as the TZ
+    environment variable does not change
+    """
+    global _os_timezone
+    tz_env = os.environ.get("TZ")
+    cached_env, tz = _os_timezone
+    if tz is None or cached_env != tz_env:
+        tz = dtime.get_os_timezone()
+        _os_timezone = (tz_env, tz)
+    return tz
+
+
 @deprecated("Use senaite.core.api.dtime.get_relative_delta instead")
 def get_relative_delta(from_date, to_date=None):
     """Returns the relative delta between two dates. If to_date is None,
@@ -348,16 +896,26 @@ def to_identifier_type_name(identifier_type_key):
     :param identifier_type_key: The keyword of the identifier
     :returns: Indetifiert type name
     """
-    records = api.get_registry_record("senaite.patient.identifiers")
+    names = get_identifier_type_names()
+    return names.get(identifier_type_key, identifier_type_key)
 
-    name = identifier_type_key
-    for record in records:
-        key = record.get("key")
-        if key != identifier_type_key:
-            continue
-        name = record.get("value")
 
-    return name
+def get_identifier_type_names():
+    """Returns a mapping of identifier type key -> human readable name
+
+    The mapping is built once and rebuilt only when the identifiers of the
+    patient settings change
+
+    :returns: dict of identifier type key -> name
+    """
+    global _identifier_type_names
+    identifiers = get_settings().identifiers or ()
+    cached_identifiers, names = _identifier_type_names
+    if cached_identifiers is not identifiers:
+        names = dict(map(lambda i: (i.get("key"), i.get("value")),
+                         identifiers))
+        _identifier_type_names = (identifiers, names)
+    return names
 
 
 def allow_patients_in_clients(allow=True):
@@ -396,9 +954,8 @@ def allow_patients_in_clients(allow=True):
 def is_patient_allowed_in_client():
     """Returns wether patients can be created in clients or not
     """
-    allowed = api.get_registry_record(
-        "senaite.patient.allow_patients_in_clients", False)
-    return allowed
+    allowed = get_settings().allow_patients_in_clients
+    return bool(allowed)
 
 
 def get_patient_folder():
@@ -427,9 +984,83 @@ def is_mrn_unique(mrn):
     :param mrn: The MRN to check its uniqueness
     :returns: True if no patient with this mrn exist
     """
-    query = {
-        "portal_type": "Patient",
-        "patient_mrn": api.safe_unicode(mrn).encode("utf8"),
-    }
-    brains = api.search(query, PATIENT_CATALOG)
-    return len(brains) == 0
+    return not mrn_exists(mrn)
+
+
+def mrn_exists(mrn):
+    """Checks whether a patient with the given mrn exists, regardless of its
+    status
+
+    :param mrn: The MRN to look for
+    :returns: True if at least one patient with this mrn exists
+    """
+    return get_mrn_count(mrn) > 0
+
+
+def get_mrn_count(mrn):
+    """Returns the number of patients with the given mrn, regardless of their
+    status
+
+    The forward mapping of the `patient_mrn` index is probed directly, so no
+    catalog query is needed. Falls back to a catalog query if the index has no
+    forward mapping
+
+    :param mrn: The MRN to look for
+    :returns: number of patients with this mrn
+    """
+    mrn = api.safe_unicode(mrn).encode("utf8")
+
+    # index the pending objects first, as the catalog does before searching
+    processQueue()
+
+    catalog = get_patient_catalog()
+    index = catalog._catalog.getIndex("patient_mrn")
+    count = count_index_value(index, mrn)
+    if count is None:
+        query = {
+            "portal_type": "Patient",
+            "patient_mrn": mrn,
+        }
+        count = len(api.search(query, PATIENT_CATALOG))
+    return count
+
+
+def count_index_value(index, value):
+    """Returns the number of documents indexed with the value in a FieldIndex
+
+    :param index: FieldIndex or any other index with a forward mapping of
+        value -> document id(s)
+    :param value: the indexed value to look for
+    :returns: number of documents or None if the index has no forward mapping
+    """
+    forward = getattr(aq_base(index), "_index", None)
+    if forward is None:
+        return None
+    rids = forward.get(value)
+    if rids is None:
+        return 0
+    if isinstance(rids, integer_types):
+        # single document ids are stored as integers
+        return 1
+    return len(rids)
+
+
+def update_metadata_columns(catalog, obj, columns):
+    """Updates the given metadata columns of the catalog record of the object,
+    without computing the values of the other columns
+
+    :param catalog: catalog the object is indexed in
+    :param obj: catalogued object
+    :param columns: names of the metadata columns to update
+    """
+    _catalog = catalog._catalog
+    rid = _catalog.uids.get(api.get_path(obj))
+    if rid is None:
+        return
+    record = list(_catalog.data[rid])
+    for column in columns:
+        value = getattr(obj, column, None)
+        if callable(value):
+            value = value()
+        record[_catalog.schema[column]] = value
+    _catalog.data[rid] = tuple(record)
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+"""Per-call overhead of the `check_installed` decorator
+
+Run it from the buildout directory:
+
+    bin/zopepy -m senaite.patient.benchmarks.check_installed [number]
+"""
+
+import sys
+import timeit
+
+from senaite.patient import check_installed
+from senaite.patient import is_installed
+from senaite.patient.interfaces import ISenaitePatientLayer
+from zope.globalrequest import clearRequest
+from zope.globalrequest import setRequest
+from zope.interface import alsoProvides
+from zope.publisher.browser import TestRequest
+
+NUMBER = 1000000
+
+
+def getter():
+    return None
+
+
+def run(number=NUMBER):
+    """Returns a list of (name, nanoseconds per call) tuples
+    """
+    request = TestRequest()
+    alsoProvides(request, ISenaitePatientLayer)
+    setRequest(request)
+
+    candidates = [
+        ("undecorated getter", getter),
+        ("is_installed", is_installed),
+        ("decorated getter", check_installed(None)(getter)),
+    ]
+
+    results = []
+    try:
+        for name, func in candidates:
+            seconds = min(timeit.repeat(func, number=number, repeat=3))
+            results.append((name, seconds * 1e9 / number))
+    finally:
+        clearRequest()
+    return results
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else NUMBER
+    for name, ns in run(number):
+        print("{:<30} {:>8.1f} ns/call".format(name, ns))
+
+
+if __name__ == "__main__":
+    main()
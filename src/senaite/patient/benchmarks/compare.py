@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+"""Compares the results of two runs of the end-to-end benchmark
+
+Run it from the buildout directory:
+
+    bin/zopepy -m senaite.patient.benchmarks.compare base.json new.json \\
+        [--threshold 0.2]
+
+The median timings are compared. The exit status is 1 if any of the timings
+is slower than the base by more than the threshold.
+"""
+
+import argparse
+import json
+import sys
+
+
+def load_results(path):
+    """Returns the results of the benchmark run stored in the JSON file
+    """
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def compare(base, new, threshold=0.2):
+    """Returns a list of (name, base ms, new ms, ratio, regression) tuples of
+    the timings of both runs
+    """
+    rows = []
+    for name, stats in new.items():
+        if name not in base:
+            continue
+        before = base[name]["median_ms"]
+        after = stats["median_ms"]
+        ratio = after / before if before else 1.0
+        rows.append((name, before, after, ratio, ratio > 1 + threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base", help="JSON results of the base run")
+    parser.add_argument("new", help="JSON results of the new run")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2,
+        help="Slowdown ratio reported as regression. Default: 0.2")
+    options = parser.parse_args()
+
+    rows = compare(load_results(options.base), load_results(options.new),
+                   threshold=options.threshold)
+    for name, before, after, ratio, regression in rows:
+        print("{:<50} {:>10.3f} {:>10.3f} ms {:>7.2f}x {}".format(
+            name, before, after, ratio, "REGRESSION" if regression else ""))
+
+    if any([row[-1] for row in rows]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
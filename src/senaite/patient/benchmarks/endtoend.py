@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+"""End-to-end benchmark of the hot paths of senaite.patient
+
+Synthetic patients and samples are created on the functional test layer of
+`senaite.patient.tests.base` and the calls are timed one by one. Run it from
+the buildout directory:
+
+    bin/test -s senaite.patient --tests-pattern=^benchmarks$ \\
+        --test-file-pattern=^endtoend$
+
+The size of the data set is set with environment variables:
+
+    BENCHMARK_PATIENTS  number of patients. Default: 500
+    BENCHMARK_SAMPLES   number of samples. Default: 100
+    BENCHMARK_NUMBER    number of calls of the fast functions. Default: 500
+    BENCHMARK_VIEWS     number of listing renderings. Default: 20
+    BENCHMARK_OUTPUT    JSON file with the results. Default: benchmark.json
+
+The results of two runs are compared with:
+
+    bin/zopepy -m senaite.patient.benchmarks.compare base.json new.json
+"""
+
+import csv
+import json
+import os
+import platform
+import random
+from collections import OrderedDict
+from datetime import datetime
+from timeit import default_timer
+
+import transaction
+import unittest2 as unittest
+from bika.lims import api
+from bika.lims.browser.analysisrequest import AnalysisRequestsView
+from openpyxl import Workbook
+from openpyxl.writer.excel import save_virtual_workbook
+from plone.app.testing import setRoles
+from plone.app.testing import TEST_USER_ID
+from plone.namedfile.file import NamedBlobFile
+from senaite.patient.adapters.dynamicresultsrange import \
+    PatientDynamicResultsRange
+from senaite.patient.api import get_patient_by_mrn
+from senaite.patient.api import is_mrn_unique
+from senaite.patient.benchmarks.generator import create_sample
+from senaite.patient.benchmarks.generator import make_mrn
+from senaite.patient.benchmarks.generator import make_patient_data
+from senaite.patient.interfaces import ISenaitePatientLayer
+from senaite.patient.tests.base import SimpleTestCase
+from six import StringIO
+from zope.component import getMultiAdapter
+from zope.interface import alsoProvides
+
+# Dynamic results ranges of the Hematocrit by sex and age
+DYNAMIC_RANGES = """Keyword,Sex,MinAge,MaxAge,min,max
+Ht,,,1d,45,67
+Ht,,2d,7d,42,66
+Ht,,8d,14d,39,63
+Ht,,15d,1m,31,55
+Ht,,1m,2m,28,42
+Ht,,3m,6m,29,41
+Ht,,6m,2y,33,49
+Ht,,2y,6y,34,40
+Ht,,6y,12y,35,45
+Ht,m,12y,18y,36,51
+Ht,f,12y,18y,33,51
+Ht,m,18y,,39,54
+Ht,f,18y,,36,48"""
+
+# Number of samples created between commits
+COMMIT_SIZE = 50
+
+
+def get_env(name, default):
+    """Returns the integer value of the environment variable
+    """
+    return int(os.environ.get(name, default))
+
+
+def to_excel(data):
+    """Returns a blob file with the CSV data as an Excel sheet
+    """
+    workbook = Workbook()
+    sheet = workbook.get_active_sheet()
+    for row in csv.reader(StringIO(data)):
+        sheet.append(row)
+    return NamedBlobFile(save_virtual_workbook(workbook))
+
+
+def measure(func, number):
+    """Calls the function `number` times and returns the seconds per call
+    """
+    timings = []
+    for num in range(number):
+        start = default_timer()
+        func()
+        timings.append(default_timer() - start)
+    return timings
+
+
+def summarize(timings):
+    """Returns a dict with the statistics of the timings in milliseconds
+    """
+    timings = sorted(timings)
+    count = len(timings)
+
+    def percentile(value):
+        return timings[min(int(count * value), count - 1)] * 1000
+
+    return OrderedDict([
+        ("calls", count),
+        ("total_s", sum(timings)),
+        ("mean_ms", sum(timings) * 1000 / count),
+        ("min_ms", timings[0] * 1000),
+        ("median_ms", percentile(0.5)),
+        ("p95_ms", percentile(0.95)),
+        ("max_ms", timings[-1] * 1000),
+    ])
+
+
+class EndToEndBenchmark(SimpleTestCase):
+    """Times the hot paths against a synthetic data set
+    """
+
+    def setUp(self):
+        super(EndToEndBenchmark, self).setUp()
+        setRoles(self.portal, TEST_USER_ID, ["LabManager", "Manager"])
+        alsoProvides(self.request, ISenaitePatientLayer)
+        self.rand = random.Random(0)
+        self.results = OrderedDict()
+        self.patients = []
+        self.samples = []
+        self.setup_objects()
+
+    def setup_objects(self):
+        """Creates the client, sample type, service and dynamic specification
+        the samples are created with
+        """
+        portal = self.portal
+        setup = api.get_senaite_setup()
+        bika_setup = api.get_bika_setup()
+        self.client = api.create(portal.clients, "Client",
+                                 Name="Benchmark Hospital", ClientID="BH")
+        self.contact = api.create(self.client, "Contact", Firstname="Rita",
+                                  Lastname="Mohale")
+        self.sampletype = api.create(setup.sampletypes, "SampleType",
+                                     title="EDTA", Prefix="EDTA")
+        labcontact = api.create(bika_setup.bika_labcontacts, "LabContact",
+                                Firstname="Lab", Lastname="Manager")
+        department = api.create(setup.departments, "Department",
+                                title="Hematology", Manager=labcontact)
+        category = api.create(setup.analysiscategories, "AnalysisCategory",
+                              title="Hematology", Department=department)
+        self.service = api.create(bika_setup.bika_analysisservices,
+                                  "AnalysisService", title="Hematocrit",
+                                  Keyword="Ht", Category=category)
+        self.specification = api.create(
+            bika_setup.bika_analysisspecs, "AnalysisSpec", title="Blood",
+            SampleType=self.sampletype,
+            ResultsRange=[{"keyword": "Ht", "min": "35", "max": "60"}])
+        self.dynamicspec = api.create(setup.dynamicanalysisspecs,
+                                      "DynamicAnalysisSpec")
+        self.dynamicspec.specs_file = to_excel(DYNAMIC_RANGES)
+        self.specification.setDynamicAnalysisSpec(self.dynamicspec)
+        transaction.commit()
+
+    def record(self, name, timings):
+        """Stores the statistics of the timings under the given name
+        """
+        self.results[name] = summarize(timings)
+
+    def test_benchmark(self):
+        patients = get_env("BENCHMARK_PATIENTS", 500)
+        samples = get_env("BENCHMARK_SAMPLES", 100)
+        number = get_env("BENCHMARK_NUMBER", 500)
+        views = get_env("BENCHMARK_VIEWS", 20)
+
+        self.bench_create_patients(patients)
+        self.bench_get_patient_by_mrn(number)
+        self.bench_is_mrn_unique(number)
+        self.bench_create_samples(samples)
+        self.bench_patient_folder(views)
+        self.bench_samples_listing(views)
+        self.bench_dynamic_results_range(number)
+
+        self.write_results({
+            "patients": patients,
+            "samples": samples,
+            "number": number,
+            "views": views,
+        })
+
+    def bench_create_patients(self, size):
+        container = self.portal.patients
+        timings = []
+        for num in range(size):
+            data = make_patient_data(num, self.rand)
+            start = default_timer()
+            api.create(container, "Patient", **data)
+            timings.append(default_timer() - start)
+            self.patients.append(data)
+        transaction.commit()
+        self.record("create patient", timings)
+
+    def bench_get_patient_by_mrn(self, number):
+        mrns = [patient["mrn"] for patient in self.patients]
+        missing = make_mrn(len(mrns) + 1, prefix="X")
+
+        def existing():
+            get_patient_by_mrn(self.rand.choice(mrns))
+
+        self.record("get_patient_by_mrn (existing)",
+                    measure(existing, number))
+        self.record("get_patient_by_mrn (missing)",
+                    measure(lambda: get_patient_by_mrn(missing), number))
+
+    def bench_is_mrn_unique(self, number):
+        mrns = [patient["mrn"] for patient in self.patients]
+        missing = make_mrn(len(mrns) + 1, prefix="X")
+
+        def existing():
+            is_mrn_unique(self.rand.choice(mrns))
+
+        self.record("is_mrn_unique (existing)", measure(existing, number))
+        self.record("is_mrn_unique (missing)",
+                    measure(lambda: is_mrn_unique(missing), number))
+
+    def bench_create_samples(self, size):
+        """Creates half of the samples for existing patients and the other
+        half for new patients, that are created on sample creation
+        """
+        existing = []
+        new = []
+        offset = len(self.patients)
+        for num in range(size):
+            if num % 2 == 0 and self.patients:
+                patient = self.rand.choice(self.patients)
+                timings = existing
+            else:
+                patient = make_patient_data(offset + num, self.rand)
+                timings = new
+            start = default_timer()
+            sample = create_sample(self.client, self.contact,
+                                   self.sampletype, [self.service], patient,
+                                   request=self.request,
+                                   Specification=self.specification)
+            timings.append(default_timer() - start)
+            self.samples.append(sample)
+            if (num + 1) % COMMIT_SIZE == 0:
+                transaction.commit()
+        transaction.commit()
+        if existing:
+            self.record("create sample (existing patient)", existing)
+        if new:
+            self.record("create sample (new patient)", new)
+
+    def render_listing(self, view):
+        """Renders the listing items of the view, as done on ajax requests
+        """
+        view.update()
+        view.before_render()
+        return view.folderitems()
+
+    def bench_patient_folder(self, number):
+        patients = self.portal.patients
+
+        def render():
+            view = getMultiAdapter((patients, self.request), name="view")
+            self.render_listing(view)
+
+        self.record("PatientFolderView", measure(render, number))
+
+    def bench_samples_listing(self, number):
+        samples = self.portal.analysisrequests
+
+        def render():
+            view = AnalysisRequestsView(samples, self.request)
+            self.render_listing(view)
+
+        self.record("samples listing", measure(render, number))
+
+    def bench_dynamic_results_range(self, number):
+        """Matches the dynamic ranges for the analyses of the samples. A new
+        adapter is created for every analysis, as done when the results range
+        of an analysis is calculated
+        """
+        analyses = [sample["Ht"] for sample in self.samples]
+        if not analyses:
+            return
+        specs = self.dynamicspec.get_by_keyword()["Ht"]
+
+        def match():
+            adapter = PatientDynamicResultsRange(self.rand.choice(analyses))
+            for spec in specs:
+                adapter.match(spec)
+
+        self.record("PatientDynamicResultsRange.match ({} ranges)"
+                    .format(len(specs)), measure(match, number))
+
+    def write_results(self, params):
+        """Writes the results as JSON and prints a summary
+        """
+        data = OrderedDict([
+            ("date", datetime.now().isoformat()),
+            ("python", platform.python_version()),
+            ("params", params),
+            ("results", self.results),
+        ])
+        path = os.environ.get("BENCHMARK_OUTPUT", "benchmark.json")
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+        print("")
+        for name, stats in self.results.items():
+            print("{:<50} {:>10.3f} ms (p95 {:.3f} ms, {} calls)".format(
+                name, stats["median_ms"], stats["p95_ms"], stats["calls"]))
+        print("Results written to {}".format(path))
+
+
+def test_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(EndToEndBenchmark))
+    return suite
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+"""Generator of synthetic patients and samples for benchmarks
+
+The values are generated from a seeded random number generator, so two runs
+with the same seed create the same data.
+"""
+
+import random
+import string
+from datetime import datetime
+from datetime import timedelta
+
+from bika.lims import api
+from bika.lims.utils.analysisrequest import create_analysisrequest
+from DateTime import DateTime
+
+FIRSTNAMES = (
+    "Aisha", "Ana", "Bruce", "Carlos", "Chen", "Diana", "Emma", "Fatima",
+    "Hiroshi", "Ivan", "Jane", "John", "Kwame", "Laura", "Lucas", "Maria",
+    "Mohammed", "Nadia", "Olga", "Peter", "Priya", "Rita", "Sofia", "Thomas",
+)
+
+LASTNAMES = (
+    "Akande", "Bauer", "Costa", "Dubois", "Fernandez", "Garcia", "Hansen",
+    "Ivanova", "Kim", "Kowalski", "Mohale", "Müller", "Nakamura", "Nguyen",
+    "Okafor", "Patel", "Rossi", "Schmidt", "Silva", "Smith", "Wang", "Wayne",
+)
+
+# Age in years of the oldest patient generated
+MAX_AGE = 95
+
+
+def get_check_digit(digits):
+    """Returns the Luhn check digit of the string of digits
+    """
+    total = 0
+    for pos, digit in enumerate(reversed(digits)):
+        value = int(digit)
+        if pos % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+def make_mrn(num, prefix="H"):
+    """Returns a hospital-like MRN for the given number, with a check digit
+    """
+    digits = "{:07d}".format(num)
+    return "{}{}{}".format(prefix, digits, get_check_digit(digits))
+
+
+def make_identifiers(rand):
+    """Returns a list of identifier records with a national id and, for some
+    patients, a passport number
+    """
+    identifiers = [{
+        "key": "national_id",
+        "value": "".join(rand.choice(string.digits) for i in range(9)),
+    }]
+    if rand.random() < 0.3:
+        letters = "".join(rand.choice(string.ascii_uppercase)
+                          for i in range(2))
+        digits = "".join(rand.choice(string.digits) for i in range(7))
+        identifiers.append({"key": "passport_id", "value": letters + digits})
+    return identifiers
+
+
+def make_birthdate(rand, today=None):
+    """Returns a random birthdate of a patient up to MAX_AGE years old
+    """
+    today = today or datetime.now()
+    days = rand.randint(0, MAX_AGE * 365)
+    birthdate = today - timedelta(days=days)
+    return datetime(birthdate.year, birthdate.month, birthdate.day)
+
+
+def make_patient_data(num, rand):
+    """Returns a dict with the values of a synthetic patient
+    """
+    sex = rand.choice(["f", "m"])
+    return {
+        "mrn": make_mrn(num),
+        "firstname": rand.choice(FIRSTNAMES),
+        "lastname": rand.choice(LASTNAMES),
+        "sex": sex,
+        "gender": sex,
+        "birthdate": make_birthdate(rand),
+        "identifiers": make_identifiers(rand),
+    }
+
+
+def create_patients(container, size, seed=0):
+    """Creates `size` synthetic patients in the container
+
+    :returns: list of the values of the patients created
+    """
+    rand = random.Random(seed)
+    patients = []
+    for num in range(size):
+        data = make_patient_data(num, rand)
+        api.create(container, "Patient", **data)
+        patients.append(data)
+    return patients
+
+
+def get_sample_values(client, contact, sampletype, patient):
+    """Returns the values to create a sample for the patient data
+    """
+    return {
+        "Client": api.get_uid(client),
+        "Contact": api.get_uid(contact),
+        "DateSampled": DateTime().strftime("%Y-%m-%d"),
+        "SampleType": api.get_uid(sampletype),
+        "MedicalRecordNumber": patient["mrn"],
+        "PatientFullName": {
+            "firstname": patient["firstname"],
+            "lastname": patient["lastname"],
+        },
+        "DateOfBirth": patient["birthdate"],
+        "Sex": patient["sex"],
+    }
+
+
+def create_sample(client, contact, sampletype, services, patient,
+                  request=None, **kw):
+    """Creates a sample for the patient data
+
+    :param kw: additional values of the sample, e.g. the Specification
+    """
+    request = request or api.get_request()
+    values = get_sample_values(client, contact, sampletype, patient)
+    values.update(kw)
+    service_uids = map(api.get_uid, services)
+    return create_analysisrequest(client, request, values, service_uids)
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+
+"""MRN existence check: probing the `patient_mrn` index vs. catalog query
+
+A standalone catalog with the indexes used by the former query is filled with
+synthetic patients. Run it from the buildout directory:
+
+    bin/zopepy -m senaite.patient.benchmarks.mrn_index [size] [number]
+"""
+
+import sys
+import timeit
+
+from Products.PluginIndexes.BooleanIndex.BooleanIndex import BooleanIndex
+from Products.PluginIndexes.FieldIndex.FieldIndex import FieldIndex
+from Products.ZCatalog.Catalog import Catalog
+from senaite.patient.api import count_index_value
+
+SIZE = 1000000
+NUMBER = 10000
+
+
+class FakePatient(object):
+    portal_type = "Patient"
+
+    def __init__(self, num):
+        self.patient_mrn = "MRN-{:07d}".format(num)
+        self.is_active = num % 10 != 0
+
+
+def get_catalog(size):
+    """Returns a catalog with `size` patients indexed
+    """
+    catalog = Catalog()
+    catalog.addIndex("portal_type", FieldIndex("portal_type"))
+    catalog.addIndex("patient_mrn", FieldIndex("patient_mrn"))
+    catalog.addIndex("is_active", BooleanIndex("is_active"))
+    for num in range(size):
+        catalog.catalogObject(FakePatient(num), "/patients/P{}".format(num))
+    return catalog
+
+
+def run(size=SIZE, number=NUMBER):
+    """Returns a list of (name, microseconds per call) tuples
+    """
+    catalog = get_catalog(size)
+    index = catalog.getIndex("patient_mrn")
+    existing = "MRN-{:07d}".format(size // 2)
+    missing = "MRN-X"
+
+    def query(mrn):
+        query = {"portal_type": "Patient", "patient_mrn": mrn}
+        return len(catalog.searchResults(query))
+
+    def query_active(mrn):
+        query = {"portal_type": "Patient", "patient_mrn": mrn,
+                 "is_active": True}
+        return len(catalog.searchResults(query))
+
+    candidates = [
+        ("query (existing)", lambda: query(existing)),
+        ("query (missing)", lambda: query(missing)),
+        ("query is_active (existing)", lambda: query_active(existing)),
+        ("index probe (existing)", lambda: count_index_value(index, existing)),
+        ("index probe (missing)", lambda: count_index_value(index, missing)),
+    ]
+
+    results = []
+    for name, func in candidates:
+        seconds = min(timeit.repeat(func, number=number, repeat=3))
+        results.append((name, seconds * 1e6 / number))
+    return results
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else SIZE
+    number = int(sys.argv[2]) if len(sys.argv) > 2 else NUMBER
+    print("{} patients".format(size))
+    for name, us in run(size, number):
+        print("{:<30} {:>10.2f} us/call".format(name, us))
+
+
+if __name__ == "__main__":
+    main()
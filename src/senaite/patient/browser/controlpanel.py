@@ -194,6 +194,15 @@ class IPatientControlPanel(Interface):
         ],
     )
 
+    model.fieldset(
+        "patient_samples",
+        label=_(u"Samples"),
+        description=_(""),
+        fields=[
+            "propagate_patient_changes",
+        ],
+    )
+
     ###
     # Fields
     ###
@@ -389,6 +398,17 @@ class IPatientControlPanel(Interface):
         description=_(u"If selected, patients can be created inside clients.")
     )
 
+    propagate_patient_changes = schema.Bool(
+        title=_(u"Propagate patient changes to samples"),
+        description=_(u"If selected, changes of the name, sex, gender or "
+                      u"birthdate of a patient are applied to the samples of "
+                      u"the patient that are not verified yet. Patients with "
+                      u"many samples are updated in the background with the "
+                      u"'propagate_patient_changes' command"),
+        required=False,
+        default=False,
+    )
+
     @invariant
     def validate_identifiers(data):
         """Checks if the keyword is unique and valid
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+import collections
+
+from bika.lims import api
+from bika.lims.utils import get_link
+from senaite.app.listing.view import ListingView
+from senaite.core.api import dtime
+from senaite.patient import messageFactory as _
+from senaite.patient.api import patient_search
+from senaite.patient.catalog import PATIENT_CATALOG
+from senaite.patient.duplicates import get_duplicates_report
+from senaite.patient.i18n import translate as t
+
+# Titles of the criteria of the duplicates report
+CRITERIA = {
+    "name": _("Name"),
+    "birthdate": _("Birthdate"),
+    "identifiers": _("Identifiers"),
+    "sex": _("Sex"),
+    "email": _("Email"),
+}
+
+
+class DuplicatePatientsView(ListingView):
+    """Lists the candidate duplicate patients of the last report
+
+    The report is created with the `find_duplicate_patients` command
+    """
+
+    def __init__(self, context, request):
+        super(DuplicatePatientsView, self).__init__(context, request)
+
+        self.catalog = PATIENT_CATALOG
+        self.contentFilter = {"portal_type": "Patient"}
+
+        self.icon = "{}/{}".format(
+            self.portal_url, "senaite_theme/icon/patientfolder")
+
+        self.title = _("Duplicate Patients")
+        self.show_select_column = False
+        self.pagesize = 25
+
+        self.columns = collections.OrderedDict((
+            ("score", {
+                "title": _("Score"),
+                "sortable": False}),
+            ("patient", {
+                "title": _("Patient"),
+                "sortable": False}),
+            ("other", {
+                "title": _("Possible Duplicate"),
+                "sortable": False}),
+            ("criteria", {
+                "title": _("Matching Criteria"),
+                "sortable": False}),
+        ))
+
+        self.review_states = [
+            {
+                "id": "default",
+                "title": _("All"),
+                "contentFilter": {},
+                "columns": self.columns.keys(),
+            },
+        ]
+
+    def update(self):
+        """Update hook
+        """
+        super(DuplicatePatientsView, self).update()
+        self.report = get_duplicates_report() or {}
+        self.description = self.get_description()
+
+    def get_description(self):
+        """Returns the description with the date of the report
+        """
+        date = self.report.get("date")
+        if not date:
+            return t(_(
+                "No report available. Run the 'find_duplicate_patients' "
+                "command to search for duplicate patients"))
+        return t(_(
+            "Candidates found on ${date} among ${patients} patients",
+            mapping={
+                "date": dtime.to_localized_time(date, long_format=True),
+                "patients": self.report.get("patients", 0),
+            }))
+
+    def get_brains(self, candidates):
+        """Returns a mapping of UID -> brain of the patients of the
+        candidates the current user is allowed to see
+        """
+        uids = set()
+        for candidate in candidates:
+            uids.update(candidate["uids"])
+        if not uids:
+            return {}
+        brains = patient_search({"portal_type": "Patient", "UID": list(uids)})
+        return dict([(api.get_uid(brain), brain) for brain in brains])
+
+    def get_patient_link(self, brain):
+        """Returns the link to the patient with the MRN, name and birthdate
+        """
+        text = u"{} &ndash; {}".format(
+            api.safe_unicode(brain.mrn or ""),
+            api.safe_unicode(brain.getFullname or ""))
+        birthdate = dtime.to_DT(brain.getBirthdate or None)
+        if birthdate:
+            text = u"{} ({})".format(
+                text, dtime.to_localized_time(birthdate))
+        return get_link(api.get_url(brain), value=text.encode("utf8"))
+
+    def folderitems(self):
+        """Returns the folderitems of the current page of candidates
+
+        Candidates are pairs of patients, so the items are built from the
+        report instead of catalog brains
+        """
+        candidates = self.report.get("candidates") or []
+        self.total = len(candidates)
+        start = self.limit_from
+        end = start + self.pagesize
+        self.show_more = end < self.total
+        candidates = candidates[start:end]
+
+        brains = self.get_brains(candidates)
+        items = []
+        for candidate in candidates:
+            uid, other_uid = candidate["uids"]
+            brain = brains.get(uid)
+            other = brains.get(other_uid)
+            if not brain or not other:
+                continue
+            item = self.make_empty_folderitem(
+                uid="{}-{}".format(uid, other_uid),
+                id="{}-{}".format(api.get_id(brain), api.get_id(other)))
+            item["score"] = "{:.0%}".format(candidate["score"])
+            item["patient"] = brain.mrn
+            item["replace"]["patient"] = self.get_patient_link(brain)
+            item["other"] = other.mrn
+            item["replace"]["other"] = self.get_patient_link(other)
+            item["criteria"] = ", ".join(
+                [t(CRITERIA.get(key, key)) for key in candidate["criteria"]])
+            items.append(item)
+        return items
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+
+from bika.lims import api
+from Products.Five.browser import BrowserView
+from senaite.patient.exporter import FILTERS
+from senaite.patient.exporter import FORMATS
+from senaite.patient.exporter import iter_export
+from zExceptions import BadRequest
+
+
+class PatientExportView(BrowserView):
+    """Streams the patients of the patient folder as CSV or JSONL
+
+    Accepted request parameters:
+
+    - review_state: active (default), inactive, deceased or all
+    - format: csv (default) or jsonl
+    """
+
+    def __call__(self):
+        form = self.request.form
+        review_state = form.get("review_state", "active")
+        # same id as the default review state of the patients listing
+        if review_state == "default":
+            review_state = "active"
+        file_format = form.get("format", "csv")
+        if review_state not in FILTERS:
+            raise BadRequest("Review state not supported")
+        if file_format not in FORMATS:
+            raise BadRequest("Format not supported")
+
+        # same paths as in the patients listing
+        paths = [
+            api.get_path(self.context),
+            api.get_path(api.get_portal().clients),
+        ]
+
+        filename = "patients-{}.{}".format(review_state, file_format)
+        response = self.request.response
+        response.setHeader("Content-Type", FORMATS[file_format])
+        response.setHeader("Content-Disposition",
+                           "attachment; filename={}".format(filename))
+
+        for chunk in iter_export(review_state=review_state,
+                                 file_format=file_format, paths=paths):
+            response.write(chunk)
+        return ""
@@ -19,6 +19,7 @@
 # Some rights reserved, see README and LICENSE.
 
 from bika.lims import api
+from senaite.core.api import dtime
 from senaite.core.browser.samples.view import SamplesView as BaseView
 from senaite.patient import messageFactory as _
 
@@ -39,6 +40,21 @@ class SamplesView(BaseView):
             mapping={"patient_fullname": api.safe_unicode(fullname)}
         )
 
+        # the statistics are stored in the patient, no samples are searched
+        count = self.context.getSampleCount()
+        if count:
+            last_date = self.context.getLastSampleDate()
+            self.description = _(
+                "description_patient_samples_listing",
+                "${sample_count} samples, ${open_sample_count} open, last "
+                "sample on ${last_sample_date}",
+                mapping={
+                    "sample_count": count,
+                    "open_sample_count": self.context.getOpenSampleCount(),
+                    "last_sample_date": dtime.to_localized_time(last_date),
+                }
+            )
+
         mrn = self.context.getMRN()
         if mrn:
             self.contentFilter["medical_record_number"] = [mrn]
@@ -20,16 +20,19 @@
 
 import collections
 from bika.lims import api
-from bika.lims.interfaces import IClient
 from bika.lims.utils import get_email_link
 from bika.lims.utils import get_image
 from bika.lims.utils import get_link
+from plone.memoize.view import memoize
 from senaite.app.listing.view import ListingView
+from senaite.core.api import dtime
 from senaite.patient import messageFactory as _
-from senaite.patient.api import to_identifier_type_name
-from senaite.patient.api import tuplify_identifiers
+from senaite.patient.api import get_identifier_type_names
 from senaite.patient.catalog import PATIENT_CATALOG
+from senaite.patient.config import GENDERS
+from senaite.patient.config import SEXES
 from senaite.patient.i18n import translate as t
+from senaite.patient.instrumentation import instrument
 from senaite.patient.permissions import AddPatient
 
 
@@ -70,6 +73,9 @@ class PatientFolderView(ListingView):
         self.show_select_column = True
         self.pagesize = 25
 
+        # cache of (key, value, css class) -> identifier tag
+        self.identifier_tags = {}
+
         self.columns = collections.OrderedDict((
             ("mrn", {
                 "title": _("Medical Record #"),
@@ -92,6 +98,15 @@ class PatientFolderView(ListingView):
             ("birthdate", {
                 "title": _("Birthdate"),
                 "index": "patient_birthdate"}),
+            ("samples", {
+                "title": _("Samples"),
+                "index": "patient_sample_count"}),
+            ("open_samples", {
+                "title": _("Open Samples"),
+                "index": "patient_open_sample_count"}),
+            ("last_sample", {
+                "title": _("Last Sample"),
+                "index": "patient_last_sample_date"}),
             ("folder", {
                 "title": _("Folder"),
                 "index": "path"}),
@@ -143,43 +158,79 @@ class PatientFolderView(ListingView):
 
           <title>:<id>
 
+        Tags are built once per distinct identifier and request
+
+        :param identifiers: list of (key, value) identifier tuples
         :returns: list of identifier tags
         """
         tags = []
-        records = tuplify_identifiers(identifiers)
-        for k, v in records:
-            title = to_identifier_type_name(k)
-            text = "{}: {}".format(self.to_utf8(title), self.to_utf8(v))
-            tag = "<span class='{}'>{}</span>".format(klass, text)
+        for k, v in identifiers:
+            tag = self.identifier_tags.get((k, v, klass))
+            if tag is None:
+                title = self.identifier_type_names.get(k, k)
+                text = "{}: {}".format(self.to_utf8(title), self.to_utf8(v))
+                tag = "<span class='{}'>{}</span>".format(klass, text)
+                self.identifier_tags[(k, v, klass)] = tag
             tags.append(tag)
         return tags
 
+    @property
+    @memoize
+    def identifier_type_names(self):
+        """Returns a mapping of identifier type key -> name
+        """
+        return get_identifier_type_names()
+
+    @memoize
+    def get_folder_info(self, folder_path):
+        """Returns a tuple of (title, url) of the folder the patients are
+        stored in. The folder is either the global patients folder or a client
+        """
+        folder = self.portal.unrestrictedTraverse(folder_path)
+        title = folder.Title()
+        url = api.get_url(folder)
+        if folder_path.startswith(self.clients_path):
+            url += "/@@patients"
+        return title, url
+
+    @property
+    @memoize
+    def clients_path(self):
+        return "{}/".format(api.get_path(self.portal.clients))
+
+    def get_text(self, value, choices):
+        """Returns the translated text of the value from the choices
+        """
+        return t(dict(choices).get(value))
+
+    @instrument("PatientFolderView.folderitem")
     def folderitem(self, obj, item, index):
-        obj = api.get_object(obj)
+        # Note: The item is rendered from catalog metadata only, so no patient
+        # objects have to be woken up
         url = api.get_url(obj)
 
         # MRN
-        mrn = obj.getMRN()
+        mrn = obj.mrn
         if not mrn:
             item["before"]["mrn"] = get_image("info", width=16)
             mrn = t(_("mrn_not_defined", default="Not defined"))
 
         item["mrn"] = self.to_utf8(mrn)
-        item["replace"]["mrn"] = get_link(url, value=mrn)
+        item["replace"]["mrn"] = get_link(url, value=item["mrn"])
 
         # Patient Identifiers
-        identifiers = obj.getIdentifiers()
+        identifiers = obj.get_identifier_items or []
         item["identifiers"] = "<br>".join(
             self.get_identifier_tags(identifiers))
 
         # Fullname
         fullname_nd = t(_("fullname_not_defined", default="Not defined"))
-        fullname = obj.getFullname() or fullname_nd
+        fullname = obj.getFullname or fullname_nd
         fullname = api.safe_unicode(fullname).encode("utf8")
         item["fullname"] = fullname
 
         # Death dagger
-        if obj.getDeceased():
+        if obj.getDeceased:
             fullname = t(_(
                 "patient_fullname_deceased_html",
                 default="${fullname} <sup>&dagger;</sup>",
@@ -188,33 +239,41 @@ class PatientFolderView(ListingView):
         item["replace"]["fullname"] = get_link(url, value=fullname)
 
         # Email
-        email = obj.getEmail()
+        email = obj.getEmail
         if email:
             item["email"] = email
             item["replace"]["email"] = get_email_link(email, value=email)
 
         # Email Report
-        email_report = obj.getEmailReport()
+        email_report = obj.getEmailReport
         item["email_report"] = _("Yes") if email_report else _("No")
 
         # Sex
-        item["sex"] = obj.getSexText()
+        item["sex"] = self.get_text(obj.getSex or "", SEXES)
 
         # Gender
-        item["gender"] = obj.getGenderText()
+        item["gender"] = self.get_text(obj.getGender or "", GENDERS)
 
         # Birthdate
-        item["birthdate"] = obj.getLocalizedBirthdate()
-        if obj.getEstimatedBirthdate():
+        birthdate = dtime.to_DT(obj.getBirthdate or None)
+        item["birthdate"] = dtime.to_localized_time(birthdate)
+        if obj.getEstimatedBirthdate:
             item["after"]["birthdate"] = get_image(
                 "warning.png", title=t(_("The birthdate is estimated")))
 
+        # Sample statistics
+        item["samples"] = obj.getSampleCount or 0
+        item["open_samples"] = obj.getOpenSampleCount or 0
+        last_sample = dtime.to_DT(obj.getLastSampleDate or None)
+        item["last_sample"] = dtime.to_localized_time(last_sample)
+        if item["samples"]:
+            item["replace"]["samples"] = get_link(
+                "{}/samples".format(url), value=item["samples"])
+
         # Folder
-        parent = api.get_parent(obj)
-        parent_url = api.get_url(parent)
-        if IClient.providedBy(parent):
-            parent_url += "/@@patients"
-        item["folder"] = parent.Title()
-        item["replace"]["folder"] = get_link(parent_url, value=parent.Title())
+        folder_path = obj.getPath().rsplit("/", 1)[0]
+        folder_title, folder_url = self.get_folder_info(folder_path)
+        item["folder"] = folder_title
+        item["replace"]["folder"] = get_link(folder_url, value=folder_title)
 
         return item
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+import json
+
+from plone.protect import CheckAuthenticator
+from Products.Five.browser import BrowserView
+from Products.Five.browser.pagetemplatefile import ViewPageTemplateFile
+from senaite.patient import instrumentation
+from zExceptions import Forbidden
+
+
+class PatientPerformanceView(BrowserView):
+    """Displays and resets the timings of the instrumented hot paths of this
+    process
+
+    Accepted request parameters:
+
+    - format: json to return the statistics as JSON
+    - reset: discard the statistics (POST only)
+    """
+    template = ViewPageTemplateFile("templates/performance.pt")
+
+    def __call__(self):
+        form = self.request.form
+        if form.get("reset"):
+            if self.request.method != "POST":
+                raise Forbidden("Statistics can only be reset with POST")
+            CheckAuthenticator(self.request)
+            instrumentation.reset()
+            url = "{}/@@patient-perf".format(self.context.absolute_url())
+            return self.request.response.redirect(url)
+
+        if form.get("format") == "json":
+            self.request.response.setHeader("Content-Type",
+                                            "application/json")
+            return json.dumps({
+                "enabled": self.is_enabled(),
+                "stats": self.get_stats(),
+            })
+
+        return self.template()
+
+    def is_enabled(self):
+        """Returns whether the instrumentation is enabled
+        """
+        return instrumentation.ENABLED
+
+    def get_env_key(self):
+        """Returns the environment variable that enables the instrumentation
+        """
+        return instrumentation.ENV_KEY
+
+    def get_stats(self):
+        """Returns the statistics of the instrumented functions
+        """
+        return instrumentation.get_stats()
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+import threading
+from collections import OrderedDict
+
+_marker = object()
+
+
+class LRUCache(object):
+    """Thread-safe, bounded cache that discards the least recently used
+    entries first when the maximum size is reached
+    """
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """Returns the value for the given key and flags it as the most
+        recently used, or the default value if the key is not in the cache
+        """
+        with self._lock:
+            value = self._data.pop(key, _marker)
+            if value is _marker:
+                self.misses += 1
+                return default
+            # re-insert the value to flag it as the most recently used
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Stores the value for the given key, discarding the least recently
+        used entries if the maximum size is exceeded
+        """
+        with self._lock:
+            self.pop(key)
+            self._data[key] = value
+            while len(self._data) > self.maxsize:
+                self.discarded(*self._data.popitem(last=False))
+
+    def pop(self, key, default=None):
+        """Removes the key from the cache and returns its value
+        """
+        with self._lock:
+            value = self._data.pop(key, _marker)
+            if value is _marker:
+                return default
+            self.discarded(key, value)
+            return value
+
+    def discarded(self, key, value):
+        """Called after an entry was removed from the cache
+        """
+
+    def items(self):
+        """Returns a list of (key, value) tuples of the cache
+        """
+        with self._lock:
+            return list(self._data.items())
+
+    def clear(self):
+        """Removes all entries from the cache and resets the counters
+        """
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Returns a dict with the size, hits and misses of the cache
+        """
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class MRNCache(LRUCache):
+    """LRU cache of MRN -> (UID, inactive) entries
+
+    A reverse mapping of UID -> MRNs is kept, so the entries of a patient can
+    be discarded without iterating over the whole cache
+    """
+
+    def __init__(self, maxsize=1000):
+        super(MRNCache, self).__init__(maxsize=maxsize)
+        self._mrns = {}
+
+    def set(self, key, value):
+        with self._lock:
+            super(MRNCache, self).set(key, value)
+            self._mrns.setdefault(value[0], set()).add(key)
+
+    def discarded(self, key, value):
+        mrns = self._mrns.get(value[0])
+        if mrns is None:
+            return
+        mrns.discard(key)
+        if not mrns:
+            del self._mrns[value[0]]
+
+    def pop_uid(self, uid):
+        """Removes all entries of the given UID from the cache
+        """
+        with self._lock:
+            for mrn in self._mrns.pop(uid, ()):
+                self._data.pop(mrn, None)
+
+    def clear(self):
+        with self._lock:
+            super(MRNCache, self).clear()
+            self._mrns.clear()
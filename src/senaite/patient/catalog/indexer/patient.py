@@ -20,6 +20,8 @@
 
 from plone.indexer import indexer
 from senaite.patient.interfaces import IPatient
+from senaite.patient.phonetic import get_name_phonetic_keys
+from senaite.patient.phonetic import get_name_trigrams
 
 
 @indexer(IPatient)
@@ -137,3 +139,46 @@ def patient_searchable_mrn(instance):
     ]
     searchable_text_tokens = filter(None, searchable_text_tokens)
     return " ".join(searchable_text_tokens)
+
+
+@indexer(IPatient)
+def patient_name_trigrams(instance):
+    """Index the accent-folded trigrams of the patient names
+    """
+    names = [
+        instance.getFirstname(),
+        instance.getMiddlename(),
+        instance.getLastname(),
+    ]
+    return get_name_trigrams(names)
+
+
+@indexer(IPatient)
+def patient_name_phonetic(instance):
+    """Index the phonetic keys of the patient names
+    """
+    return get_name_phonetic_keys(
+        instance.getFirstname(),
+        instance.getMiddlename(),
+        instance.getLastname())
+
+
+@indexer(IPatient)
+def patient_sample_count(instance):
+    """Index the number of samples
+    """
+    return instance.getSampleCount()
+
+
+@indexer(IPatient)
+def patient_open_sample_count(instance):
+    """Index the number of open samples
+    """
+    return instance.getOpenSampleCount()
+
+
+@indexer(IPatient)
+def patient_last_sample_date(instance):
+    """Index the creation date of the last sample
+    """
+    return instance.getLastSampleDate()
@@ -41,6 +41,13 @@ def medical_record_number(instance):
     return [instance.getMedicalRecordNumberValue() or None]
 
 
+@indexer(IAnalysisRequest)
+def patient_uid(instance):
+    """Returns the UID of the patient linked to the sample
+    """
+    return instance.getPatientUID()
+
+
 @adapter(IAnalysisRequest, ISenaitePatientLayer, ISampleCatalog)
 @implementer(IListingSearchableTextProvider)
 class ListingSearchableTextProvider(object):
@@ -43,11 +43,28 @@ INDEXES = BASE_INDEXES + [
     ("patient_searchable_text", "", "ZCTextIndex"),
     ("patient_searchable_mrn", "", "ZCTextIndex"),
     ("patient_deceased", "", "BooleanIndex"),
+    ("patient_name_trigrams", "", "KeywordIndex"),
+    ("patient_name_phonetic", "", "KeywordIndex"),
+    ("patient_sample_count", "", "FieldIndex"),
+    ("patient_open_sample_count", "", "FieldIndex"),
+    ("patient_last_sample_date", "", "DateIndex"),
 ]
 
 COLUMNS = BASE_COLUMNS + [
     # attribute name
     "mrn",
+    "get_identifier_items",
+    "getFullname",
+    "getEmail",
+    "getEmailReport",
+    "getSex",
+    "getGender",
+    "getBirthdate",
+    "getEstimatedBirthdate",
+    "getDeceased",
+    "getSampleCount",
+    "getOpenSampleCount",
+    "getLastSampleDate",
 ]
 
 TYPES = [
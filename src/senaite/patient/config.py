@@ -31,6 +31,34 @@ DEFAULT_TYPES = ("PatientFolder", "Patient", )
 
 AUTO_ID_MARKER = "-- autogenerated --"
 
+# Maximum number of MRNs kept in the process-wide MRN -> Patient lookup cache
+MRN_CACHE_SIZE = 5000
+
+# Sample attribute where the UID of the linked patient is stored
+SAMPLE_PATIENT_UID = "_senaite_patient_uid"
+
+# Sample attribute where the UID of the patient whose sample statistics
+# include the sample is stored
+SAMPLE_STATS_PATIENT_UID = "_senaite_patient_stats_uid"
+
+# Patient attribute where the statistics of the samples are stored
+PATIENT_SAMPLE_STATS = "_senaite_patient_sample_stats"
+
+# Review states of the samples the patient changes are propagated to
+OPEN_SAMPLE_STATES = (
+    "sample_registered",
+    "scheduled_sampling",
+    "to_be_sampled",
+    "sample_due",
+    "sample_received",
+    "to_be_preserved",
+    "to_be_verified",
+)
+
+# Maximum number of samples updated in the same transaction the patient is
+# changed. The changes of patients with more samples are deferred
+PROPAGATION_MAX_SAMPLES = 100
+
 SEXES = (
     ("m", _(u"sex_male", default=u"Male")),
     ("f", _(u"sex_female", default=u"Female")),
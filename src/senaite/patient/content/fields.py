@@ -61,10 +61,7 @@ class TemporaryIdentifierField(ExtensionField, ObjectField):
     def get_linked_patient(self, instance):
         """Get the linked patient
         """
-        mrn = instance.getMedicalRecordNumberValue()
-        if not mrn:
-            return None
-        return patient_api.get_patient_by_mrn(mrn, include_inactive=True)
+        return patient_api.get_sample_patient(instance, include_inactive=True)
 
 
 class FullnameField(ExtensionField, ObjectField):
@@ -179,7 +176,7 @@ class AgeDateOfBirthField(ExtensionField, ObjectField):
 
         # if naive TZ, use system default's
         if dob and dtime.is_timezone_naive(dob):
-            tz = dtime.get_os_timezone()
+            tz = patient_api.get_os_timezone()
             dob = dtime.to_zone(dob, tz)
 
         # store the tuple or default
@@ -49,6 +49,9 @@ from senaite.patient.config import GENDERS
 from senaite.patient.config import SEXES
 from senaite.patient.i18n import translate
 from senaite.patient.interfaces import IPatient
+from senaite.patient.samplestats import get_last_sample_date
+from senaite.patient.samplestats import get_open_sample_count
+from senaite.patient.samplestats import get_sample_count
 from six import string_types
 from z3c.form.interfaces import NO_VALUE
 from zope import schema
@@ -427,7 +430,7 @@ class IPatientSchema(model.Schema):
             return
 
         # comparison must be tz-aware
-        tz = dtime.get_os_timezone()
+        tz = patient_api.get_os_timezone()
         dob = dtime.to_zone(data.birthdate, tz)
         now = dtime.to_zone(datetime.now(), tz)
         if now < dob:
@@ -495,8 +498,18 @@ class Patient(Container):
         if not patient_api.is_mrn_unique(value):
             raise ValueError("Patient Medical Record Number must be unique")
 
+        # Discard the lookup cache entries for the old and the new MRN
+        patient_api.invalidate_mrn_cache(self, accessor(self), value)
+
+        previous = accessor(self)
         mutator = self.mutator("mrn")
-        return mutator(self, api.safe_unicode(value))
+        mutator(self, api.safe_unicode(value))
+
+        # Keep the MRN registry up-to-date. The MRN might be registered for a
+        # patient that is not indexed yet
+        if not patient_api.register_mrn(self):
+            mutator(self, previous)
+            raise ValueError("Patient Medical Record Number must be unique")
 
     @security.protected(permissions.View)
     def getIdentifiers(self):
@@ -825,3 +838,21 @@ class Patient(Container):
         """
         mutator = self.mutator("estimated_birthdate")
         return mutator(self, value)
+
+    @security.protected(permissions.View)
+    def getSampleCount(self):
+        """Returns the number of samples of the patient
+        """
+        return get_sample_count(self)
+
+    @security.protected(permissions.View)
+    def getOpenSampleCount(self):
+        """Returns the number of samples of the patient not verified yet
+        """
+        return get_open_sample_count(self)
+
+    @security.protected(permissions.View)
+    def getLastSampleDate(self):
+        """Returns the creation date of the last sample of the patient
+        """
+        return get_last_sample_date(self)
@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+"""Detection of duplicate patients
+
+Comparing every pair of patients is not feasible for large catalogs. Instead,
+patients are grouped in blocks by keys that duplicates are likely to share,
+i.e. the birthdate, the phonetic key of the lastname and the identifier
+values. The blocks are read straight from the forward mappings of the catalog
+indexes and only the pairs within a block are scored, from catalog metadata.
+
+Patient objects are only woken up to confirm the best candidates, which are
+stored as a report in the portal.
+"""
+
+import heapq
+import time
+from itertools import combinations
+
+from Acquisition import aq_base
+from BTrees.IIBTree import IITreeSet
+from BTrees.IIBTree import intersection
+from bika.lims import api
+from DateTime import DateTime
+from persistent.mapping import PersistentMapping
+from Products.CMFCore.indexing import processQueue
+from senaite.core.api import dtime
+from senaite.patient import logger
+from senaite.patient.api import get_patient_catalog
+from senaite.patient.phonetic import LASTNAME_PREFIX
+from senaite.patient.phonetic import get_name_similarity
+from six import integer_types
+from zope.annotation.interfaces import IAnnotations
+
+# Portal annotation key of the last duplicates report
+REPORT_KEY = "senaite.patient.duplicates"
+
+# Indexes used as blocking keys
+BLOCKING_INDEXES = (
+    "patient_birthdate",
+    "patient_name_phonetic",
+    "patient_identifier_values",
+)
+
+# Weight of each criteria in the score of a pair
+WEIGHTS = (
+    ("name", 0.4),
+    ("birthdate", 0.25),
+    ("identifiers", 0.25),
+    ("sex", 0.05),
+    ("email", 0.05),
+)
+
+# Score of a criteria that cannot be compared, e.g. an empty birthdate
+UNKNOWN_SCORE = 0.5
+
+# Minimum score of a criteria to be reported as a match
+MATCH_SCORE = 0.8
+
+# Blocks with more patients are skipped, e.g. a placeholder birthdate
+MAX_BLOCK_SIZE = 200
+
+MIN_SCORE = 0.75
+MAX_CANDIDATES = 500
+
+# Minutes of a day in the keys of a DateIndex
+MINUTES_PER_DAY = 24 * 60
+
+
+def to_tree_set(rids):
+    """Returns the record ids of an index entry as a tree set
+    """
+    if isinstance(rids, integer_types):
+        return IITreeSet([rids])
+    return rids
+
+
+def get_active_rids():
+    """Returns a tree set with the record ids of the active patients
+    """
+    catalog = get_patient_catalog()
+    results = catalog({"portal_type": "Patient", "is_active": True})
+    rids = getattr(results, "_seq", None)
+    if rids is None:
+        rids = [brain.getRID() for brain in results]
+    return IITreeSet(rids)
+
+
+def iter_blocks(index_name, rids=None):
+    """Generator of (key, record ids) for the entries of the index that are
+    shared by more than one patient
+
+    :param index_name: name of the blocking index of the patient catalog
+    :param rids: tree set to restrict the record ids of the blocks to
+    """
+    catalog = get_patient_catalog()
+    index = catalog._catalog.getIndex(index_name)
+    forward = getattr(aq_base(index), "_index", None)
+    if forward is None:
+        return
+
+    for key, block in iter_index_entries(index_name, forward):
+        if rids is not None:
+            block = intersection(block, rids)
+        if len(block) > 1:
+            yield key, block
+
+
+def iter_index_entries(index_name, forward):
+    """Generator of (key, tree set of record ids) of the forward mapping of a
+    blocking index
+    """
+    if index_name == "patient_birthdate":
+        # keys are minutes, merge the entries of the same day
+        day = block = None
+        for key, rids in forward.items():
+            if key // MINUTES_PER_DAY != day:
+                if block is not None:
+                    yield day, block
+                day = key // MINUTES_PER_DAY
+                block = IITreeSet()
+            block.update(to_tree_set(rids))
+        if block is not None:
+            yield day, block
+
+    elif index_name == "patient_name_phonetic":
+        # lastnames only, firstnames are shared by too many patients
+        for key, rids in forward.items(LASTNAME_PREFIX):
+            if not key.startswith(LASTNAME_PREFIX):
+                break
+            yield key, to_tree_set(rids)
+
+    else:
+        for key, rids in forward.items():
+            if key:
+                yield key, to_tree_set(rids)
+
+
+def get_info(metadata):
+    """Returns a dict with the values to compare from the metadata of a
+    patient brain or the patient object
+    """
+    get = metadata.get
+    birthdate = dtime.to_dt(get("getBirthdate") or None)
+    return {
+        "uid": get("UID"),
+        "name": api.safe_unicode(get("getFullname") or u""),
+        "birthdate": birthdate.date() if birthdate else None,
+        "sex": get("getSex") or None,
+        "email": (get("getEmail") or "").strip().lower() or None,
+        "identifiers": list(get("get_identifier_items") or []),
+    }
+
+
+def get_patient_info(patient):
+    """Returns a dict with the values to compare of the patient object
+    """
+    return get_info({
+        "UID": api.get_uid(patient),
+        "getFullname": patient.getFullname(),
+        "getBirthdate": patient.getBirthdate(),
+        "getSex": patient.getSex(),
+        "getEmail": patient.getEmail(),
+        "get_identifier_items": patient.get_identifier_items(),
+    })
+
+
+def compare(value, other):
+    """Returns 1.0 if both values are equal, 0.0 if they differ or the
+    unknown score if any of them is empty
+    """
+    if not value or not other:
+        return UNKNOWN_SCORE
+    return 1.0 if value == other else 0.0
+
+
+def compare_identifiers(identifiers, other):
+    """Returns 1.0 if both patients share an identifier, 0.0 if they have
+    different values for the same identifier type, the unknown score otherwise
+    """
+    identifiers = dict(identifiers)
+    other = dict(other)
+    keys = set(identifiers).intersection(other)
+    if not keys:
+        return UNKNOWN_SCORE
+    for key in keys:
+        if identifiers[key] == other[key]:
+            return 1.0
+    return 0.0
+
+
+def get_pair_score(info, other):
+    """Returns the score of a pair of patients, from 0.0 to 1.0, together
+    with the list of criteria that match
+
+    :param info: dict with the values of a patient, see `get_info`
+    :param other: dict with the values of the other patient
+    :returns: tuple of (score, criteria)
+    """
+    name = info["name"]
+    other_name = other["name"]
+    scores = {
+        "name": (get_name_similarity(name, other_name) +
+                 get_name_similarity(other_name, name)) / 2,
+        "birthdate": compare(info["birthdate"], other["birthdate"]),
+        "identifiers": compare_identifiers(
+            info["identifiers"], other["identifiers"]),
+        "sex": compare(info["sex"], other["sex"]),
+        "email": compare(info["email"], other["email"]),
+    }
+    score = sum([scores[key] * weight for key, weight in WEIGHTS])
+    criteria = [key for key, weight in WEIGHTS if scores[key] >= MATCH_SCORE]
+    return round(score, 4), criteria
+
+
+class DuplicatesFinder(object):
+    """Finds candidate duplicates among the active patients
+
+    Each block of n patients has n * (n - 1) / 2 pairs, so blocks with more
+    than `max_block_size` patients are skipped and the number of scored pairs
+    grows linearly with the number of patients. The best candidates are kept
+    in a bounded heap, so the memory usage does not depend on the number of
+    pairs either.
+    """
+
+    def __init__(self, min_score=MIN_SCORE, max_block_size=MAX_BLOCK_SIZE,
+                 max_candidates=MAX_CANDIDATES):
+        self.min_score = min_score
+        self.max_block_size = max_block_size
+        self.max_candidates = max_candidates
+        self.catalog = get_patient_catalog()
+        self.blocks = 0
+        self.skipped_blocks = 0
+        self.pairs = 0
+        # heap of (score, (rid, rid), criteria)
+        self.candidates = []
+        # pairs in the heap, as the same pair is found in more than one block
+        self.found = set()
+
+    def get_info(self, rid):
+        return get_info(self.catalog.getMetadataForRID(rid))
+
+    def __call__(self):
+        """Searches the candidates and confirms the best ones
+
+        :returns: dict with the report
+        """
+        start = time.time()
+        # index the pending objects first, as the catalog does before searching
+        processQueue()
+        rids = get_active_rids()
+
+        for index_name in BLOCKING_INDEXES:
+            for key, block in iter_blocks(index_name, rids=rids):
+                if len(block) > self.max_block_size:
+                    logger.warn("Skipping block '{}' of {} with {} patients"
+                                .format(key, index_name, len(block)))
+                    self.skipped_blocks += 1
+                    continue
+                self.score_block(block)
+            # release the brains and metadata loaded for this index
+            self.catalog._p_jar.cacheGC()
+            logger.info("Duplicates: {} blocks, {} pairs scored, {} "
+                        "candidates after {}"
+                        .format(self.blocks, self.pairs,
+                                len(self.candidates), index_name))
+
+        candidates = self.confirm()
+        return {
+            "date": DateTime(),
+            "patients": len(rids),
+            "blocks": self.blocks,
+            "skipped_blocks": self.skipped_blocks,
+            "pairs": self.pairs,
+            "seconds": round(time.time() - start, 2),
+            "candidates": candidates,
+        }
+
+    def score_block(self, block):
+        """Scores all pairs of patients of the block
+        """
+        self.blocks += 1
+        infos = [(rid, self.get_info(rid)) for rid in block]
+        for (rid, info), (other_rid, other) in combinations(infos, 2):
+            pair = (rid, other_rid)
+            if pair in self.found:
+                continue
+            self.pairs += 1
+            score, criteria = get_pair_score(info, other)
+            if score < self.min_score:
+                continue
+            self.add_candidate(score, pair, criteria)
+
+    def add_candidate(self, score, pair, criteria):
+        """Adds the pair to the candidates, discarding the lowest scored one
+        if the maximum number of candidates is reached
+        """
+        self.found.add(pair)
+        candidate = (score, pair, criteria)
+        if len(self.candidates) < self.max_candidates:
+            heapq.heappush(self.candidates, candidate)
+            return
+        discarded = heapq.heappushpop(self.candidates, candidate)
+        self.found.discard(discarded[1])
+
+    def confirm(self):
+        """Scores the candidates again with the values of the patient objects,
+        in case the metadata is outdated
+
+        :returns: list of dicts with the confirmed candidates, best first
+        """
+        confirmed = []
+        for score, pair, criteria in sorted(self.candidates, reverse=True):
+            patients = [self.get_patient(rid) for rid in pair]
+            if not all(patients):
+                continue
+            info, other = [get_patient_info(p) for p in patients]
+            score, criteria = get_pair_score(info, other)
+            if score < self.min_score:
+                continue
+            confirmed.append({
+                "score": score,
+                "uids": (info["uid"], other["uid"]),
+                "criteria": criteria,
+            })
+        confirmed.sort(key=lambda candidate: candidate["score"], reverse=True)
+        return confirmed
+
+    def get_patient(self, rid):
+        """Returns the active patient object of the record id or None
+        """
+        path = self.catalog.getpath(rid)
+        patient = api.get_portal().unrestrictedTraverse(path, None)
+        if patient is None or not api.is_active(patient):
+            return None
+        return patient
+
+
+def get_duplicates_report():
+    """Returns the last report of candidate duplicates or None
+    """
+    return IAnnotations(api.get_portal()).get(REPORT_KEY)
+
+
+def find_duplicates(min_score=MIN_SCORE, max_block_size=MAX_BLOCK_SIZE,
+                    max_candidates=MAX_CANDIDATES):
+    """Searches candidate duplicates among the active patients and stores the
+    report in the portal
+
+    :param min_score: minimum score of a pair to be reported, from 0.0 to 1.0
+    :param max_block_size: blocks with more patients are skipped
+    :param max_candidates: maximum number of pairs to report
+    :returns: dict with the report
+    """
+    finder = DuplicatesFinder(min_score=min_score,
+                              max_block_size=max_block_size,
+                              max_candidates=max_candidates)
+    report = PersistentMapping(finder())
+    IAnnotations(api.get_portal())[REPORT_KEY] = report
+    logger.info("Duplicates: {} candidates found among {} patients in {}s"
+                .format(len(report["candidates"]), report["patients"],
+                        report["seconds"]))
+    return report
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+
+"""Streaming exporter of patients
+
+Rows are built from the metadata of the patient catalog, without waking up any
+patient object, and are serialized in chunks, so the memory usage does not
+depend on the number of patients exported.
+"""
+
+import csv
+import json
+from io import BytesIO
+from itertools import islice
+
+from bika.lims import api
+from senaite.core.api import dtime
+from senaite.patient.api import get_patient_catalog
+
+# Catalog query filters by review state, same as in the patients listing
+FILTERS = {
+    "active": {"is_active": True},
+    "inactive": {"is_active": False},
+    "deceased": {"patient_deceased": True},
+    "all": {},
+}
+
+FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+}
+
+# Exported fields, in order
+FIELDS = (
+    "uid",
+    "mrn",
+    "identifiers",
+    "fullname",
+    "email",
+    "email_report",
+    "sex",
+    "gender",
+    "birthdate",
+    "estimated_birthdate",
+    "deceased",
+    "path",
+)
+
+CHUNK_SIZE = 1000
+
+
+def get_export_query(review_state="active", paths=None):
+    """Returns the catalog query for the patients to export
+
+    :param review_state: one of the keys of FILTERS
+    :param paths: list of paths to search for patients. All if None
+    """
+    if review_state not in FILTERS:
+        raise ValueError("Review state not supported: {}".format(review_state))
+    query = {"portal_type": "Patient"}
+    query.update(FILTERS[review_state])
+    if paths:
+        query["path"] = {"query": paths, "level": 0}
+    return query
+
+
+def iter_brains(query, chunk_size=CHUNK_SIZE):
+    """Generator of the brains of the patient catalog for the given query
+
+    The lazy results of the catalog keep a reference to every brain they
+    create, so brains are built from the record ids of the results instead and
+    released after every chunk
+    """
+    catalog = get_patient_catalog()
+    results = catalog(query)
+    rids = getattr(results, "_seq", None)
+    if rids is None:
+        # not a lazy map, e.g. results from a sorted query
+        for brain in results:
+            yield brain
+        return
+
+    rids = iter(rids)
+    while True:
+        chunk = list(islice(rids, chunk_size))
+        if not chunk:
+            break
+        for rid in chunk:
+            yield results._func(rid)
+        catalog._p_jar.cacheGC()
+
+
+def get_row(brain):
+    """Returns a dict with the exported values of the patient brain
+    """
+    birthdate = dtime.to_dt(brain.getBirthdate or None)
+    identifiers = brain.get_identifier_items or []
+    return {
+        "uid": brain.UID,
+        "mrn": api.safe_unicode(brain.mrn or ""),
+        "identifiers": [list(item) for item in identifiers],
+        "fullname": api.safe_unicode(brain.getFullname or ""),
+        "email": api.safe_unicode(brain.getEmail or ""),
+        "email_report": bool(brain.getEmailReport),
+        "sex": brain.getSex or "",
+        "gender": brain.getGender or "",
+        "birthdate": birthdate.date().isoformat() if birthdate else "",
+        "estimated_birthdate": bool(brain.getEstimatedBirthdate),
+        "deceased": bool(brain.getDeceased),
+        "path": brain.getPath(),
+    }
+
+
+def iter_rows(query, chunk_size=CHUNK_SIZE):
+    """Generator of the exported rows of the patients for the given query
+    """
+    for brain in iter_brains(query, chunk_size=chunk_size):
+        yield get_row(brain)
+
+
+def to_csv_value(value):
+    """Converts an exported value to an UTF-8 encoded string for CSV
+    """
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, list):
+        value = " | ".join([u":".join(map(api.safe_unicode, item))
+                            for item in value])
+    return api.safe_unicode(value).encode("utf8")
+
+
+def iter_csv(rows, chunk_size=CHUNK_SIZE):
+    """Generator of CSV chunks of the given rows, including the header
+    """
+    output = BytesIO()
+    writer = csv.writer(output)
+    writer.writerow(FIELDS)
+    for num, row in enumerate(rows, start=1):
+        writer.writerow([to_csv_value(row[field]) for field in FIELDS])
+        if num % chunk_size == 0:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+    yield output.getvalue()
+
+
+def iter_jsonl(rows, chunk_size=CHUNK_SIZE):
+    """Generator of JSON lines chunks of the given rows
+    """
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row))
+        if len(lines) == chunk_size:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def iter_export(review_state="active", file_format="csv", paths=None,
+                chunk_size=CHUNK_SIZE):
+    """Generator of the chunks of the export of patients
+
+    :param review_state: one of the keys of FILTERS
+    :param file_format: one of the keys of FORMATS
+    :param paths: list of paths to search for patients. All if None
+    :param chunk_size: number of rows per chunk
+    """
+    if file_format not in FORMATS:
+        raise ValueError("Format not supported: {}".format(file_format))
+    query = get_export_query(review_state, paths=paths)
+    rows = iter_rows(query, chunk_size=chunk_size)
+    if file_format == "csv":
+        return iter_csv(rows, chunk_size=chunk_size)
+    return iter_jsonl(rows, chunk_size=chunk_size)
+
+
+def export_patients(output, review_state="active", file_format="csv",
+                    paths=None, chunk_size=CHUNK_SIZE):
+    """Writes the export of patients to the given file-like object
+
+    :returns: number of bytes written
+    """
+    size = 0
+    for chunk in iter_export(review_state=review_state,
+                             file_format=file_format, paths=paths,
+                             chunk_size=chunk_size):
+        output.write(chunk)
+        size += len(chunk)
+    return size
@@ -0,0 +1,396 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+
+"""Streaming importer of patients
+
+Records are read one by one from a CSV or JSONL file, so the memory usage does
+not depend on the size of the file. Catalog indexing is deferred until all
+records are imported, and the progress is persisted with every commit, so an
+interrupted import can be resumed by running it again.
+"""
+
+import csv
+import json
+import os
+import threading
+import time
+
+import transaction
+from Acquisition import aq_base
+from BTrees.OOBTree import OOBTree
+from bika.lims import api
+from persistent.mapping import PersistentMapping
+from Products.CMFCore.indexing import getQueue
+from senaite.core.api import dtime
+from senaite.patient import logger
+from senaite.patient.api import get_patient_catalog
+from senaite.patient.api import get_patient_folder
+from senaite.patient.api import normalize_mrn
+from senaite.patient.api import register_mrn
+from six import string_types
+from zope.annotation.interfaces import IAnnotations
+
+# Portal annotation key of the checkpoint of an import job
+CHECKPOINT_KEY = "senaite.patient.import.{}"
+
+TRUE_VALUES = ("1", "true", "yes", "y", "on")
+
+# Flags the imports in progress in the current thread
+_local = threading.local()
+
+
+def is_importing():
+    """Returns whether patients are being imported in the current thread
+    """
+    return getattr(_local, "importing", False)
+
+
+def discard_index_operations(obj):
+    """Removes the pending index operations of the object from the indexing
+    queue. The operations of other objects are kept
+    """
+    queue = getQueue()
+    obj = aq_base(obj)
+    state = queue.getState()
+    kept = [op for op in state if aq_base(op[1]) is not obj]
+    if len(kept) != len(state):
+        queue.setState(kept)
+
+
+def read_csv(path, encoding="utf-8"):
+    """Generator of the rows of a CSV file with a header line as dicts
+    """
+    with open(path, "rb") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield dict([
+                (key.strip().lower(), (value or "").decode(encoding))
+                for key, value in row.items() if key])
+
+
+def read_jsonl(path):
+    """Generator of the records of a JSON lines file
+    """
+    with open(path, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            yield dict([(k.lower(), v) for k, v in record.items()])
+
+
+def read_records(path, file_format=None):
+    """Returns a generator of the records of the given file
+
+    :param path: path of the CSV or JSONL file
+    :param file_format: "csv" or "jsonl". Guessed from the extension if None
+    """
+    if not file_format:
+        file_format = os.path.splitext(path)[-1].lstrip(".")
+    file_format = file_format.lower()
+    if file_format == "csv":
+        return read_csv(path)
+    if file_format in ["jsonl", "ndjson"]:
+        return read_jsonl(path)
+    raise ValueError("Format not supported: {}".format(file_format))
+
+
+def get_indexed_mrns():
+    """Returns a set with the MRNs of all patients from the patient_mrn index
+
+    The values are read straight from the index, without waking up any object
+    """
+    catalog = get_patient_catalog()
+    index = catalog._catalog.getIndex("patient_mrn")
+    return set(map(normalize_mrn, index.uniqueValues()))
+
+
+def to_bool(value):
+    """Converts a value from an import record to a boolean
+    """
+    if isinstance(value, string_types):
+        return value.strip().lower() in TRUE_VALUES
+    return bool(value)
+
+
+def get_patient_values(record):
+    """Returns the values to set to a patient from an import record
+
+    :param record: dict with the values of the record
+    :returns: dict with the converted values
+    :raises ValueError: if the record has no MRN or a value is not valid
+    """
+    mrn = normalize_mrn(record.get("mrn") or "")
+    if not mrn:
+        raise ValueError("MRN is missing")
+
+    values = {"mrn": api.safe_unicode(mrn)}
+    for key in ["firstname", "middlename", "lastname", "sex", "gender",
+                "email", "phone"]:
+        values[key] = api.safe_unicode(record.get(key) or "").strip()
+
+    birthdate = record.get("birthdate")
+    if birthdate:
+        values["birthdate"] = dtime.to_dt(birthdate)
+        if not values["birthdate"]:
+            raise ValueError("Birthdate is not valid: {}".format(birthdate))
+    values["estimated_birthdate"] = to_bool(record.get("estimated_birthdate"))
+    values["deceased"] = to_bool(record.get("deceased"))
+
+    address = record.get("address")
+    if isinstance(address, string_types) and address.strip():
+        address = [{"type": "physical", "address": address.strip()}]
+    if address:
+        values["address"] = address
+
+    return values
+
+
+def set_patient_values(patient, values):
+    """Sets the values to the patient, without reindexing
+
+    The uniqueness of the MRN is not checked, the importer takes care of it
+    """
+    mutator = patient.mutator("mrn")
+    mutator(patient, values["mrn"])
+    patient.setFirstname(values["firstname"])
+    patient.setMiddlename(values["middlename"])
+    patient.setLastname(values["lastname"])
+    patient.setSex(values["sex"])
+    patient.setGender(values["gender"])
+    patient.setEmail(values["email"])
+    patient.setPhone(values["phone"])
+    patient.setBirthdate(values.get("birthdate"))
+    patient.setEstimatedBirthdate(values["estimated_birthdate"])
+    patient.setDeceased(values["deceased"])
+    if values.get("address"):
+        patient.setAddress(values["address"])
+
+
+class PatientImporter(object):
+    """Imports patients from a stream of records
+
+    Records are processed in order. A savepoint is done every `savepoint_size`
+    records and the transaction is committed every `commit_size` records,
+    together with the checkpoint of the job. The imported patients are not
+    queued for indexing, but indexed in a single pass once all records are
+    imported. The patient subscribers are skipped while importing, the MRNs
+    are registered by the importer.
+
+    If the import is interrupted, running the same job again skips the records
+    that were already committed.
+    """
+
+    def __init__(self, container=None, job_id="default", savepoint_size=100,
+                 commit_size=1000):
+        if container is None:
+            container = get_patient_folder()
+        if savepoint_size < 1 or commit_size < 1:
+            raise ValueError("Batch sizes must be greater than 0")
+        self.container = container
+        self.job_id = job_id
+        self.savepoint_size = savepoint_size
+        self.commit_size = commit_size
+        self.created = 0
+        self.skipped = 0
+        self.errors = 0
+        self.indexed = 0
+        self.offset = 0
+        self.start = None
+
+    @property
+    def checkpoint_key(self):
+        return CHECKPOINT_KEY.format(self.job_id)
+
+    def get_checkpoint(self):
+        """Returns the persistent checkpoint of the job, created if necessary
+
+        The checkpoint keeps the number of records committed, whether these
+        were indexed already and a mapping of MRN -> path of the patients
+        imported by this job
+        """
+        annotations = IAnnotations(api.get_portal())
+        checkpoint = annotations.get(self.checkpoint_key)
+        if checkpoint is None:
+            checkpoint = PersistentMapping()
+            checkpoint["offset"] = 0
+            checkpoint["indexed"] = 0
+            checkpoint["patients"] = OOBTree()
+            annotations[self.checkpoint_key] = checkpoint
+        return checkpoint
+
+    def remove_checkpoint(self):
+        """Removes the checkpoint of the job
+        """
+        annotations = IAnnotations(api.get_portal())
+        annotations.pop(self.checkpoint_key, None)
+
+    def get_rate(self, num):
+        """Returns the number of items processed per second
+        """
+        elapsed = time.time() - self.start
+        return num / elapsed if elapsed else 0.0
+
+    def __call__(self, records):
+        """Imports the records and indexes the imported patients
+
+        :param records: iterable of dicts with the values of the patients
+        :returns: dict with the summary of the import
+        """
+        self.start = time.time()
+        checkpoint = self.get_checkpoint()
+        offset = self.offset = checkpoint["offset"]
+        if offset:
+            logger.info("Resuming import '{}' after record {}"
+                        .format(self.job_id, offset))
+
+        # MRNs of existing patients plus the ones imported but not indexed
+        mrns = get_indexed_mrns()
+        mrns.update(checkpoint["patients"].keys())
+
+        _local.importing = True
+        try:
+            num = 0
+            for num, record in enumerate(records, start=1):
+                if num <= offset:
+                    continue
+
+                self.import_record(num, record, mrns, checkpoint)
+
+                if num % self.commit_size == 0:
+                    self.commit(num, checkpoint)
+                elif num % self.savepoint_size == 0:
+                    transaction.savepoint(optimistic=True)
+
+            if num > offset:
+                self.commit(num, checkpoint)
+        finally:
+            _local.importing = False
+
+        self.index_patients(checkpoint)
+        self.remove_checkpoint()
+        transaction.commit()
+
+        summary = {
+            "created": self.created,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "indexed": self.indexed,
+            "seconds": round(time.time() - self.start, 2),
+            "rate": round(self.get_rate(self.created), 2),
+        }
+        logger.info("Import '{}' finished: {}".format(self.job_id, summary))
+        return summary
+
+    def import_record(self, num, record, mrns, checkpoint):
+        """Creates a patient for the given record, if the MRN is not taken
+        """
+        try:
+            values = get_patient_values(record)
+        except (ValueError, TypeError) as e:
+            logger.error("Record {}: {}".format(num, e))
+            self.errors += 1
+            return
+
+        mrn = normalize_mrn(values["mrn"])
+        if mrn in mrns:
+            logger.warn("Record {}: MRN '{}' exists already"
+                        .format(num, mrn))
+            self.skipped += 1
+            return
+
+        patient = api.create(self.container, "Patient")
+        # the patient is indexed once all records are imported
+        discard_index_operations(patient)
+        try:
+            set_patient_values(patient, values)
+        except (ValueError, TypeError) as e:
+            logger.error("Record {}: {}".format(num, e))
+            self.container._delObject(api.get_id(patient))
+            self.errors += 1
+            return
+
+        register_mrn(patient)
+        mrns.add(mrn)
+        checkpoint["patients"][mrn] = api.get_path(patient)
+        self.created += 1
+
+    def commit(self, num, checkpoint):
+        """Commits the transaction together with the checkpoint
+        """
+        checkpoint["offset"] = num
+        transaction.commit()
+        self.container._p_jar.cacheMinimize()
+        logger.info("Import '{}': {} records processed, {} patients created "
+                    "({:.1f} records/s)"
+                    .format(self.job_id, num, self.created,
+                            self.get_rate(num - self.offset)))
+
+    def index_patients(self, checkpoint):
+        """Indexes the patients imported by this job in batches
+        """
+        portal = api.get_portal()
+        patients = checkpoint["patients"]
+        total = len(patients)
+        indexed = checkpoint["indexed"]
+        start = time.time()
+        for num, path in enumerate(patients.values(), start=1):
+            if num <= indexed:
+                continue
+            patient = portal.unrestrictedTraverse(path, None)
+            if patient is None:
+                continue
+            patient.reindexObject()
+            self.indexed += 1
+            if num % self.commit_size == 0:
+                checkpoint["indexed"] = num
+                transaction.commit()
+                self.container._p_jar.cacheMinimize()
+                elapsed = time.time() - start
+                logger.info("Import '{}': {}/{} patients indexed "
+                            "({:.1f} patients/s)"
+                            .format(self.job_id, num, total,
+                                    self.indexed / elapsed if elapsed else 0))
+        checkpoint["indexed"] = total
+        # the container was modified as well
+        self.container.reindexObject()
+
+
+def import_patients(path, file_format=None, container=None, job_id=None,
+                    savepoint_size=100, commit_size=1000):
+    """Imports the patients from a CSV or JSONL file
+
+    :param path: path of the file to import
+    :param file_format: "csv" or "jsonl". Guessed from the extension if None
+    :param container: folder where patients are created. Default: patients
+    :param job_id: ID of the job to resume. Default: name of the file
+    :param savepoint_size: number of records between savepoints
+    :param commit_size: number of records between commits
+    :returns: dict with the summary of the import
+    """
+    if job_id is None:
+        job_id = os.path.basename(path)
+    records = read_records(path, file_format=file_format)
+    importer = PatientImporter(container=container, job_id=job_id,
+                               savepoint_size=savepoint_size,
+                               commit_size=commit_size)
+    return importer(records)
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+"""Opt-in timing and counter instrumentation of the hot paths
+
+The instrumentation is enabled by setting the environment variable
+`SENAITE_PATIENT_INSTRUMENTATION` to "on" before the instance starts, e.g. in
+buildout.cfg:
+
+    [instance]
+    environment-vars =
+        SENAITE_PATIENT_INSTRUMENTATION on
+
+When disabled, the `instrument` decorator returns the functions unchanged and
+the catalog is not patched, so there is no overhead at all.
+
+The numbers are aggregated per process: the call count, the cumulative time,
+the percentiles of the latest calls and the number of catalog queries done
+within the calls.
+"""
+
+import os
+import threading
+from collections import deque
+from functools import wraps
+from timeit import default_timer
+
+from Products.ZCatalog.Catalog import Catalog
+
+# Environment variable to enable the instrumentation
+ENV_KEY = "SENAITE_PATIENT_INSTRUMENTATION"
+
+ENABLED = os.environ.get(ENV_KEY, "").lower() in ("1", "on", "true", "yes")
+
+# Number of latest calls kept per function to compute the percentiles
+SAMPLE_SIZE = 1000
+
+_stats = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class Timing(object):
+    """Aggregated timings of the calls of a function
+    """
+
+    __slots__ = ("name", "count", "total", "max", "queries", "samples")
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.queries = 0
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+
+    def add(self, seconds, queries=0):
+        self.count += 1
+        self.total += seconds
+        self.queries += queries
+        if seconds > self.max:
+            self.max = seconds
+        self.samples.append(seconds)
+
+    def percentile(self, value):
+        """Returns the percentile of the latest calls in seconds
+        """
+        samples = sorted(self.samples)
+        if not samples:
+            return 0.0
+        return samples[min(int(len(samples) * value), len(samples) - 1)]
+
+    def to_dict(self):
+        """Returns the statistics in milliseconds
+        """
+        count = self.count or 1
+        return {
+            "name": self.name,
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "mean_ms": self.total * 1000 / count,
+            "p50_ms": self.percentile(0.5) * 1000,
+            "p95_ms": self.percentile(0.95) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "max_ms": self.max * 1000,
+            "queries": self.queries,
+            "queries_per_call": float(self.queries) / count,
+        }
+
+
+def get_query_count():
+    """Returns the number of catalog queries done by the current thread
+    """
+    return getattr(_local, "queries", 0)
+
+
+def record(name, seconds, queries=0):
+    """Adds the timing of a call to the aggregates of the function
+    """
+    with _lock:
+        timing = _stats.get(name)
+        if timing is None:
+            timing = _stats[name] = Timing(name)
+        timing.add(seconds, queries)
+
+
+def get_stats():
+    """Returns a list of dicts with the statistics of all functions, sorted by
+    cumulative time
+    """
+    with _lock:
+        stats = [timing.to_dict() for timing in _stats.values()]
+    return sorted(stats, key=lambda stat: stat["total_ms"], reverse=True)
+
+
+def reset():
+    """Discards the statistics of all functions
+    """
+    with _lock:
+        _stats.clear()
+
+
+def instrument(name):
+    """Decorator that records the timings of the calls of the function
+
+    :param name: name the timings are aggregated under
+    """
+    def decorator(func):
+        if not ENABLED:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            queries = get_query_count()
+            start = default_timer()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, default_timer() - start,
+                       get_query_count() - queries)
+        return wrapper
+    return decorator
+
+
+def patch_catalog():
+    """Patches the catalog to count the queries of every thread
+    """
+    search = Catalog.searchResults
+    if getattr(search, "_counted", False):
+        return
+
+    def searchResults(self, *args, **kwargs):
+        _local.queries = get_query_count() + 1
+        return search(self, *args, **kwargs)
+
+    searchResults._counted = True
+    Catalog.searchResults = searchResults
+    Catalog.__call__ = searchResults
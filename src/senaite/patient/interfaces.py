@@ -52,3 +52,9 @@ class IAgeDateOfBirthField(interface.Interface):
     necessary for AgeDateOfBirthFieldManager, required by senaite.jsonapi to
     properly retrieve and jsonify the value
     """
+
+
+class IMRNRegistry(interface.Interface):
+    """Marker interface for the persistent registry of Medical Record Numbers
+    of patients, registered as a local utility
+    """
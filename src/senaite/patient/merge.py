@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+"""Merge of duplicate patients
+
+The samples of the duplicate patient are re-linked to the patient that is
+kept by rewriting their Medical Record Number and patient UID. The values are
+set directly, so no events are fired, and only the sample indexes and metadata
+columns that depend on the patient are updated. The samples are moved to the
+sample statistics of the patient that is kept.
+"""
+
+import time
+
+import transaction
+from bika.lims import api
+from bika.lims.workflow import isTransitionAllowed
+from Products.CMFCore.indexing import processQueue
+from senaite.core.catalog import SAMPLE_CATALOG
+from senaite.patient import logger
+from senaite.patient.api import link_sample_patient
+from senaite.patient.api import update_metadata_columns
+from senaite.patient.samplestats import reindex_sample_stats
+from senaite.patient.samplestats import update_sample_stats
+
+# Indexes of the sample catalog that depend on the patient
+SAMPLE_INDEXES = (
+    "medical_record_number",
+    "is_temporary_mrn",
+    "listing_searchable_text",
+    "patient_uid",
+)
+
+# Metadata columns of the sample catalog that depend on the patient
+SAMPLE_COLUMNS = (
+    "getMedicalRecordNumberValue",
+    "isMedicalRecordTemporary",
+    "getPatientFullName",
+    "getPatientUID",
+)
+
+
+def get_sample_rids(mrn):
+    """Returns the record ids of the samples with the given MRN
+    """
+    # index the pending objects first, as the catalog does before searching
+    processQueue()
+    catalog = api.get_tool(SAMPLE_CATALOG)
+    results = catalog({"medical_record_number": [mrn]})
+    rids = getattr(results, "_seq", None)
+    if rids is None:
+        rids = [brain.getRID() for brain in results]
+    return list(rids)
+
+
+def set_sample_mrn(sample, mrn):
+    """Sets the Medical Record Number to the sample, without firing events
+    """
+    field = sample.getField("MedicalRecordNumber")
+    value = dict(field.get(sample) or {})
+    value.update({"value": mrn, "temporary": False})
+    field.set(sample, value)
+
+
+def merge_patients(patient, duplicate, batch_size=500):
+    """Re-links the samples of the duplicate patient to the patient and
+    deactivates the duplicate
+
+    :param patient: patient object to keep
+    :param duplicate: patient object to merge into the patient
+    :param batch_size: number of samples between savepoints
+    :returns: number of samples re-linked
+    """
+    if batch_size < 1:
+        raise ValueError("Batch size must be greater than 0")
+    if api.get_uid(patient) == api.get_uid(duplicate):
+        raise ValueError("Cannot merge a patient with itself")
+    mrn = patient.getMRN()
+    duplicate_mrn = duplicate.getMRN()
+    if not mrn or not duplicate_mrn:
+        raise ValueError("Patients without MRN cannot be merged")
+
+    catalog = api.get_tool(SAMPLE_CATALOG)
+    rids = get_sample_rids(duplicate_mrn)
+    total = len(rids)
+    logger.info("Merging patient '{}' into '{}': {} samples"
+                .format(duplicate_mrn, mrn, total))
+
+    portal = api.get_portal()
+    start = time.time()
+    for num, rid in enumerate(rids, start=1):
+        path = catalog.getpath(rid)
+        sample = portal.unrestrictedTraverse(path, None)
+        if sample is None:
+            continue
+        set_sample_mrn(sample, mrn)
+        link_sample_patient(sample, patient)
+        update_sample_stats(sample, reindex=False)
+        catalog.catalog_object(sample, uid=path, idxs=SAMPLE_INDEXES,
+                               update_metadata=0)
+        update_metadata_columns(catalog, sample, SAMPLE_COLUMNS)
+        sample._p_deactivate()
+
+        if num % batch_size == 0:
+            transaction.savepoint(optimistic=True)
+            elapsed = time.time() - start
+            logger.info("Merging patient '{}': {}/{} samples ({:.1f} "
+                        "samples/s)".format(duplicate_mrn, num, total,
+                                            num / elapsed if elapsed else 0))
+
+    # the sample statistics are reindexed once for all samples
+    reindex_sample_stats(patient)
+    reindex_sample_stats(duplicate)
+
+    if isTransitionAllowed(duplicate, "deactivate"):
+        api.do_transition_for(duplicate, "deactivate")
+
+    logger.info("Merged patient '{}' into '{}': {} samples in {:.2f}s"
+                .format(duplicate_mrn, mrn, total, time.time() - start))
+    return total
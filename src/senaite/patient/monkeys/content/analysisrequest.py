@@ -19,6 +19,7 @@
 # Some rights reserved, see README and LICENSE.
 
 from senaite.patient import check_installed
+from senaite.patient.api import get_sample_patient_uid
 
 
 @check_installed(False)
@@ -52,6 +53,13 @@ def getPatientFullName(self):  # noqa camelcase
     return self.getField("PatientFullName").get_fullname(self)
 
 
+@check_installed(None)
+def getPatientUID(self):  # noqa camelcase
+    """Returns the UID of the patient linked to the sample
+    """
+    return get_sample_patient_uid(self)
+
+
 @check_installed(None)
 def getSex(self):  # noqa camelcase
     """Returns the patient's sex
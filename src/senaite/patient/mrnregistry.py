@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+
+from BTrees.OOBTree import OOBTree
+from persistent import Persistent
+from senaite.patient.interfaces import IMRNRegistry
+from zope.component import queryUtility
+from zope.interface import implementer
+
+
+@implementer(IMRNRegistry)
+class MRNRegistry(Persistent):
+    """Persistent mapping of Medical Record Number -> patient UID
+
+    Registering the same MRN in two concurrent transactions writes the same
+    key of the same BTree bucket, so one of them fails with a ConflictError
+    and is retried, instead of both creating a patient.
+
+    MRNs are expected to be normalized already, see `api.normalize_mrn`
+    """
+
+    def __init__(self):
+        # MRN -> UID
+        self._mrns = OOBTree()
+        # UID -> MRN
+        self._uids = OOBTree()
+
+    def __contains__(self, mrn):
+        return mrn in self._mrns
+
+    def get(self, mrn, default=None):
+        """Returns the UID of the patient with the given MRN
+        """
+        return self._mrns.get(mrn, default)
+
+    def get_mrn(self, uid, default=None):
+        """Returns the MRN registered for the patient with the given UID
+        """
+        return self._uids.get(uid, default)
+
+    def register(self, mrn, uid):
+        """Registers the MRN for the patient with the given UID. The MRN that
+        was registered for this patient before is removed
+
+        :returns: False if the MRN is registered for another patient already,
+            True otherwise
+        """
+        if not mrn:
+            self.unregister(uid)
+            return True
+        current = self._mrns.get(mrn)
+        if current == uid:
+            # nothing changed, do not write
+            return True
+        if current is not None:
+            return False
+        self.unregister(uid)
+        self._mrns[mrn] = uid
+        self._uids[uid] = mrn
+        return True
+
+    def unregister(self, uid):
+        """Removes the MRN registered for the patient with the given UID
+        """
+        mrn = self._uids.pop(uid, None)
+        if mrn is not None and self._mrns.get(mrn) == uid:
+            del self._mrns[mrn]
+
+    def clear(self):
+        """Removes all entries from the registry
+        """
+        self._mrns.clear()
+        self._uids.clear()
+
+    def items(self):
+        """Returns an iterator of (MRN, UID) tuples
+        """
+        return self._mrns.iteritems()
+
+
+def get_mrn_registry():
+    """Returns the MRN registry of the current site or None
+    """
+    return queryUtility(IMRNRegistry)
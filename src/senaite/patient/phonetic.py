@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+
+"""Text functions for the fuzzy search of patients by name
+
+Names are folded to lowercase ASCII without accents, split in words and
+encoded as trigrams and phonetic keys (Metaphone), so misspellings such as
+"Jon/John" or "Muller/Müller" still match.
+"""
+
+import re
+import unicodedata
+
+import six
+
+# Characters that are not decomposed by the unicode normalization
+FOLD_MAP = {
+    u"ß": u"ss",
+    u"æ": u"ae",
+    u"œ": u"oe",
+    u"ø": u"o",
+    u"ł": u"l",
+    u"đ": u"d",
+    u"ð": u"d",
+    u"þ": u"th",
+    u"ı": u"i",
+}
+
+# Padding character of trigrams, flags the beginning and end of words
+PAD = u"$"
+
+# Prefixes of the phonetic keys of each name part
+FIRSTNAME_PREFIX = "f:"
+MIDDLENAME_PREFIX = "m:"
+LASTNAME_PREFIX = "l:"
+NAME_PREFIXES = (FIRSTNAME_PREFIX, MIDDLENAME_PREFIX, LASTNAME_PREFIX)
+
+VOWELS = "AEIOU"
+FRONT_VOWELS = "EIY"
+WORD_SPLIT = re.compile(r"[^a-z0-9]+")
+
+
+def fold(text):
+    """Returns the text in lowercase ASCII, without accents
+
+    :param text: string or unicode
+    :returns: unicode
+    """
+    if not text:
+        return u""
+    if not isinstance(text, six.text_type):
+        text = text.decode("utf8", "replace")
+    text = text.lower()
+    text = u"".join([FOLD_MAP.get(char, char) for char in text])
+    text = unicodedata.normalize("NFKD", text)
+    return u"".join([char for char in text
+                     if not unicodedata.combining(char)])
+
+
+def get_words(text):
+    """Returns the list of folded words of the text
+    """
+    return filter(None, WORD_SPLIT.split(fold(text)))
+
+
+def get_trigrams(word, pad_end=True):
+    """Returns the trigrams of the word, padded with PAD
+
+    :param word: folded word
+    :param pad_end: pad the end of the word. Set to False for prefix searches
+    :returns: list of trigrams
+    """
+    word = PAD + word + (PAD if pad_end else u"")
+    return [word[i:i + 3] for i in range(max(len(word) - 2, 1))]
+
+
+def metaphone(word):
+    """Returns the Metaphone key of the word
+
+    Implementation of the original algorithm from Lawrence Philips, which maps
+    the word to the consonant sounds it is pronounced with
+
+    :param word: folded word
+    :returns: upper case phonetic key
+    """
+    word = "".join([char for char in word.upper() if "A" <= char <= "Z"])
+    if not word:
+        return ""
+
+    # initial letter exceptions
+    if word[:2] in ("AE", "GN", "KN", "PN", "WR"):
+        word = word[1:]
+    elif word[0] == "X":
+        word = "S" + word[1:]
+    elif word[:2] == "WH":
+        word = "W" + word[2:]
+
+    length = len(word)
+    key = []
+
+    def at(pos):
+        return word[pos] if 0 <= pos < length else ""
+
+    for i, char in enumerate(word):
+        prev = at(i - 1)
+        nxt = at(i + 1)
+
+        # skip double letters, except C
+        if char == prev and char != "C":
+            continue
+
+        if char in VOWELS:
+            if i == 0:
+                key.append(char)
+        elif char == "B":
+            # silent after M at the end, e.g. "dumb"
+            if not (prev == "M" and i == length - 1):
+                key.append("B")
+        elif char == "C":
+            if nxt == "I" and at(i + 2) == "A":
+                key.append("X")
+            elif nxt == "H":
+                key.append("K" if prev == "S" else "X")
+            elif nxt in FRONT_VOWELS:
+                if prev != "S":
+                    key.append("S")
+            else:
+                key.append("K")
+        elif char == "D":
+            if nxt == "G" and at(i + 2) in FRONT_VOWELS:
+                key.append("J")
+            else:
+                key.append("T")
+        elif char == "G":
+            if nxt == "H" and not (i + 2 < length and at(i + 2) in VOWELS):
+                # silent, e.g. "night"
+                continue
+            if nxt == "N" and (i + 2 == length or word[i + 2:] == "ED"):
+                # silent, e.g. "sign", "signed"
+                continue
+            if prev == "D" and nxt in FRONT_VOWELS:
+                # encoded with the D already
+                continue
+            if nxt in FRONT_VOWELS and prev != "G":
+                key.append("J")
+            else:
+                key.append("K")
+        elif char == "H":
+            if prev in "CSPTG":
+                # encoded with the previous letter
+                continue
+            if prev in VOWELS and nxt not in VOWELS:
+                continue
+            key.append("H")
+        elif char == "K":
+            if prev != "C":
+                key.append("K")
+        elif char == "P":
+            key.append("F" if nxt == "H" else "P")
+        elif char == "Q":
+            key.append("K")
+        elif char == "S":
+            if nxt == "H":
+                key.append("X")
+            elif nxt == "I" and at(i + 2) in ("O", "A"):
+                key.append("X")
+            else:
+                key.append("S")
+        elif char == "T":
+            if nxt == "I" and at(i + 2) in ("O", "A"):
+                key.append("X")
+            elif nxt == "H":
+                key.append("0")
+            elif not (nxt == "C" and at(i + 2) == "H"):
+                key.append("T")
+        elif char == "V":
+            key.append("F")
+        elif char in "WY":
+            if nxt in VOWELS:
+                key.append(char)
+        elif char == "X":
+            key.append("KS")
+        elif char == "Z":
+            key.append("S")
+        else:
+            # F, J, L, M, N, R
+            key.append(char)
+
+    # collapse repeated sounds, e.g. "dt" in "Schmidt"
+    key = "".join(key)
+    return str("".join([char for pos, char in enumerate(key)
+                        if pos == 0 or char != key[pos - 1]]))
+
+
+def get_name_trigrams(names):
+    """Returns the sorted list of distinct trigrams of the names
+
+    :param names: list of names (strings or unicode)
+    :returns: list of UTF-8 encoded trigrams
+    """
+    trigrams = set()
+    for name in names:
+        for word in get_words(name):
+            trigrams.update(get_trigrams(word))
+    return sorted([trigram.encode("utf8") for trigram in trigrams])
+
+
+def get_name_phonetic_keys(firstname, middlename, lastname):
+    """Returns the sorted list of distinct phonetic keys of the names, each
+    one prefixed with the name part it comes from
+
+    :returns: list of keys, e.g. ["f:JN", "l:SM0"]
+    """
+    keys = set()
+    parts = zip(NAME_PREFIXES, (firstname, middlename, lastname))
+    for prefix, name in parts:
+        for word in get_words(name):
+            key = metaphone(word)
+            if key:
+                keys.add(prefix + key)
+    return sorted(keys)
+
+
+def get_word_similarity(word, other):
+    """Returns the similarity of two folded words, from 0.0 to 1.0
+
+    The similarity is the ratio of shared trigrams. Words that sound the same
+    score at least 0.8 and words that start with the given word at least 0.7
+    """
+    if word == other:
+        return 1.0
+    trigrams = set(get_trigrams(word))
+    other_trigrams = set(get_trigrams(other))
+    score = len(trigrams & other_trigrams) / float(
+        len(trigrams | other_trigrams))
+    if metaphone(word) == metaphone(other):
+        score = max(score, 0.8)
+    if other.startswith(word):
+        score = max(score, 0.7)
+    return score
+
+
+def get_name_similarity(text, name):
+    """Returns the similarity of the searched text with a name, from 0.0 to
+    1.0, as the average of the best similarity of each searched word
+
+    :param text: searched text
+    :param name: name to compare with, e.g. the fullname of a patient
+    """
+    words = get_words(text)
+    name_words = get_words(name)
+    if not words or not name_words:
+        return 0.0
+    total = 0.0
+    for word in words:
+        total += max([get_word_similarity(word, other)
+                      for other in name_words])
+    return total / len(words)
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+"""Propagation of the patient demographics to the open samples
+
+When the name, sex, gender or birthdate of a patient changes, only these
+fields are updated in the samples of the patient that are not verified yet.
+The fields are set directly, so no sample events are fired, and only the
+indexes and metadata columns that depend on the changed fields are updated.
+
+Patients with many samples are not updated in the transaction of the change.
+They are queued in the portal instead and updated in batches by the
+`propagate_patient_changes` command.
+"""
+
+import time
+
+import transaction
+from BTrees.OOBTree import OOBTree
+from bika.lims import api
+from Products.CMFCore.indexing import processQueue
+from senaite.core.api import dtime
+from senaite.core.catalog import SAMPLE_CATALOG
+from senaite.patient import logger
+from senaite.patient.api import update_metadata_columns
+from senaite.patient.config import OPEN_SAMPLE_STATES
+from senaite.patient.config import PROPAGATION_MAX_SAMPLES
+from senaite.patient.subscribers.analysisrequest import set_ranges_fingerprint
+from senaite.patient.subscribers.analysisrequest import update_results_ranges
+from zope.annotation.interfaces import IAnnotations
+
+# Patient attribute where the demographics propagated last are stored
+DEMOGRAPHICS_KEY = "_patient_demographics"
+
+# Portal annotation key of the patients with deferred changes
+PENDING_KEY = "senaite.patient.propagation"
+
+# Demographic fields that are propagated to samples
+FIELDS = ("fullname", "sex", "gender", "birthdate")
+
+# Fields the dynamic results ranges of the sample depend on
+RANGES_FIELDS = ("sex", "birthdate")
+
+
+def get_demographics(patient):
+    """Returns a dict with the demographic values of the patient
+    """
+    return {
+        "fullname": (
+            api.safe_unicode(patient.getFirstname()),
+            api.safe_unicode(patient.getMiddlename()),
+            api.safe_unicode(patient.getLastname()),
+        ),
+        "sex": patient.getSex() or "",
+        "gender": patient.getGender() or "",
+        "birthdate": (
+            dtime.to_ansi(patient.getBirthdate(), show_time=False),
+            bool(patient.getEstimatedBirthdate()),
+        ),
+    }
+
+
+def get_sample_demographics(sample):
+    """Returns a dict with the demographic values of the sample
+    """
+    name = sample.getField("PatientFullName").get(sample) or {}
+    dob, from_age, estimated = sample.getField("DateOfBirth").get(sample)
+    return {
+        "fullname": (
+            api.safe_unicode(name.get("firstname") or u""),
+            api.safe_unicode(name.get("middlename") or u""),
+            api.safe_unicode(name.get("lastname") or u""),
+        ),
+        "sex": sample.getField("Sex").get(sample) or "",
+        "gender": sample.getField("Gender").get(sample) or "",
+        "birthdate": (dtime.to_ansi(dob, show_time=False), bool(estimated)),
+    }
+
+
+def store_demographics(patient):
+    """Stores the current demographic values of the patient as the baseline
+    the next changes are compared with
+    """
+    setattr(patient, DEMOGRAPHICS_KEY, get_demographics(patient))
+
+
+def get_changed_fields(patient):
+    """Returns the demographic fields of the patient that changed since they
+    were propagated last and stores the current values
+
+    No fields are returned if the patient has no baseline yet, the current
+    values are stored as the baseline instead
+    """
+    demographics = get_demographics(patient)
+    previous = getattr(patient, DEMOGRAPHICS_KEY, None)
+    if not previous:
+        setattr(patient, DEMOGRAPHICS_KEY, demographics)
+        return []
+    changed = [key for key in FIELDS
+               if previous.get(key) != demographics[key]]
+    if changed:
+        setattr(patient, DEMOGRAPHICS_KEY, demographics)
+    return changed
+
+
+def get_open_sample_rids(patient):
+    """Returns the record ids of the open samples linked to the patient
+
+    The samples are searched by the MRN of the patient if the sample catalog
+    has no index of the linked patient UID yet
+    """
+    # index the pending objects first, as the catalog does before searching
+    processQueue()
+    catalog = api.get_tool(SAMPLE_CATALOG)
+    query = {"review_state": OPEN_SAMPLE_STATES}
+    if "patient_uid" in catalog.indexes():
+        query["patient_uid"] = api.get_uid(patient)
+    else:
+        mrn = patient.getMRN()
+        if not mrn:
+            return []
+        query["medical_record_number"] = [mrn]
+    results = catalog(query)
+    rids = getattr(results, "_seq", None)
+    if rids is None:
+        rids = [brain.getRID() for brain in results]
+    return list(rids)
+
+
+def update_sample(sample, patient, fields):
+    """Sets the values of the given demographic fields of the patient to the
+    sample, if they differ
+
+    :returns: list of the fields that were updated
+    """
+    values = get_demographics(patient)
+    current = get_sample_demographics(sample)
+    updated = [key for key in fields if values[key] != current[key]]
+
+    for key in updated:
+        if key == "fullname":
+            firstname, middlename, lastname = values[key]
+            sample.getField("PatientFullName").set(sample, {
+                "firstname": firstname,
+                "middlename": middlename,
+                "lastname": lastname,
+            })
+        elif key == "birthdate":
+            dob = patient.getBirthdate(as_date=False)
+            estimated = values[key][1]
+            sample.getField("DateOfBirth").set(sample, (dob, False, estimated))
+        else:
+            sample.getField(key.capitalize()).set(sample, values[key])
+
+    if "fullname" in updated:
+        catalog = api.get_tool(SAMPLE_CATALOG)
+        catalog.catalog_object(sample, uid=api.get_path(sample),
+                               idxs=["listing_searchable_text"],
+                               update_metadata=0)
+        update_metadata_columns(catalog, sample, ["getPatientFullName"])
+
+    if set(updated).intersection(RANGES_FIELDS):
+        if set_ranges_fingerprint(sample):
+            update_results_ranges(sample)
+
+    return updated
+
+
+def propagate(patient, fields, rids=None, batch_size=PROPAGATION_MAX_SAMPLES,
+              commit=False):
+    """Updates the given demographic fields of the open samples of the patient
+
+    :param patient: patient object
+    :param fields: names of the demographic fields to update
+    :param rids: record ids of the samples. Default: the open samples
+    :param batch_size: number of samples between savepoints or commits
+    :param commit: commit the transaction after every batch
+    :returns: number of samples updated
+    """
+    if rids is None:
+        rids = get_open_sample_rids(patient)
+    catalog = api.get_tool(SAMPLE_CATALOG)
+    portal = api.get_portal()
+    total = len(rids)
+    updated = 0
+    start = time.time()
+    for num, rid in enumerate(rids, start=1):
+        sample = portal.unrestrictedTraverse(catalog.getpath(rid), None)
+        if sample is None:
+            continue
+        if update_sample(sample, patient, fields):
+            updated += 1
+        sample._p_deactivate()
+
+        if num % batch_size == 0:
+            if commit:
+                transaction.commit()
+            else:
+                transaction.savepoint(optimistic=True)
+            elapsed = time.time() - start
+            logger.info("Propagating changes of patient '{}': {}/{} samples "
+                        "({:.1f} samples/s)"
+                        .format(patient.getMRN(), num, total,
+                                num / elapsed if elapsed else 0))
+    return updated
+
+
+def get_pending():
+    """Returns the mapping of patient UID -> changed fields of the patients
+    with deferred changes
+    """
+    annotations = IAnnotations(api.get_portal())
+    pending = annotations.get(PENDING_KEY)
+    if pending is None:
+        pending = annotations[PENDING_KEY] = OOBTree()
+    return pending
+
+
+def defer(patient, fields):
+    """Queues the changed fields of the patient to be propagated later
+    """
+    pending = get_pending()
+    uid = api.get_uid(patient)
+    fields = set(fields).union(pending.get(uid, ()))
+    pending[uid] = tuple([key for key in FIELDS if key in fields])
+
+
+def on_patient_demographics_changed(patient):
+    """Propagates the changed demographics of the patient to its open samples
+
+    The changes are deferred if the patient has more open samples than the
+    maximum allowed for a single transaction
+    """
+    fields = get_changed_fields(patient)
+    if not fields:
+        return
+    rids = get_open_sample_rids(patient)
+    if not rids:
+        return
+    if len(rids) > PROPAGATION_MAX_SAMPLES:
+        logger.info("Deferring changes of patient '{}' to {} samples"
+                    .format(patient.getMRN(), len(rids)))
+        defer(patient, fields)
+        return
+    propagate(patient, fields, rids=rids)
+
+
+def process_pending(batch_size=PROPAGATION_MAX_SAMPLES):
+    """Propagates the deferred changes of all queued patients. The
+    transaction is committed after every batch of samples
+
+    :returns: number of patients processed
+    """
+    pending = get_pending()
+    processed = 0
+    for uid, fields in list(pending.items()):
+        patient = api.get_object_by_uid(uid, default=None)
+        if patient is not None:
+            updated = propagate(patient, fields, batch_size=batch_size,
+                                commit=True)
+            logger.info("Changes of patient '{}' propagated to {} samples"
+                        .format(patient.getMRN(), updated))
+        # the patient might have changed meanwhile
+        if pending.get(uid) == fields:
+            del pending[uid]
+        transaction.commit()
+        processed += 1
+    return processed
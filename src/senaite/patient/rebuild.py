@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+"""Targeted rebuild of catalog indexes and metadata columns
+
+Only the given indexes and metadata columns are computed for every catalogued
+object. The values are compared with the ones stored in the catalog and only
+the indexes and columns that changed are written, so objects whose values are
+up to date do not cause any write to the database.
+"""
+
+import hashlib
+import json
+import time
+
+from bika.lims import api
+from BTrees.OOBTree import OOSet
+from Missing import MV
+from Products.CMFCore.interfaces import IIndexableObject
+from Products.PluginIndexes.BooleanIndex.BooleanIndex import BooleanIndex
+from Products.PluginIndexes.KeywordIndex.KeywordIndex import KeywordIndex
+from Products.PluginIndexes.unindex import UnIndex
+from Products.PluginIndexes.unindex import _marker as _no_datum
+from senaite.patient import logger
+from senaite.patient.walker import BatchWalker
+from six import string_types
+from zope.component import queryMultiAdapter
+
+# Value of objects that are not indexed
+_missing = object()
+
+
+def get_indexable(obj, catalog):
+    """Returns the object wrapped as the catalog does for indexing
+    """
+    wrapper = queryMultiAdapter((obj, catalog), IIndexableObject)
+    if wrapper is None:
+        return obj
+    return wrapper
+
+
+def get_index_value(index, indexable):
+    """Returns the value the index would store for the object, or None if the
+    value cannot be computed without indexing the object. Values that are not
+    indexed at all are returned as an empty set for keyword indexes and as
+    `_missing` otherwise
+    """
+    attrs = index.getIndexSourceNames()
+    if len(attrs) != 1:
+        return None
+    attr = attrs[0]
+    if isinstance(index, KeywordIndex):
+        return OOSet(index._get_object_keywords(indexable, attr))
+    if not isinstance(index, UnIndex):
+        return None
+    datum = index._get_object_datum(indexable, attr)
+    if datum is _no_datum:
+        return _missing
+    if isinstance(index, BooleanIndex):
+        return int(bool(datum))
+    if datum is None:
+        return _missing
+    return index._convert(datum, default=_missing)
+
+
+def get_indexed_value(index, rid):
+    """Returns the value stored in the index for the record id
+    """
+    if isinstance(index, KeywordIndex):
+        return OOSet(index.getEntryForObject(rid, ()))
+    return index.getEntryForObject(rid, _missing)
+
+
+def is_index_changed(index, indexable, rid):
+    """Returns whether the value of the object differs from the one stored in
+    the index. Indexes whose values cannot be compared, e.g. text indexes, are
+    always considered as changed
+    """
+    value = get_index_value(index, indexable)
+    if value is None:
+        return True
+    indexed = get_indexed_value(index, rid)
+    if isinstance(value, OOSet):
+        return set(value) != set(indexed)
+    return value != indexed
+
+
+def get_metadata_value(obj, column):
+    """Returns the value of the metadata column for the object, computed as
+    the catalog does
+    """
+    value = getattr(obj, column, MV)
+    if value is not MV and callable(value):
+        value = value()
+    return value
+
+
+class IndexRebuilder(object):
+    """Rebuilds the given indexes and metadata columns of a catalog
+
+    :param catalog: catalog tool or catalog id
+    :param indexes: names of the indexes to rebuild
+    :param columns: names of the metadata columns to rebuild
+    :param query: query of the objects to rebuild. Default: all
+    :param commit_size: number of objects between commits
+    """
+
+    def __init__(self, catalog, indexes=None, columns=None, query=None,
+                 commit_size=1000):
+        if isinstance(catalog, string_types):
+            catalog = api.get_tool(catalog)
+        indexes = list(indexes or [])
+        columns = list(columns or [])
+        if not any([indexes, columns]):
+            raise ValueError("No indexes or columns to rebuild")
+        unknown = set(indexes).difference(catalog.indexes())
+        unknown.update(set(columns).difference(catalog.schema()))
+        if unknown:
+            raise ValueError("Unknown indexes or columns: {}"
+                             .format(", ".join(sorted(unknown))))
+        self.catalog = catalog
+        self.indexes = indexes
+        self.columns = columns
+        self.query = query or {}
+        self.commit_size = commit_size
+        self.processed = 0
+        self.updated = 0
+
+    @property
+    def job_id(self):
+        """Returns the ID of the job, which depends on the catalog, the
+        indexes, the columns and the query, so a rebuild with other options
+        does not resume from the checkpoint of another one
+        """
+        options = json.dumps({
+            "indexes": sorted(self.indexes),
+            "columns": sorted(self.columns),
+            "query": self.query,
+        }, sort_keys=True, default=repr)
+        digest = hashlib.md5(options.encode("utf-8")).hexdigest()
+        return "rebuild_{}_{}".format(self.catalog.getId(), digest)
+
+    def __call__(self):
+        """Rebuilds the indexes and columns of all objects
+
+        :returns: number of objects that were updated
+        """
+        walker = BatchWalker(self.catalog, self.query, self.job_id,
+                             commit_size=self.commit_size,
+                             log_size=self.commit_size, resumable=True)
+        start = time.time()
+        for brain in walker:
+            obj = api.get_object(brain)
+            if self.rebuild(obj, brain.getRID()):
+                self.updated += 1
+            self.processed += 1
+
+        elapsed = time.time() - start
+        rate = self.processed / elapsed if elapsed else 0.0
+        logger.info("{}: {} of {} objects updated ({:.1f} objects/s)"
+                    .format(self.job_id, self.updated, self.processed, rate))
+        return self.updated
+
+    def rebuild(self, obj, rid):
+        """Updates the indexes and columns of the object that changed
+
+        :returns: True if any index or column was updated
+        """
+        _catalog = self.catalog._catalog
+        indexable = get_indexable(obj, self.catalog)
+
+        idxs = []
+        for name in self.indexes:
+            index = _catalog.getIndex(name)
+            if is_index_changed(index, indexable, rid):
+                idxs.append(name)
+
+        record = list(_catalog.data[rid])
+        changed = False
+        for column in self.columns:
+            value = get_metadata_value(indexable, column)
+            pos = _catalog.schema[column]
+            if value != record[pos]:
+                record[pos] = value
+                changed = True
+
+        if idxs:
+            path = _catalog.paths[rid]
+            self.catalog.catalog_object(obj, uid=path, idxs=idxs,
+                                        update_metadata=0)
+        if changed:
+            _catalog.data[rid] = tuple(record)
+
+        obj._p_deactivate()
+        return bool(idxs) or changed
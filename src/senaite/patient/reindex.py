@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+"""Partitioned reindexing of catalogs
+
+The UID space of a catalog is split into hash partitions, so several worker
+processes, each one with its own ZODB connection (e.g. ZEO clients), can
+reindex the catalog in parallel. Every worker reindexes the objects of its
+partition in batches and commits after every batch, together with the
+progress of the partition. Batches that fail with a write conflict are
+retried.
+
+The progress of each partition is kept in its own persistent mapping, so
+workers do not write the same objects, apart from the catalog itself.
+"""
+
+import random
+import time
+import zlib
+from itertools import islice
+
+import transaction
+from Acquisition import aq_base
+from Acquisition import aq_inner
+from Acquisition import aq_parent
+from persistent.mapping import PersistentMapping
+from senaite.patient import logger
+from six import text_type
+from ZODB.POSException import ConflictError
+from zope.annotation.interfaces import IAnnotations
+
+# Portal annotation key of the progress of a reindex job of a catalog
+PROGRESS_KEY = "senaite.patient.reindex.{}"
+
+
+def get_partition(uid, partitions):
+    """Returns the partition of the UID, from 0 to partitions - 1
+    """
+    if isinstance(uid, text_type):
+        uid = uid.encode("utf8")
+    return (zlib.crc32(uid) & 0xffffffff) % partitions
+
+
+def iter_partition(catalog, partition, partitions, after=None):
+    """Generator of (UID, record id) of the catalogued objects of the
+    partition, in the order of their UIDs
+
+    :param catalog: catalog with a "UID" index
+    :param partition: number of the partition, from 0 to partitions - 1
+    :param partitions: total number of partitions
+    :param after: UID to start after
+    """
+    index = catalog._catalog.getIndex("UID")
+    forward = aq_base(index)._index
+    if after is None:
+        items = forward.items()
+    else:
+        items = forward.items(after, excludemin=True)
+    for uid, rid in items:
+        if get_partition(uid, partitions) == partition:
+            yield uid, rid
+
+
+def new_progress():
+    """Returns a new persistent mapping for the progress of a partition
+    """
+    progress = PersistentMapping()
+    progress["uid"] = None
+    progress["processed"] = 0
+    progress["total"] = None
+    progress["done"] = False
+    return progress
+
+
+def get_job(container, catalog_id, partitions):
+    """Returns the persistent mapping of partition -> progress of the reindex
+    job of the catalog, created if necessary
+
+    An existing job is resumed, unless it was started with a different number
+    of partitions or all its partitions are done
+
+    :param container: annotatable object the job is stored in, e.g. the portal
+    """
+    annotations = IAnnotations(container)
+    key = PROGRESS_KEY.format(catalog_id)
+    job = annotations.get(key)
+    if job is None or len(job) != partitions or is_job_done(job):
+        job = PersistentMapping()
+        for partition in range(partitions):
+            job[partition] = new_progress()
+        annotations[key] = job
+    return job
+
+
+def remove_job(container, catalog_id):
+    """Removes the reindex job of the catalog
+    """
+    IAnnotations(container).pop(PROGRESS_KEY.format(catalog_id), None)
+
+
+def is_job_done(job):
+    """Returns whether all partitions of the job are done
+    """
+    return all([progress["done"] for progress in job.values()])
+
+
+def get_job_progress(job):
+    """Returns a tuple of (processed, total) objects of all partitions. The
+    total is None while any of the partitions was not counted yet
+    """
+    processed = sum([progress["processed"] for progress in job.values()])
+    totals = [progress["total"] for progress in job.values()]
+    if None in totals:
+        return processed, None
+    return processed, sum(totals)
+
+
+class PartitionReindexer(object):
+    """Reindexes the objects of a partition of the catalog
+
+    :param catalog: catalog to reindex
+    :param partition: number of the partition, from 0 to partitions - 1
+    :param partitions: total number of partitions
+    :param progress: persistent mapping to keep the progress of the partition
+    :param idxs: names of the indexes to update. Default: all
+    :param update_metadata: update the metadata columns as well
+    :param batch_size: number of objects between commits
+    :param retries: number of times a batch is retried after a conflict
+    """
+
+    def __init__(self, catalog, partition, partitions, progress, idxs=None,
+                 update_metadata=True, batch_size=500, retries=5):
+        if not 0 <= partition < partitions:
+            raise ValueError("Partition must be between 0 and {}"
+                             .format(partitions - 1))
+        if batch_size < 1:
+            raise ValueError("Batch size must be greater than 0")
+        self.catalog = catalog
+        self.partition = partition
+        self.partitions = partitions
+        self.progress = progress
+        self.idxs = list(idxs or [])
+        self.update_metadata = update_metadata
+        self.batch_size = batch_size
+        self.retries = retries
+        self.conflicts = 0
+
+    def __repr__(self):
+        return "<PartitionReindexer {}/{} of {}>".format(
+            self.partition + 1, self.partitions, self.catalog.getId())
+
+    def __call__(self):
+        """Reindexes the objects of the partition
+
+        :returns: number of objects reindexed
+        """
+        progress = self.progress
+        if progress["total"] is None:
+            total = sum(1 for item in iter_partition(
+                self.catalog, self.partition, self.partitions))
+            self.commit(self.set_total, total)
+
+        start = time.time()
+        offset = progress["processed"]
+        while True:
+            batch = list(islice(iter_partition(
+                self.catalog, self.partition, self.partitions,
+                after=progress["uid"]), self.batch_size))
+            if not batch:
+                break
+            self.commit(self.reindex_batch, batch)
+            self.catalog._p_jar.cacheMinimize()
+
+            elapsed = time.time() - start
+            done = progress["processed"] - offset
+            logger.info("{}: {}/{} objects ({:.1f} objects/s)"
+                        .format(repr(self), progress["processed"],
+                                progress["total"],
+                                done / elapsed if elapsed else 0))
+
+        self.commit(self.set_done)
+        return progress["processed"] - offset
+
+    def commit(self, func, *args):
+        """Calls the function and commits the transaction. The function is
+        called again if the commit fails because of a write conflict
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                func(*args)
+                transaction.commit()
+                return
+            except ConflictError:
+                transaction.abort()
+                self.conflicts += 1
+                if attempt == self.retries:
+                    raise
+                logger.warn("{}: conflict error, retrying ({}/{})"
+                            .format(repr(self), attempt + 1, self.retries))
+                # wait a bit, so the workers do not collide again
+                time.sleep(random.uniform(0, 0.1 * 2 ** attempt))
+
+    def set_total(self, total):
+        self.progress["total"] = total
+
+    def set_done(self):
+        self.progress["done"] = True
+
+    def reindex_batch(self, batch):
+        """Reindexes the objects of the batch and updates the progress
+        """
+        container = aq_parent(aq_inner(self.catalog))
+        for uid, rid in batch:
+            path = self.catalog.getpath(rid)
+            obj = container.unrestrictedTraverse(path, None)
+            if obj is None:
+                logger.warn("{}: cannot resolve {}".format(repr(self), path))
+                continue
+            self.catalog.catalog_object(obj, uid=path, idxs=self.idxs,
+                                        update_metadata=self.update_metadata)
+        self.progress["uid"] = batch[-1][0]
+        self.progress["processed"] += len(batch)
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+"""Sample statistics of patients
+
+The number of samples, the number of open samples and the date of the last
+sample of a patient are stored in the patient and updated incrementally when
+a sample is created, transitioned, linked to another patient or removed. The
+patient listings are rendered from the catalog metadata of these values, so
+no samples have to be searched for each patient.
+"""
+
+from Acquisition import aq_base
+from BTrees.Length import Length
+from BTrees.OOBTree import OOBTree
+from bika.lims import api
+from persistent import Persistent
+from senaite.patient.api import get_sample_patient_uid
+from senaite.patient.config import OPEN_SAMPLE_STATES
+from senaite.patient.config import PATIENT_SAMPLE_STATS
+from senaite.patient.config import SAMPLE_STATS_PATIENT_UID
+from senaite.patient.instrumentation import instrument
+
+# Indexes of the patient catalog that depend on the sample statistics
+STATS_INDEXES = (
+    "patient_sample_count",
+    "patient_open_sample_count",
+    "patient_last_sample_date",
+)
+
+
+class SampleStats(Persistent):
+    """Statistics of the samples of a patient
+
+    An entry of (date, open) is kept for every sample, so the statistics can
+    be updated for a single sample without searching the other ones. The
+    number of samples per date is kept as well, so the date of the last sample
+    is looked up without walking all entries.
+
+    The counters are `BTrees.Length` objects and the entries are kept in
+    BTrees, so concurrent updates for different samples of the same patient
+    resolve their conflicts. The statistics object itself is not written after
+    it was created
+    """
+
+    def __init__(self):
+        # sample UID -> (date, open)
+        self.samples = OOBTree()
+        # date -> number of samples created at this date
+        self.dates = OOBTree()
+        self.counter = Length()
+        self.open_counter = Length()
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, uid):
+        return uid in self.samples
+
+    @property
+    def count(self):
+        """Returns the number of samples
+        """
+        return self.counter()
+
+    @property
+    def open_count(self):
+        """Returns the number of open samples
+        """
+        return self.open_counter()
+
+    @property
+    def last_date(self):
+        """Returns the date of the last sample or None
+        """
+        if not self.dates:
+            return None
+        return self.dates.maxKey()
+
+    def get(self, uid, default=None):
+        """Returns the (date, open) entry of the sample with the given UID
+        """
+        return self.samples.get(uid, default)
+
+    def set(self, uid, date, is_open):
+        """Adds or updates the entry of the sample with the given UID
+
+        :returns: True if the statistics changed, False otherwise
+        """
+        entry = (date, bool(is_open))
+        current = self.samples.get(uid)
+        if current == entry:
+            return False
+        self.samples[uid] = entry
+        if current is None:
+            self.counter.change(1)
+            current = (None, False)
+        opened = int(entry[1]) - int(current[1])
+        if opened:
+            self.open_counter.change(opened)
+        if current[0] != date:
+            self.remove_date(current[0])
+            self.add_date(date)
+        return True
+
+    def remove(self, uid):
+        """Removes the entry of the sample with the given UID
+
+        :returns: True if the statistics changed, False otherwise
+        """
+        current = self.samples.pop(uid, None)
+        if current is None:
+            return False
+        self.counter.change(-1)
+        if current[1]:
+            self.open_counter.change(-1)
+        self.remove_date(current[0])
+        return True
+
+    def add_date(self, date):
+        """Counts a sample for the given date
+        """
+        if date is None:
+            return
+        self.dates[date] = self.dates.get(date, 0) + 1
+
+    def remove_date(self, date):
+        """Discounts a sample for the given date
+        """
+        if date is None:
+            return
+        num = self.dates.get(date, 0) - 1
+        if num > 0:
+            self.dates[date] = num
+        else:
+            self.dates.pop(date, None)
+
+
+def get_sample_stats(patient, create=False):
+    """Returns the sample statistics of the patient
+
+    :param patient: patient object
+    :param create: create the statistics if the patient has none yet
+    :returns: SampleStats or None
+    """
+    stats = getattr(aq_base(patient), PATIENT_SAMPLE_STATS, None)
+    if stats is None and create:
+        stats = SampleStats()
+        setattr(patient, PATIENT_SAMPLE_STATS, stats)
+    return stats
+
+
+def get_sample_count(patient):
+    """Returns the number of samples of the patient
+    """
+    stats = get_sample_stats(patient)
+    return stats.count if stats else 0
+
+
+def get_open_sample_count(patient):
+    """Returns the number of samples of the patient that are not verified yet
+    """
+    stats = get_sample_stats(patient)
+    return stats.open_count if stats else 0
+
+
+def get_last_sample_date(patient):
+    """Returns the creation date of the last sample of the patient or None
+    """
+    stats = get_sample_stats(patient)
+    return stats.last_date if stats else None
+
+
+def get_sample_entry(sample):
+    """Returns the (date, open) entry of the sample for the statistics
+
+    Partitions are not counted, same as in the samples listings
+
+    :param sample: sample object
+    :returns: tuple of (creation date, open) or None
+    """
+    if sample.isPartition():
+        return None
+    is_open = api.get_review_status(sample) in OPEN_SAMPLE_STATES
+    return sample.created(), is_open
+
+
+def get_patient(uid):
+    """Returns the patient with the given UID, regardless of the permissions
+    of the current user and of its status
+    """
+    if not api.is_uid(uid):
+        return None
+    patient = api.get_object_by_uid(uid, default=None)
+    if patient is None or api.get_portal_type(patient) != "Patient":
+        return None
+    return patient
+
+
+def reindex_sample_stats(patient):
+    """Reindexes the indexes and metadata of the patient that depend on the
+    sample statistics
+    """
+    patient.reindexObject(idxs=list(STATS_INDEXES))
+
+
+@instrument("samplestats.update_sample_stats")
+def update_sample_stats(sample, reindex=True):
+    """Updates the statistics of the patient linked to the sample
+
+    The sample is removed from the statistics of the patient it was counted
+    for before, if the sample was linked to another patient meanwhile
+
+    :param sample: sample object
+    :param reindex: reindex the patients whose statistics changed
+    :returns: list of patients whose statistics changed
+    """
+    uid = api.get_uid(sample)
+    counted_uid = getattr(aq_base(sample), SAMPLE_STATS_PATIENT_UID, None)
+    entry = get_sample_entry(sample)
+    patient = None
+    if entry is not None:
+        patient = get_patient(get_sample_patient_uid(sample))
+    patient_uid = api.get_uid(patient) if patient else None
+
+    changed = []
+    if counted_uid and counted_uid != patient_uid:
+        other = get_patient(counted_uid)
+        stats = get_sample_stats(other) if other else None
+        if stats and stats.remove(uid):
+            changed.append(other)
+
+    if patient:
+        stats = get_sample_stats(patient, create=True)
+        if stats.set(uid, *entry):
+            changed.append(patient)
+
+    if counted_uid != patient_uid:
+        setattr(sample, SAMPLE_STATS_PATIENT_UID, patient_uid)
+
+    if reindex:
+        for obj in changed:
+            reindex_sample_stats(obj)
+    return changed
+
+
+def remove_sample_stats(sample, reindex=True):
+    """Removes the sample from the statistics of the patient it is counted for
+
+    :param sample: sample object
+    :param reindex: reindex the patient if its statistics changed
+    :returns: the patient whose statistics changed or None
+    """
+    counted_uid = getattr(aq_base(sample), SAMPLE_STATS_PATIENT_UID, None)
+    patient = get_patient(counted_uid) if counted_uid else None
+    stats = get_sample_stats(patient) if patient else None
+    if not stats or not stats.remove(api.get_uid(sample)):
+        return None
+    if reindex:
+        reindex_sample_stats(patient)
+    return patient
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+"""Console commands of senaite.patient
+
+Commands are registered as `zopectl.command` entry points and are run from
+the buildout directory, e.g.:
+
+    bin/instance import_patients --site senaite patients.csv
+"""
+
+import argparse
+import logging
+
+from AccessControl.SecurityManagement import newSecurityManager
+from senaite.patient.interfaces import ISenaitePatientLayer
+from Testing.makerequest import makerequest
+from zope.component.hooks import setSite
+from zope.globalrequest import setRequest
+from zope.interface import alsoProvides
+
+
+def get_parser(description):
+    """Returns an argument parser with the options common to all commands
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "--site", "-s", default=None,
+        help="ID of the SENAITE site. Default: the first site found")
+    parser.add_argument(
+        "--user", "-u", default="admin",
+        help="User to run the command as. Default: admin")
+    return parser
+
+
+def setup_site(app, site_id=None, username="admin"):
+    """Prepares the site, request and security manager to run a command
+
+    :param app: Zope application root
+    :param site_id: ID of the site. The first site found if None
+    :param username: name of the user to run the command as
+    :returns: the site
+    """
+    logging.basicConfig(level=logging.INFO)
+
+    app = makerequest(app)
+    if site_id:
+        site = app[site_id]
+    else:
+        sites = app.objectValues("Plone Site")
+        if not sites:
+            raise ValueError("No site found")
+        site = sites[0]
+
+    setSite(site)
+
+    # mark the request with the browser layer, so the product is reported
+    # as installed, as it happens on traversal
+    request = app.REQUEST
+    alsoProvides(request, ISenaitePatientLayer)
+    setRequest(request)
+
+    acl_users = site.acl_users
+    user = acl_users.getUser(username)
+    if user is None:
+        acl_users = app.acl_users
+        user = acl_users.getUser(username)
+    if user is None:
+        raise ValueError("User not found: {}".format(username))
+    newSecurityManager(request, user.__of__(acl_users))
+
+    return site
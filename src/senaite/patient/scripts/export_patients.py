@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+
+"""Exports patients to a CSV or JSONL file
+
+Usage:
+
+    bin/instance export_patients [--site SITE] [--state all] patients.csv
+
+Use "-" as the path to write to the standard output.
+"""
+
+import sys
+
+from senaite.patient import logger
+from senaite.patient.exporter import FILTERS
+from senaite.patient.exporter import export_patients
+from senaite.patient.scripts import get_parser
+from senaite.patient.scripts import setup_site
+
+
+def main(app, args):
+    parser = get_parser(__doc__.strip().splitlines()[0])
+    parser.add_argument("path", help="Path of the file to write")
+    parser.add_argument(
+        "--format", "-f", dest="file_format", choices=["csv", "jsonl"],
+        default=None,
+        help="Format of the file. Default: guessed from the extension")
+    parser.add_argument(
+        "--state", default="active", choices=sorted(FILTERS.keys()),
+        help="Patients to export. Default: active")
+    options = parser.parse_args(args)
+
+    file_format = options.file_format
+    if not file_format:
+        file_format = "jsonl" if options.path.endswith(".jsonl") else "csv"
+
+    setup_site(app, options.site, options.user)
+
+    if options.path == "-":
+        export_patients(sys.stdout, review_state=options.state,
+                        file_format=file_format)
+        return
+
+    with open(options.path, "wb") as output:
+        size = export_patients(output, review_state=options.state,
+                               file_format=file_format)
+    logger.info("Exported {} patients to {} ({} bytes)"
+                .format(options.state, options.path, size))
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+"""Searches candidate duplicate patients
+
+Usage:
+
+    bin/instance find_duplicate_patients [--site SITE] [--min-score 0.75]
+
+The report is stored in the site and listed in the "duplicate-patients" view
+of the patients folder.
+"""
+
+import transaction
+from senaite.patient import logger
+from senaite.patient.duplicates import MAX_BLOCK_SIZE
+from senaite.patient.duplicates import MAX_CANDIDATES
+from senaite.patient.duplicates import MIN_SCORE
+from senaite.patient.duplicates import find_duplicates
+from senaite.patient.scripts import get_parser
+from senaite.patient.scripts import setup_site
+
+
+def main(app, args):
+    parser = get_parser(__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--min-score", type=float, default=MIN_SCORE,
+        help="Minimum score of a pair, from 0 to 1. Default: {}"
+             .format(MIN_SCORE))
+    parser.add_argument(
+        "--max-block-size", type=int, default=MAX_BLOCK_SIZE,
+        help="Blocks with more patients are skipped. Default: {}"
+             .format(MAX_BLOCK_SIZE))
+    parser.add_argument(
+        "--max-candidates", type=int, default=MAX_CANDIDATES,
+        help="Maximum number of pairs to report. Default: {}"
+             .format(MAX_CANDIDATES))
+    options = parser.parse_args(args)
+
+    setup_site(app, options.site, options.user)
+
+    report = find_duplicates(min_score=options.min_score,
+                             max_block_size=options.max_block_size,
+                             max_candidates=options.max_candidates)
+    transaction.commit()
+
+    logger.info("{} candidates found among {} patients ({} blocks, {} "
+                "skipped, {} pairs scored) in {}s"
+                .format(len(report["candidates"]), report["patients"],
+                        report["blocks"], report["skipped_blocks"],
+                        report["pairs"], report["seconds"]))
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+
+"""Imports patients from a CSV or JSONL file
+
+Usage:
+
+    bin/instance import_patients [--site SITE] [--job JOB] patients.csv
+
+Running the same job again after an interruption resumes the import.
+"""
+
+from senaite.patient import logger
+from senaite.patient.importer import import_patients
+from senaite.patient.scripts import get_parser
+from senaite.patient.scripts import setup_site
+
+
+def main(app, args):
+    parser = get_parser(__doc__.strip().splitlines()[0])
+    parser.add_argument("path", help="Path of the CSV or JSONL file")
+    parser.add_argument(
+        "--format", "-f", dest="file_format", choices=["csv", "jsonl"],
+        help="Format of the file. Default: guessed from the extension")
+    parser.add_argument(
+        "--container", "-c", default=None,
+        help="Path of the folder where patients are created, relative to "
+             "the site. Default: the patients folder")
+    parser.add_argument(
+        "--job", "-j", default=None,
+        help="ID of the import job. Default: the name of the file")
+    parser.add_argument(
+        "--savepoint-size", type=int, default=100,
+        help="Number of records between savepoints. Default: 100")
+    parser.add_argument(
+        "--commit-size", type=int, default=1000,
+        help="Number of records between commits. Default: 1000")
+    options = parser.parse_args(args)
+
+    site = setup_site(app, options.site, options.user)
+    container = None
+    if options.container:
+        container = site.unrestrictedTraverse(options.container)
+
+    summary = import_patients(
+        options.path,
+        file_format=options.file_format,
+        container=container,
+        job_id=options.job,
+        savepoint_size=options.savepoint_size,
+        commit_size=options.commit_size)
+
+    logger.info("{created} patients created, {skipped} skipped, {errors} "
+                "errors in {seconds}s ({rate} patients/s)".format(**summary))
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+"""Merges a duplicate patient into another patient
+
+Usage:
+
+    bin/instance merge_patients [--site SITE] MRN DUPLICATE_MRN
+
+The samples of the duplicate patient are re-linked to the patient with the
+first MRN and the duplicate patient is deactivated.
+"""
+
+import transaction
+from senaite.patient import logger
+from senaite.patient.api import get_patient_by_mrn
+from senaite.patient.merge import merge_patients
+from senaite.patient.scripts import get_parser
+from senaite.patient.scripts import setup_site
+
+
+def main(app, args):
+    parser = get_parser(__doc__.strip().splitlines()[0])
+    parser.add_argument("mrn", help="MRN of the patient to keep")
+    parser.add_argument("duplicate", help="MRN of the duplicate patient")
+    parser.add_argument(
+        "--batch-size", type=int, default=500,
+        help="Number of samples between savepoints. Default: 500")
+    options = parser.parse_args(args)
+
+    setup_site(app, options.site, options.user)
+
+    patient = get_patient_by_mrn(options.mrn, include_inactive=True)
+    duplicate = get_patient_by_mrn(options.duplicate, include_inactive=True)
+    for mrn, obj in ((options.mrn, patient), (options.duplicate, duplicate)):
+        if obj is None:
+            parser.error("No patient found with MRN '{}'".format(mrn))
+
+    total = merge_patients(patient, duplicate, batch_size=options.batch_size)
+    transaction.commit()
+    logger.info("{} samples re-linked from '{}' to '{}'"
+                .format(total, options.duplicate, options.mrn))
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+"""Propagates the deferred changes of patients to their open samples
+
+Usage:
+
+    bin/instance propagate_patient_changes [--site SITE]
+
+Changes of patients with many samples are deferred when the propagation of
+patient changes is enabled in the patient settings.
+"""
+
+from senaite.patient import logger
+from senaite.patient.config import PROPAGATION_MAX_SAMPLES
+from senaite.patient.propagation import process_pending
+from senaite.patient.scripts import get_parser
+from senaite.patient.scripts import setup_site
+
+
+def main(app, args):
+    parser = get_parser(__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--batch-size", type=int, default=PROPAGATION_MAX_SAMPLES,
+        help="Number of samples between commits. Default: {}"
+             .format(PROPAGATION_MAX_SAMPLES))
+    options = parser.parse_args(args)
+
+    setup_site(app, options.site, options.user)
+
+    processed = process_pending(batch_size=options.batch_size)
+    logger.info("Changes of {} patients propagated".format(processed))
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+"""Rebuilds the given indexes and metadata columns of a catalog
+
+Usage:
+
+    bin/instance rebuild_indexes [--site SITE] CATALOG \\
+        --indexes medical_record_number,is_temporary_mrn \\
+        --columns getMedicalRecordNumberValue
+
+Only the given indexes and columns are computed for every catalogued object,
+and only the ones whose values changed are written. The transaction is
+committed in batches and an interrupted rebuild resumes when the command is
+run again.
+"""
+
+import transaction
+from senaite.core.catalog import SAMPLE_CATALOG
+from senaite.patient.catalog import PATIENT_CATALOG
+from senaite.patient.rebuild import IndexRebuilder
+from senaite.patient.scripts import get_parser
+from senaite.patient.scripts import setup_site
+
+
+def split(value):
+    """Returns the non-empty items of a comma separated string
+    """
+    items = [item.strip() for item in (value or "").split(",")]
+    return filter(None, items)
+
+
+def main(app, args):
+    parser = get_parser(__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "catalog", choices=[PATIENT_CATALOG, SAMPLE_CATALOG],
+        help="ID of the catalog")
+    parser.add_argument(
+        "--indexes", "-i", default=None,
+        help="Comma separated names of the indexes to rebuild")
+    parser.add_argument(
+        "--columns", "-c", default=None,
+        help="Comma separated names of the metadata columns to rebuild")
+    parser.add_argument(
+        "--portal-type", "-t", default=None,
+        help="Rebuild the objects of this portal type only")
+    parser.add_argument(
+        "--batch-size", type=int, default=1000,
+        help="Number of objects between commits. Default: 1000")
+    options = parser.parse_args(args)
+
+    setup_site(app, options.site, options.user)
+
+    query = {}
+    if options.portal_type:
+        query["portal_type"] = options.portal_type
+
+    try:
+        rebuilder = IndexRebuilder(
+            options.catalog, indexes=split(options.indexes),
+            columns=split(options.columns), query=query,
+            commit_size=options.batch_size)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    rebuilder()
+    transaction.commit()
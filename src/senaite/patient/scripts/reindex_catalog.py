@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+"""Reindexes a catalog with several worker processes in parallel
+
+Usage:
+
+    bin/instance reindex_catalog [--site SITE] --workers 4 CATALOG
+
+The UID space of the catalog is split into as many partitions as workers.
+Each worker is a separate `bin/instance reindex_catalog --partition N`
+process with its own ZODB connection, so the database must be served by a
+ZEO server. This process reports the progress until all workers are done.
+
+An interrupted job is resumed when it is run again with the same number of
+workers.
+"""
+
+import subprocess
+import time
+from datetime import timedelta
+
+import transaction
+from bika.lims import api
+from senaite.core.catalog import SAMPLE_CATALOG
+from senaite.patient import logger
+from senaite.patient.catalog import PATIENT_CATALOG
+from senaite.patient.catalog.patient_catalog import INDEXES as PATIENT_INDEXES
+from senaite.patient.reindex import PartitionReindexer
+from senaite.patient.reindex import get_job
+from senaite.patient.reindex import get_job_progress
+from senaite.patient.reindex import is_job_done
+from senaite.patient.reindex import remove_job
+from senaite.patient.scripts import get_parser
+from senaite.patient.scripts import setup_site
+from senaite.patient.setuphandlers import INDEXES as SETUP_INDEXES
+
+
+def get_patient_indexes(catalog_id):
+    """Returns the names of the indexes senaite.patient adds to the catalog
+    """
+    if catalog_id == PATIENT_CATALOG:
+        return [index[0] for index in PATIENT_INDEXES]
+    return [index[1] for index in SETUP_INDEXES if index[0] == catalog_id]
+
+
+def get_worker_args(options, partition):
+    """Returns the command line of the worker for the given partition
+    """
+    args = [
+        options.instance, "reindex_catalog", options.catalog,
+        "--partitions", str(options.workers),
+        "--partition", str(partition),
+        "--batch-size", str(options.batch_size),
+        "--user", options.user,
+    ]
+    if options.site:
+        args.extend(["--site", options.site])
+    if options.indexes:
+        args.extend(["--indexes", options.indexes])
+    if options.patient_indexes:
+        args.append("--patient-indexes")
+    if options.no_metadata:
+        args.append("--no-metadata")
+    return args
+
+
+def run_worker(site, catalog, idxs, options):
+    """Reindexes the partition of this worker
+    """
+    job = get_job(site, options.catalog, options.partitions)
+    transaction.commit()
+    progress = job[options.partition]
+    reindexer = PartitionReindexer(
+        catalog, options.partition, options.partitions, progress,
+        idxs=idxs, update_metadata=not options.no_metadata,
+        batch_size=options.batch_size)
+    reindexed = reindexer()
+    logger.info("{}: {} objects reindexed, {} conflicts"
+                .format(repr(reindexer), reindexed, reindexer.conflicts))
+
+
+def run_coordinator(site, options):
+    """Starts a worker process for every partition and reports the progress
+    until all of them finished
+    """
+    job = get_job(site, options.catalog, options.workers)
+    transaction.commit()
+
+    workers = []
+    for partition in range(options.workers):
+        args = get_worker_args(options, partition)
+        logger.info("Starting worker: {}".format(" ".join(args)))
+        workers.append(subprocess.Popen(args))
+
+    start = time.time()
+    offset = None
+    while True:
+        running = [worker for worker in workers if worker.poll() is None]
+        # start a new transaction to see the changes of the workers
+        transaction.abort()
+        processed, total = get_job_progress(job)
+        if offset is None:
+            offset = processed
+        elapsed = time.time() - start
+        rate = (processed - offset) / elapsed if elapsed else 0.0
+        eta = "-"
+        if total is not None and rate:
+            eta = str(timedelta(seconds=int((total - processed) / rate)))
+        logger.info("{}: {}/{} objects, {} workers running ({:.1f} "
+                    "objects/s, ETA {})"
+                    .format(options.catalog, processed, total or "?",
+                            len(running), rate, eta))
+        if not running:
+            break
+        time.sleep(options.interval)
+
+    failed = [num for num, worker in enumerate(workers) if worker.returncode]
+    if failed or not is_job_done(job):
+        logger.error("{}: partitions {} failed, run the command again to "
+                     "resume".format(options.catalog, failed))
+        return
+
+    remove_job(site, options.catalog)
+    transaction.commit()
+    logger.info("{}: {} objects reindexed in {:.0f}s"
+                .format(options.catalog, processed, time.time() - start))
+
+
+def main(app, args):
+    parser = get_parser(__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "catalog", choices=[PATIENT_CATALOG, SAMPLE_CATALOG],
+        help="ID of the catalog to reindex")
+    parser.add_argument(
+        "--indexes", "-i", default=None,
+        help="Comma separated names of the indexes to reindex. Default: all")
+    parser.add_argument(
+        "--patient-indexes", action="store_true",
+        help="Reindex the indexes added by senaite.patient only")
+    parser.add_argument(
+        "--no-metadata", action="store_true",
+        help="Do not update the metadata columns")
+    parser.add_argument(
+        "--workers", "-w", type=int, default=4,
+        help="Number of worker processes. Default: 4")
+    parser.add_argument(
+        "--instance", default="bin/instance",
+        help="Script to start the workers with. Default: bin/instance")
+    parser.add_argument(
+        "--interval", type=int, default=10,
+        help="Seconds between progress reports. Default: 10")
+    parser.add_argument(
+        "--batch-size", type=int, default=500,
+        help="Number of objects between commits. Default: 500")
+    parser.add_argument(
+        "--partitions", type=int, default=1, help="Internal")
+    parser.add_argument(
+        "--partition", type=int, default=None, help="Internal")
+    options = parser.parse_args(args)
+
+    partition = options.partition
+    if partition is not None and not 0 <= partition < options.partitions:
+        parser.error("--partition must be between 0 and {}"
+                     .format(options.partitions - 1))
+
+    site = setup_site(app, options.site, options.user)
+    catalog = api.get_tool(options.catalog)
+
+    idxs = []
+    if options.indexes:
+        idxs = [name.strip() for name in options.indexes.split(",")]
+    if options.patient_indexes:
+        idxs.extend(get_patient_indexes(options.catalog))
+    unknown = set(idxs).difference(catalog.indexes())
+    if unknown:
+        parser.error("Unknown indexes: {}".format(", ".join(unknown)))
+
+    if options.partition is None:
+        run_coordinator(site, options)
+    else:
+        run_worker(site, catalog, idxs, options)
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+import threading
+
+from bika.lims import api
+from plone.registry.interfaces import IRegistry
+from zope.component import getUtility
+from zope.schema import getFieldsInOrder
+
+REGISTRY_PREFIX = "senaite.patient"
+
+# Request attribute where the settings of the current request are kept
+REQUEST_KEY = "_v_senaite_patient_settings"
+
+_marker = object()
+
+# Process-wide snapshots of portal path -> (key, settings)
+_snapshots = {}
+_lock = threading.Lock()
+
+
+class PatientSettings(object):
+    """Immutable snapshot of the senaite.patient registry records
+    """
+
+    def __init__(self, values):
+        self.__dict__["_values"] = values
+
+    def __getattr__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Patient settings are read-only")
+
+    def __delattr__(self, name):
+        raise AttributeError("Patient settings are read-only")
+
+    def get(self, name, default=None):
+        """Returns the value of the setting or default if not set
+        """
+        return self._values.get(name, default)
+
+
+def get_settings_fields():
+    """Returns a list of (name, field) tuples of the control panel schema
+    """
+    # avoid circular imports
+    from senaite.patient.browser.controlpanel import IPatientControlPanel
+    return getFieldsInOrder(IPatientControlPanel)
+
+
+def get_record_name(name):
+    """Returns the name of the registry record of the setting
+    """
+    return "{}.{}".format(REGISTRY_PREFIX, name)
+
+
+def load_settings(registry=None):
+    """Reads all senaite.patient registry records into a new snapshot
+
+    Records that do not exist in the registry are set to the default value of
+    the field of the control panel schema
+
+    :returns: PatientSettings object
+    """
+    if registry is None:
+        registry = getUtility(IRegistry)
+    values = {}
+    for name, field in get_settings_fields():
+        value = registry.get(get_record_name(name), _marker)
+        if value is _marker:
+            value = field.default
+        if isinstance(value, list):
+            value = tuple(value)
+        values[name] = value
+    return PatientSettings(values)
+
+
+def get_settings_key(registry=None):
+    """Returns the raw values of the senaite.patient registry records
+
+    The values are read from the storage of the registry records, that is
+    invalidated by the ZODB in all ZEO clients when a record changes, so a
+    snapshot can be checked without persisting a version counter
+
+    :returns: tuple of values or None if the values cannot be read
+    """
+    if registry is None:
+        registry = getUtility(IRegistry)
+    records = getattr(registry, "records", None)
+    values = getattr(records, "_values", None)
+    if values is None:
+        return None
+    key = []
+    for name, field in get_settings_fields():
+        value = values.get(get_record_name(name), _marker)
+        if isinstance(value, list):
+            value = tuple(value)
+        key.append(value)
+    return tuple(key)
+
+
+def get_settings():
+    """Returns the snapshot of the senaite.patient registry records
+
+    The snapshot is loaded once and shared by all threads until a record
+    changes. The records are checked only once per request
+
+    :returns: PatientSettings object
+    """
+    request = api.get_request()
+    # Note we look up the instance dict, cause a missing attribute makes the
+    # request to search through its form, cookies and environ
+    request_dict = getattr(request, "__dict__", {})
+    settings = request_dict.get(REQUEST_KEY)
+    if settings is not None:
+        return settings
+
+    registry = getUtility(IRegistry)
+    path = api.get_path(api.get_portal())
+    key = get_settings_key(registry)
+    snapshot = _snapshots.get(path)
+    if snapshot is None or key is None or snapshot[0] != key:
+        with _lock:
+            snapshot = (key, load_settings(registry))
+            _snapshots[path] = snapshot
+
+    settings = snapshot[1]
+    if request is not None:
+        request_dict[REQUEST_KEY] = settings
+    return settings
+
+
+def invalidate_settings():
+    """Discards the snapshots of the patient settings of this process
+
+    Snapshots of other ZEO clients are discarded when they see the changed
+    registry records
+    """
+    with _lock:
+        _snapshots.clear()
+
+    request = api.get_request()
+    request_dict = getattr(request, "__dict__", {})
+    request_dict.pop(REQUEST_KEY, None)
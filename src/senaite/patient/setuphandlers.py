@@ -28,7 +28,12 @@ from senaite.core.workflow import SAMPLE_WORKFLOW
 from senaite.patient import PRODUCT_NAME
 from senaite.patient import logger
 from senaite.patient import permissions
+from senaite.patient.api import normalize_mrn
+from senaite.patient.catalog import PATIENT_CATALOG
 from senaite.patient.catalog.patient_catalog import PatientCatalog
+from senaite.patient.interfaces import IMRNRegistry
+from senaite.patient.mrnregistry import MRNRegistry
+from senaite.patient.walker import BatchWalker
 from zope.component import getUtility
 
 PROFILE_ID = "profile-{}:default".format(PRODUCT_NAME)
@@ -45,6 +50,7 @@ CATALOGS = (
 INDEXES = [
     (SAMPLE_CATALOG, "is_temporary_mrn", "", "BooleanIndex"),
     (SAMPLE_CATALOG, "medical_record_number", "", "KeywordIndex"),
+    (SAMPLE_CATALOG, "patient_uid", "", "FieldIndex"),
 ]
 
 # Tuples of (catalog, column_name)
@@ -52,6 +58,7 @@ COLUMNS = [
     (SAMPLE_CATALOG, "isMedicalRecordTemporary"),
     (SAMPLE_CATALOG, "getMedicalRecordNumberValue"),
     (SAMPLE_CATALOG, "getPatientFullName"),
+    (SAMPLE_CATALOG, "getPatientUID"),
 ]
 
 NAVTYPES = [
@@ -175,6 +182,9 @@ def setup_handler(context):
     # Setup catalogs
     setup_catalogs(portal)
 
+    # Setup the registry of medical record numbers
+    setup_mrn_registry(portal)
+
     # Apply ID format to content types
     setup_id_formatting(portal)
 
@@ -220,6 +230,10 @@ def post_uninstall(portal_setup):
     context = portal_setup._getImportContext(profile_id)  # noqa
     portal = context.getSite()  # noqa
 
+    # remove the registry of medical record numbers
+    sm = portal.getSiteManager()
+    sm.unregisterUtility(provided=IMRNRegistry)
+
     logger.info("{} uninstall handler [DONE]".format(PRODUCT_NAME.upper()))
 
 
@@ -230,6 +244,29 @@ def setup_catalogs(portal):
     setup_other_catalogs(portal, indexes=INDEXES, columns=COLUMNS)
 
 
+def setup_mrn_registry(portal):
+    """Creates the registry of medical record numbers as a local utility and
+    registers the MRNs of the existing patients
+    """
+    logger.info("Setup MRN registry ...")
+    sm = portal.getSiteManager()
+    registry = sm.queryUtility(IMRNRegistry)
+    if registry is None:
+        sm.registerUtility(MRNRegistry(), IMRNRegistry)
+        registry = sm.getUtility(IMRNRegistry)
+
+    query = {"portal_type": "Patient"}
+    walker = BatchWalker(PATIENT_CATALOG, query, "setup_mrn_registry")
+    for brain in walker:
+        mrn = normalize_mrn(brain.mrn or "")
+        if not mrn:
+            continue
+        if not registry.register(mrn, brain.UID):
+            logger.warn("MRN '{}' of {} is registered for another patient"
+                        .format(mrn, brain.getPath()))
+    logger.info("Setup MRN registry [DONE]")
+
+
 def add_patient_folder(portal):
     """Adds the initial Patient folder
     """
@@ -19,18 +19,35 @@
 # Some rights reserved, see README and LICENSE.
 
 from bika.lims import api
+from senaite.core.api import dtime
 from senaite.core.behaviors import IClientShareableBehavior
 from senaite.patient import api as patient_api
 from senaite.patient import check_installed
 from senaite.patient import logger
+from senaite.patient.instrumentation import instrument
+from senaite.patient.samplestats import remove_sample_stats
+from senaite.patient.samplestats import update_sample_stats
+from senaite.patient.settings import get_settings
+from senaite.patient.txqueue import TransactionQueue
+
+# Sample attribute where the fingerprint of the values the dynamic results
+# ranges depend on is stored
+RANGES_FINGERPRINT = "_patient_ranges_fingerprint"
 
 
 @check_installed(None)
+@instrument("subscribers.on_sample_created")
 def on_object_created(instance, event):
     """Event handler when a sample was created
     """
+    # results ranges are calculated on creation already
+    set_ranges_fingerprint(instance)
+
     patient = update_patient(instance)
 
+    # count the sample in the statistics of the patient
+    transitioned_samples.add(instance)
+
     # no patient created when the MRN is temporary
     if not patient:
         return
@@ -41,8 +58,7 @@ def on_object_created(instance, event):
         add_cc_email(instance, email)
 
     # share patient with sample's client users if necessary
-    reg_key = "senaite.patient.share_patients"
-    if api.get_registry_record(reg_key, default=False):
+    if get_settings().share_patients:
         client_uid = api.get_uid(instance.getClient())
         behavior = IClientShareableBehavior(patient)
         # Note we get Raw clients because if current user is a Client, she/he
@@ -55,12 +71,60 @@ def on_object_created(instance, event):
 
 
 @check_installed(None)
+@instrument("subscribers.on_sample_edited")
 def on_object_edited(instance, event):
     """Event handler when a sample was edited
+
+    A single save can fire several modified events for the same sample, so
+    the sample is queued and updated only once, before the transaction commits
     """
-    update_patient(instance)
-    # update results ranges so dynamic specs are recalculated
-    update_results_ranges(instance)
+    edited_samples.add(instance)
+
+
+@instrument("subscribers.update_edited_sample")
+def on_sample_edited(sample):
+    """Updates the patient and the results ranges of an edited sample
+    """
+    update_patient(sample)
+    # the sample might be linked to another patient now
+    update_sample_stats(sample)
+    # update results ranges so dynamic specs are recalculated, but only if the
+    # values they depend on changed
+    if set_ranges_fingerprint(sample):
+        update_results_ranges(sample)
+
+
+# Samples edited in the current transaction
+edited_samples = TransactionQueue("edited_samples", on_sample_edited)
+
+
+@check_installed(None)
+@instrument("subscribers.on_sample_transitioned")
+def on_object_transitioned(instance, event):
+    """Event handler when a sample was transitioned
+
+    The sample is queued, so the sample statistics of the patient are updated
+    only once, before the transaction commits
+    """
+    transitioned_samples.add(instance)
+
+
+# Samples created or transitioned in the current transaction
+transitioned_samples = TransactionQueue(
+    "transitioned_samples", update_sample_stats)
+
+
+@check_installed(None)
+@instrument("subscribers.on_sample_removed")
+def on_object_removed(instance, event):
+    """Event handler when a sample was removed
+
+    The sample is removed from the statistics of the patient it is counted
+    for, and is not updated anymore when the transaction commits
+    """
+    edited_samples.discard(instance)
+    transitioned_samples.discard(instance)
+    remove_sample_stats(instance)
 
 
 def add_cc_email(sample, email):
@@ -78,13 +142,28 @@ def add_cc_email(sample, email):
 
 
 def update_patient(instance):
+    """Links the sample to the patient with the MRN of the sample. The patient
+    is created if it does not exist yet
+    """
+    patient = get_or_create_patient(instance)
+    if patient_api.link_sample_patient(instance, patient):
+        instance.reindexObject(idxs=["patient_uid"])
+    return patient
+
+
+def get_or_create_patient(instance):
+    """Returns the patient with the MRN of the sample or creates a new one
+    """
     if instance.isMedicalRecordTemporary():
         return
     mrn = instance.getMedicalRecordNumberValue()
     # Allow empty value when patients are not required for samples
     if mrn is None:
         return
-    patient = patient_api.get_patient_by_mrn(mrn, include_inactive=True)
+    # the linked patient is kept, unless the MRN of the sample changed
+    patient = patient_api.get_sample_patient(instance, include_inactive=True)
+    if patient is None or patient.getMRN() != patient_api.normalize_mrn(mrn):
+        patient = patient_api.get_patient_by_mrn(mrn, include_inactive=True)
     # Create a new patient
     if patient is None:
         if patient_api.is_patient_allowed_in_client():
@@ -155,3 +234,27 @@ def update_results_ranges(sample):
     if spec:
         ranges = spec.getResultsRange()
         sample.setResultsRange(ranges, recursive=False)
+
+
+def get_ranges_fingerprint(sample):
+    """Returns a tuple with the values of the sample the dynamic results ranges
+    depend on: sex, date of birth and date sampled
+    """
+    sex = sample.getField("Sex").get(sample)
+    dob_field = sample.getField("DateOfBirth")
+    dob = dob_field.get_date_of_birth(sample)
+    sampled = sample.getDateSampled()
+    return (sex or "", dtime.to_ansi(dob), dtime.to_ansi(sampled))
+
+
+def set_ranges_fingerprint(sample):
+    """Stores the fingerprint of the values the dynamic results ranges of the
+    sample depend on
+
+    :returns: True if the fingerprint changed, False otherwise
+    """
+    fingerprint = get_ranges_fingerprint(sample)
+    if getattr(sample, RANGES_FINGERPRINT, None) == fingerprint:
+        return False
+    setattr(sample, RANGES_FINGERPRINT, fingerprint)
+    return True
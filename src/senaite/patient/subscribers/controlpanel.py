@@ -19,10 +19,22 @@
 # Some rights reserved, see README and LICENSE.
 
 from senaite.patient.api import allow_patients_in_clients
+from senaite.patient.settings import REGISTRY_PREFIX
+from senaite.patient.settings import invalidate_settings
 
 
 def on_patient_settings_changed(object, event):
     """Event handler when the patient settings changed
     """
+    invalidate_settings()
     allow = object.allow_patients_in_clients
     allow_patients_in_clients(allow)
+
+
+def on_registry_record_changed(event):
+    """Event handler when a registry record was added, modified or removed
+    """
+    name = getattr(event.record, "__name__", "") or ""
+    if not name.startswith("{}.".format(REGISTRY_PREFIX)):
+        return
+    invalidate_settings()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+from senaite.patient.api import invalidate_mrn_cache
+from senaite.patient.api import is_patient_propagation_enabled
+from senaite.patient.api import register_mrn
+from senaite.patient.api import unregister_mrn
+from senaite.patient.importer import is_importing
+from senaite.patient.propagation import on_patient_demographics_changed
+from senaite.patient.propagation import store_demographics
+from senaite.patient.txqueue import TransactionQueue
+from zope.lifecycleevent.interfaces import IObjectAddedEvent
+from zope.lifecycleevent.interfaces import IObjectRemovedEvent
+
+
+def on_patient_changed(instance, event):
+    """Event handler when a patient was added, modified, moved, removed or
+    transitioned. Discards the patient from the MRN lookup cache and updates
+    the MRN registry
+    """
+    if IObjectAddedEvent.providedBy(event):
+        # baseline the changes propagated to the samples are compared with
+        store_demographics(instance)
+    if is_importing():
+        # the importer registers the MRNs of the new patients
+        return
+    invalidate_mrn_cache(instance, instance.getMRN())
+    if IObjectRemovedEvent.providedBy(event):
+        unregister_mrn(instance)
+    else:
+        register_mrn(instance)
+
+
+def on_patient_modified(instance, event):
+    """Event handler when a patient was modified
+
+    If enabled in the settings, the patient is queued so the changes of its
+    demographics are propagated to its open samples once, before the
+    transaction commits
+    """
+    if not is_patient_propagation_enabled():
+        return
+    modified_patients.add(instance)
+
+
+modified_patients = TransactionQueue(
+    "modified_patients", on_patient_demographics_changed)
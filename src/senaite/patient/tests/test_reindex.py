@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+"""Partitioned reindexing with worker processes against a ZEO server with a
+FileStorage
+"""
+
+import os
+import shutil
+import tempfile
+from multiprocessing import Process
+
+import transaction
+import unittest2 as unittest
+import ZEO
+from OFS.Folder import Folder
+from OFS.SimpleItem import SimpleItem
+from persistent.mapping import PersistentMapping
+from Products.PluginIndexes.FieldIndex.FieldIndex import FieldIndex
+from Products.PluginIndexes.UUIDIndex.UUIDIndex import UUIDIndex
+from Products.ZCatalog.ZCatalog import ZCatalog
+from senaite.patient.reindex import PartitionReindexer
+from senaite.patient.reindex import get_job_progress
+from senaite.patient.reindex import get_partition
+from senaite.patient.reindex import is_job_done
+from senaite.patient.reindex import iter_partition
+from senaite.patient.reindex import new_progress
+
+SIZE = 300
+PARTITIONS = 3
+
+
+class Item(SimpleItem):
+
+    def __init__(self, id, uid):
+        self.id = id
+        self.UID = uid
+        self.color = "red"
+
+
+def reindex(address, partition, batch_size=10):
+    """Reindexes the partition with its own connection to the ZEO server
+    """
+    db = ZEO.DB(address)
+    try:
+        connection = db.open()
+        root = connection.root()
+        catalog = root["site"].catalog
+        progress = root["job"][partition]
+        reindexer = PartitionReindexer(catalog, partition, PARTITIONS,
+                                       progress, idxs=["color"],
+                                       update_metadata=False,
+                                       batch_size=batch_size)
+        reindexer()
+        connection.close()
+    finally:
+        db.close()
+
+
+class PartitionReindexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        path = os.path.join(self.tmpdir, "Data.fs")
+        self.address, self.stop = ZEO.server(path=path, threaded=False)
+
+        db = ZEO.DB(self.address)
+        connection = db.open()
+        root = connection.root()
+        site = root["site"] = Folder("site")
+        site._setObject("catalog", ZCatalog("catalog"))
+        catalog = site.catalog
+        catalog.addIndex("UID", UUIDIndex("UID"))
+        catalog.addIndex("color", FieldIndex("color"))
+        for num in range(SIZE):
+            item_id = "item-{}".format(num)
+            site._setObject(item_id, Item(item_id, "uid-{:04d}".format(num)))
+            catalog.catalog_object(site[item_id], uid=item_id)
+
+        # change the values without reindexing
+        for num in range(SIZE):
+            site["item-{}".format(num)].color = "blue"
+
+        job = root["job"] = PersistentMapping()
+        for partition in range(PARTITIONS):
+            job[partition] = new_progress()
+        transaction.commit()
+        connection.close()
+        db.close()
+
+    def tearDown(self):
+        self.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def open(self):
+        db = ZEO.DB(self.address)
+        self.addCleanup(db.close)
+        connection = db.open()
+        self.addCleanup(connection.close)
+        return connection.root()
+
+    def test_partitions(self):
+        uids = ["uid-{:04d}".format(num) for num in range(SIZE)]
+        partitions = [get_partition(uid, PARTITIONS) for uid in uids]
+        self.assertEqual(set(partitions), set(range(PARTITIONS)))
+
+        catalog = self.open()["site"].catalog
+        found = []
+        for partition in range(PARTITIONS):
+            items = list(iter_partition(catalog, partition, PARTITIONS))
+            found.extend([uid for uid, rid in items])
+        self.assertEqual(sorted(found), uids)
+
+    def test_reindex_in_parallel(self):
+        workers = [Process(target=reindex, args=(self.address, partition))
+                   for partition in range(PARTITIONS)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(120)
+        self.assertEqual([worker.exitcode for worker in workers],
+                         [0] * PARTITIONS)
+
+        root = self.open()
+        catalog = root["site"].catalog
+        self.assertEqual(len(catalog(color="blue")), SIZE)
+        self.assertEqual(len(catalog(color="red")), 0)
+        self.assertTrue(is_job_done(root["job"]))
+        self.assertEqual(get_job_progress(root["job"]), (SIZE, SIZE))
+
+    def test_resume(self):
+        root = self.open()
+        catalog = root["site"].catalog
+        progress = root["job"][0]
+        items = list(iter_partition(catalog, 0, PARTITIONS))
+
+        # the first batch was committed already
+        progress["uid"] = items[9][0]
+        progress["processed"] = 10
+        transaction.commit()
+
+        reindex(self.address, 0)
+        transaction.abort()
+        self.assertTrue(progress["done"])
+        self.assertEqual(progress["processed"], len(items))
+        # objects of the first batch are not reindexed again
+        self.assertEqual(len(catalog(color="blue")), len(items) - 10)
+
+
+def test_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(PartitionReindexTestCase))
+    return suite
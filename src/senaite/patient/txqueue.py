@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+
+from collections import OrderedDict
+
+import transaction
+from bika.lims import api
+
+
+class TransactionQueue(object):
+    """Collects objects during a transaction and processes each of them once,
+    right before the transaction is committed
+
+    The queued objects are kept in the transaction itself, so they are
+    discarded when the transaction is aborted
+    """
+
+    def __init__(self, name, handler):
+        self.name = name
+        self.handler = handler
+
+    def __repr__(self):
+        return "<TransactionQueue '{}'>".format(self.name)
+
+    def get_queue(self, txn=None):
+        """Returns the ordered mapping of UID -> object queued in the
+        transaction, or None if nothing was queued
+        """
+        if txn is None:
+            txn = transaction.get()
+        try:
+            return txn.data(self)
+        except KeyError:
+            return None
+
+    def add(self, obj):
+        """Queues the object to be processed before the transaction commits.
+        Objects that are queued already are not added again
+        """
+        txn = transaction.get()
+        queue = self.get_queue(txn)
+        if queue is None:
+            queue = OrderedDict()
+            txn.set_data(self, queue)
+            txn.addBeforeCommitHook(self.process, args=(txn, ))
+        uid = api.get_uid(obj)
+        if uid not in queue:
+            queue[uid] = obj
+
+    def discard(self, obj):
+        """Removes the object from the queue of the current transaction
+        """
+        queue = self.get_queue()
+        if queue:
+            queue.pop(api.get_uid(obj), None)
+
+    def process(self, txn=None):
+        """Calls the handler once for every object queued in the transaction
+
+        The queue is detached from the transaction before the handlers are
+        called, so objects queued from now on, e.g. by the handlers or by
+        other before-commit hooks, are processed by a new hook
+        """
+        if txn is None:
+            txn = transaction.get()
+        queue = self.get_queue(txn)
+        if not queue:
+            return
+        txn.set_data(self, None)
+        for obj in queue.values():
+            self.handler(obj)
+
+    def flush(self):
+        """Processes the objects queued in the current transaction now
+        """
+        self.process(transaction.get())
@@ -18,7 +18,6 @@
 # Copyright 2020-2024 by it's authors.
 # Some rights reserved, see README and LICENSE.
 
-import transaction
 from bika.lims import api
 from bika.lims.api import snapshot
 from bika.lims.interfaces import IAuditable
@@ -39,6 +38,7 @@ from senaite.patient.api import patient_search
 from senaite.patient.catalog import PATIENT_CATALOG
 from senaite.patient.config import PRODUCT_NAME
 from senaite.patient.setuphandlers import setup_catalogs
+from senaite.patient.walker import BatchWalker
 from zope.annotation.interfaces import IAnnotations
 from zope.interface import alsoProvides
 from zope.interface import noLongerProvides
@@ -151,12 +151,8 @@ def fix_samples_middlename(tool):
     """
     logger.info("Fix samples middle name ...")
     query = {"portal_type": "AnalysisRequest"}
-    brains = api.search(query, SAMPLE_CATALOG)
-    total = len(brains)
-    for num, brain in enumerate(brains):
-        if num > 0 and num % 100 == 0:
-            logger.info("Fix samples middle name: {}/{}".format(num, total))
-
+    walker = BatchWalker(SAMPLE_CATALOG, query, "fix_samples_middlename")
+    for brain in walker:
         obj = api.get_object(brain)
         brain_fullname = brain.getPatientFullName
         try:
@@ -182,16 +178,9 @@ def fix_samples_without_middlename(tool):
     """
     logger.info("Fix samples without middle name ...")
     query = {"portal_type": "AnalysisRequest"}
-    brains = api.search(query, SAMPLE_CATALOG)
-    total = len(brains)
-    for num, brain in enumerate(brains):
-        if num and num % 100 == 0:
-            logger.info("Processed objects: {}/{}".format(num, total))
-
-        if num and num % 1000 == 0:
-            # reduce memory size of the transaction
-            transaction.savepoint()
-
+    walker = BatchWalker(SAMPLE_CATALOG, query,
+                         "fix_samples_without_middlename")
+    for brain in walker:
         obj = api.get_object(brain)
         field = obj.getField("PatientFullName")
         value = field.get(obj)
@@ -261,24 +250,17 @@ def update_patient_workflows(tool):
     patientsfolder.reindexObject(idxs=["allowedRolesAndUsers"])
 
     # fetch patients + workflow
-    patients = api.search({"portal_type": "Patient"}, PATIENT_CATALOG)
-    total = len(patients)
+    query = {"portal_type": "Patient"}
+    walker = BatchWalker(PATIENT_CATALOG, query, "update_patient_workflows")
     patient_workflow = wf_tool.getWorkflowById(PATIENT_WORKFLOW)
 
-    for num, patient in enumerate(patients):
-        obj = api.get_object(patient)
-        logger.info("Processing patient %s/%s: %s"
-                    % (num+1, total, obj.Title()))
+    for brain in walker:
+        obj = api.get_object(brain)
 
         # update rolemappings + object security for patient
         patient_workflow.updateRoleMappingsFor(obj)
         obj.reindexObject(idxs=["allowedRolesAndUsers"])
 
-        if num and num % 10 == 0:
-            logger.info("Commiting patient %s/%s" % (num+1, total))
-            transaction.commit()
-            logger.info("Commit done")
-
         # Flush the object from memory
         obj._p_deactivate()
 
@@ -366,18 +348,9 @@ def migrate_date_of_birth_field(tool):
     age_seleted_attr = "_AgeDoBWidget_age_selected"
     dob_estimated_attr = "_AgeDoBWidget_dob_estimated"
 
-    uc = api.get_tool("uid_catalog")
-    brains = uc(portal_type="AnalysisRequest")
-    total = len(brains)
-
-    for num, brain in enumerate(brains):
-        if num and num % 100 == 0:
-            logger.info("Migrated {0}/{1} fields".format(num, total))
-
-        if num and num % 1000 == 0:
-            # reduce memory size of the transaction
-            transaction.savepoint()
-
+    query = {"portal_type": "AnalysisRequest"}
+    walker = BatchWalker(SAMPLE_CATALOG, query, "migrate_date_of_birth_field")
+    for brain in walker:
         try:
             obj = api.get_object(brain)
         except AttributeError:
@@ -424,18 +397,9 @@ def update_naive_tz_dobs(tool):
     """
     logger.info("Updating timezone-naive dates of birth ...")
 
-    uc = api.get_tool("uid_catalog")
-    brains = uc(portal_type="AnalysisRequest")
-    total = len(brains)
-
-    for num, brain in enumerate(brains):
-        if num and num % 100 == 0:
-            logger.info("Migrated {0}/{1} fields".format(num, total))
-
-        if num and num % 1000 == 0:
-            # reduce memory size of the transaction
-            transaction.savepoint()
-
+    query = {"portal_type": "AnalysisRequest"}
+    walker = BatchWalker(SAMPLE_CATALOG, query, "update_naive_tz_dobs")
+    for brain in walker:
         try:
             obj = api.get_object(brain)
         except AttributeError:
@@ -559,18 +523,9 @@ def remove_whitespaces_mrn(tool):
     """
     logger.info("Removing lead and trailing whitespaces from MRN ...")
 
-    uc = api.get_tool("uid_catalog")
-    brains = uc(portal_type="AnalysisRequest")
-    total = len(brains)
-
-    for num, brain in enumerate(brains):
-        if num and num % 100 == 0:
-            logger.info("Migrated {0}/{1} fields".format(num, total))
-
-        if num and num % 1000 == 0:
-            # reduce memory size of the transaction
-            transaction.savepoint()
-
+    query = {"portal_type": "AnalysisRequest"}
+    walker = BatchWalker(SAMPLE_CATALOG, query, "remove_whitespaces_mrn")
+    for brain in walker:
         try:
             obj = api.get_object(brain)
         except AttributeError:
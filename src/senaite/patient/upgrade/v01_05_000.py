@@ -18,11 +18,27 @@
 # Copyright 2020-2024 by it's authors.
 # Some rights reserved, see README and LICENSE.
 
+from Acquisition import aq_base
+from bika.lims import api
+from senaite.core.catalog import SAMPLE_CATALOG
+from senaite.core.setuphandlers import add_catalog_column
+from senaite.core.setuphandlers import add_catalog_index
 from senaite.core.upgrade import upgradestep
 from senaite.core.upgrade.utils import UpgradeUtils
 from senaite.patient import logger
+from senaite.patient.api import get_patient_by_mrn
+from senaite.patient.api import get_patient_catalog
+from senaite.patient.api import link_sample_patient
+from senaite.patient.api import update_metadata_columns
+from senaite.patient.catalog import PATIENT_CATALOG
 from senaite.patient.config import PRODUCT_NAME
+from senaite.patient.propagation import DEMOGRAPHICS_KEY
+from senaite.patient.propagation import store_demographics
+from senaite.patient.samplestats import STATS_INDEXES
+from senaite.patient.samplestats import update_sample_stats
 from senaite.patient.setuphandlers import setup_catalogs
+from senaite.patient.setuphandlers import setup_mrn_registry
+from senaite.patient.walker import BatchWalker
 
 version = "1.5.0"
 profile = "profile-{0}:default".format(PRODUCT_NAME)
@@ -69,3 +85,167 @@ def import_registry(tool):
     setup = portal.portal_setup
     setup.runImportStepFromProfile(profile, "plone.app.registry")
     logger.info("Reimport registry tool [DONE]")
+
+
+def setup_patient_propagation(tool):
+    """Imports the setting to propagate patient changes to samples and stores
+    the current demographics of the existing patients, so their first change
+    is compared with them
+    """
+    logger.info("Setup patient changes propagation ...")
+    import_registry(tool)
+
+    query = {"portal_type": "Patient"}
+    walker = BatchWalker(PATIENT_CATALOG, query, "setup_patient_propagation")
+    for brain in walker:
+        obj = api.get_object(brain)
+        if getattr(aq_base(obj), DEMOGRAPHICS_KEY, None) is None:
+            store_demographics(obj)
+
+        # flush the object from memory
+        obj._p_deactivate()
+
+    logger.info("Setup patient changes propagation [DONE]")
+
+
+def reindex_patient_metadata(tool):
+    """Adds the new metadata columns to the patient catalog and populates them
+    for existing patients, so the patients listing can be rendered from the
+    catalog brains without waking up the patient objects
+    """
+    logger.info("Reindex patient metadata ...")
+    portal = tool.aq_inner.aq_parent
+    # setup patient catalog to add new columns
+    setup_catalogs(portal)
+
+    catalog = get_patient_catalog()
+    query = {"portal_type": "Patient"}
+    walker = BatchWalker(catalog, query, "reindex_patient_metadata")
+    for brain in walker:
+        obj = api.get_object(brain)
+        # update the metadata only, the "UID" index does not change
+        catalog.catalog_object(obj, uid=brain.getPath(), idxs=["UID"],
+                               update_metadata=1)
+
+        # flush the object from memory
+        obj._p_deactivate()
+
+    logger.info("Reindex patient metadata [DONE]")
+
+
+def setup_mrn_registry_utility(tool):
+    """Creates the registry of medical record numbers and registers the MRNs
+    of the existing patients
+    """
+    portal = tool.aq_inner.aq_parent
+    setup_mrn_registry(portal)
+
+
+def reindex_patient_names(tool):
+    """Adds the indexes for the fuzzy search of patients by name to the
+    patient catalog and indexes the names of the existing patients
+    """
+    logger.info("Reindex patient names ...")
+    portal = tool.aq_inner.aq_parent
+    # setup patient catalog to add new indexes
+    setup_catalogs(portal)
+
+    catalog = get_patient_catalog()
+    query = {"portal_type": "Patient"}
+    walker = BatchWalker(catalog, query, "reindex_patient_names")
+    for brain in walker:
+        obj = api.get_object(brain)
+        catalog.catalog_object(obj, uid=brain.getPath(),
+                               idxs=["patient_name_trigrams",
+                                     "patient_name_phonetic"],
+                               update_metadata=0)
+
+        # flush the object from memory
+        obj._p_deactivate()
+
+    logger.info("Reindex patient names [DONE]")
+
+
+def get_sample_patient_by_mrn(sample):
+    """Returns the existing patient with the MRN of the sample or None
+    """
+    if sample.isMedicalRecordTemporary():
+        return None
+    mrn = sample.getMedicalRecordNumberValue()
+    if not mrn:
+        return None
+    try:
+        return get_patient_by_mrn(mrn, include_inactive=True)
+    except ValueError as exc:
+        logger.warn("Sample {} not linked: {}".format(
+            api.get_path(sample), exc))
+        return None
+
+
+def link_samples_to_patients(tool):
+    """Adds the index and metadata column of the linked patient UID to the
+    sample catalog and stores the UID of the patient in the existing samples
+    """
+    logger.info("Link samples to patients ...")
+    catalog = api.get_tool(SAMPLE_CATALOG)
+    # add the index and the column without reindexing all samples, they are
+    # populated while the samples are linked
+    add_catalog_index(catalog, "patient_uid", "", "FieldIndex")
+    add_catalog_column(catalog, "getPatientUID")
+
+    query = {"portal_type": "AnalysisRequest"}
+    walker = BatchWalker(catalog, query, "link_samples_to_patients")
+    for brain in walker:
+        obj = api.get_object(brain)
+        patient = get_sample_patient_by_mrn(obj)
+        if patient is None:
+            # keep the sample unlinked, so it is still resolved by its MRN
+            # once a patient with this MRN is created
+            obj._p_deactivate()
+            continue
+
+        link_sample_patient(obj, patient)
+        catalog.catalog_object(obj, uid=brain.getPath(), idxs=["patient_uid"],
+                               update_metadata=0)
+        update_metadata_columns(catalog, obj, ["getPatientUID"])
+
+        # flush the object from memory
+        obj._p_deactivate()
+
+    logger.info("Link samples to patients [DONE]")
+
+
+def setup_patient_sample_stats(tool):
+    """Adds the indexes and metadata columns of the sample statistics to the
+    patient catalog and calculates the statistics of the existing patients
+    from their samples, in batches
+    """
+    logger.info("Setup patient sample statistics ...")
+    portal = tool.aq_inner.aq_parent
+    # setup patient catalog to add new indexes and columns
+    setup_catalogs(portal)
+
+    # the statistics are updated per sample, so the memory usage does not
+    # depend on the number of samples
+    catalog = api.get_tool(SAMPLE_CATALOG)
+    query = {"portal_type": "AnalysisRequest"}
+    walker = BatchWalker(catalog, query, "setup_patient_sample_stats")
+    for brain in walker:
+        obj = api.get_object(brain)
+        update_sample_stats(obj, reindex=False)
+
+        # flush the object from memory
+        obj._p_deactivate()
+
+    catalog = get_patient_catalog()
+    query = {"portal_type": "Patient"}
+    walker = BatchWalker(catalog, query, "reindex_patient_sample_stats")
+    for brain in walker:
+        obj = api.get_object(brain)
+        catalog.catalog_object(obj, uid=brain.getPath(),
+                               idxs=list(STATS_INDEXES), update_metadata=1)
+
+        # flush the object from memory
+        obj._p_deactivate()
+
+    logger.info("Setup patient sample statistics [DONE]")
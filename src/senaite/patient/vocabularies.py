@@ -18,15 +18,16 @@
 # Copyright 2020-2024 by it's authors.
 # Some rights reserved, see README and LICENSE.
 
+from plone.api.portal import get_current_language
 from senaite.core.api.geo import get_countries
 from senaite.patient.config import GENDERS
 from senaite.patient.config import NAME_ENTRY_MODES
 from senaite.patient.config import SEXES
+from senaite.patient.settings import get_settings
 from zope.interface import implementer
 from zope.schema.interfaces import IVocabularyFactory
 from zope.schema.vocabulary import SimpleTerm
 from zope.schema.vocabulary import SimpleVocabulary
-from bika.lims import api
 
 
 def to_simple_vocabulary(items):
@@ -37,50 +38,96 @@ def to_simple_vocabulary(items):
 
 
 @implementer(IVocabularyFactory)
-class IdentifierVocabulary(object):
+class SettingsVocabulary(object):
+    """Vocabulary factory for key/value records of the patient settings
 
-    def __call__(self, context):
+    The vocabulary is built once and shared until the records change, so it
+    must not be modified by the callers
+    """
+    # name of the patient setting that holds the records
+    setting = None
 
-        identifiers = api.get_registry_record("senaite.patient.identifiers")
+    def __init__(self):
+        self._cache = (None, None)
 
+    def __call__(self, context):
+        records = getattr(get_settings(), self.setting) or ()
+        cached_records, vocabulary = self._cache
+        if cached_records is not records:
+            vocabulary = self.get_vocabulary(records)
+            self._cache = (records, vocabulary)
+        return vocabulary
+
+    def get_vocabulary(self, records):
         items = []
-        for identifier in identifiers:
+        for record in records:
             # note: the key will get the submitted value
-            keyword = identifier.get("key")
-            title = identifier.get("value")
+            keyword = record.get("key")
+            title = record.get("value")
             # value, token, title
             term = SimpleTerm(keyword, keyword, title)
             items.append(term)
         return SimpleVocabulary(items)
 
 
-IdentifierVocabularyFactory = IdentifierVocabulary()
+@implementer(IVocabularyFactory)
+class StaticVocabulary(object):
+    """Vocabulary factory for a fixed list of (value, title) tuples
 
+    The vocabulary is built once per cache key, so it must not be modified by
+    the callers
+    """
+    # list of (value, title) tuples
+    items = ()
 
-@implementer(IVocabularyFactory)
-class SexVocabulary(object):
+    def __init__(self):
+        self._vocabularies = {}
 
     def __call__(self, context):
-        return to_simple_vocabulary(SEXES)
+        key = self.get_cache_key(context)
+        vocabulary = self._vocabularies.get(key)
+        if vocabulary is None:
+            vocabulary = self.get_vocabulary()
+            self._vocabularies[key] = vocabulary
+        return vocabulary
 
+    def get_cache_key(self, context):
+        """Returns the key the vocabulary is cached with
+        """
+        return None
 
-SexVocabularyFactory = SexVocabulary()
+    def get_vocabulary(self):
+        return to_simple_vocabulary(self.items)
 
 
-@implementer(IVocabularyFactory)
-class GenderVocabulary(object):
+class IdentifierVocabulary(SettingsVocabulary):
+    setting = "identifiers"
 
-    def __call__(self, context):
-        return to_simple_vocabulary(GENDERS)
+
+IdentifierVocabularyFactory = IdentifierVocabulary()
+
+
+class SexVocabulary(StaticVocabulary):
+    items = SEXES
+
+
+SexVocabularyFactory = SexVocabulary()
+
+
+class GenderVocabulary(StaticVocabulary):
+    items = GENDERS
 
 
 GenderVocabularyFactory = GenderVocabulary()
 
 
-@implementer(IVocabularyFactory)
-class CountryVocabulary(object):
+class CountryVocabulary(StaticVocabulary):
 
-    def __call__(self, context):
+    def get_cache_key(self, context):
+        # the titles and their order might depend on the language
+        return get_current_language()
+
+    def get_vocabulary(self):
         items = []
         for country in get_countries():
             value = country.name
@@ -95,75 +142,29 @@ class CountryVocabulary(object):
 CountryVocabularyFactory = CountryVocabulary()
 
 
-@implementer(IVocabularyFactory)
-class NameEntryModesVocabulary(object):
-
-    def __call__(self, context):
-        return to_simple_vocabulary(NAME_ENTRY_MODES)
+class NameEntryModesVocabulary(StaticVocabulary):
+    items = NAME_ENTRY_MODES
 
 
 NameEntryModesVocabularyFactory = NameEntryModesVocabulary()
 
 
-@implementer(IVocabularyFactory)
-class RacesVocabulary(object):
-
-    def __call__(self, context):
-
-        races = api.get_registry_record("senaite.patient.races")
-
-        items = []
-        for race in races:
-            # note: the key will get the submitted value
-            keyword = race.get("key")
-            title = race.get("value")
-            # value, token, title
-            term = SimpleTerm(keyword, keyword, title)
-            items.append(term)
-        return SimpleVocabulary(items)
+class RacesVocabulary(SettingsVocabulary):
+    setting = "races"
 
 
 RacesVocabularyFactory = RacesVocabulary()
 
 
-@implementer(IVocabularyFactory)
-class EthnicitiesVocabulary(object):
-
-    def __call__(self, context):
-
-        ethnicities = api.get_registry_record("senaite.patient.ethnicities")
-
-        items = []
-        for ethnicity in ethnicities:
-            # note: the key will get the submitted value
-            keyword = ethnicity.get("key")
-            title = ethnicity.get("value")
-            # value, token, title
-            term = SimpleTerm(keyword, keyword, title)
-            items.append(term)
-        return SimpleVocabulary(items)
+class EthnicitiesVocabulary(SettingsVocabulary):
+    setting = "ethnicities"
 
 
 EthnicitiesVocabularyFactory = EthnicitiesVocabulary()
 
 
-@implementer(IVocabularyFactory)
-class MaritalStatusesVocabulary(object):
-
-    def __call__(self, context):
-
-        marital_statuses = api.get_registry_record(
-            "senaite.patient.marital_statuses")
-
-        items = []
-        for marital_status in marital_statuses:
-            # note: the key will get the submitted value
-            keyword = marital_status.get("key")
-            title = marital_status.get("value")
-            # value, token, title
-            term = SimpleTerm(keyword, keyword, title)
-            items.append(term)
-        return SimpleVocabulary(items)
+class MaritalStatusesVocabulary(SettingsVocabulary):
+    setting = "marital_statuses"
 
 
 MaritalStatusesVocabularyFactory = MaritalStatusesVocabulary()
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.PATIENT.
+#
+# SENAITE.PATIENT is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2020-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+"""Resumable walker over the results of a catalog query
+
+Upgrade steps that have to process a large number of objects iterate the
+results in the order of their UIDs and set a savepoint every N objects, so
+the memory usage stays low while the whole step runs in one transaction.
+
+Maintenance jobs run from the command line are resumable instead: they commit
+the transaction every N objects and persist the UID of the last object
+processed. A job that is interrupted continues after that UID when it runs
+again.
+"""
+
+import time
+from datetime import timedelta
+
+import transaction
+from Acquisition import aq_base
+from BTrees.IIBTree import IITreeSet
+from bika.lims import api
+from persistent.mapping import PersistentMapping
+from Products.CMFCore.indexing import processQueue
+from senaite.patient import logger
+from six import string_types
+from zope.annotation.interfaces import IAnnotations
+
+# Portal annotation key of the checkpoint of a job
+CHECKPOINT_KEY = "senaite.patient.walker.{}"
+
+
+def format_eta(seconds):
+    """Returns the seconds as a H:MM:SS string
+    """
+    return str(timedelta(seconds=int(seconds)))
+
+
+class BatchWalker(object):
+    """Iterates the catalog brains of a query in the order of their UIDs
+
+    A savepoint is set every `commit_size` brains and the ZODB cache is
+    minimized afterwards, so the memory usage does not depend on the number
+    of results. Nothing is committed, so an upgrade step that fails halfway
+    does not leave a partially migrated site behind.
+
+    With `resumable=True`, the transaction is committed instead, together
+    with a checkpoint of the job. The checkpoint is removed once all brains
+    were processed. This is meant for jobs run from the command line only.
+
+    Usage:
+
+        walker = BatchWalker(catalog, query, "my_job")
+        for brain in walker:
+            obj = api.get_object(brain)
+            ...
+
+    The object of the brain is processed before the next brain is requested,
+    so it is safe to commit then.
+    """
+
+    def __init__(self, catalog, query, job_id, commit_size=1000,
+                 log_size=100, resumable=False):
+        if commit_size < 1 or log_size < 1:
+            raise ValueError("Batch sizes must be greater than 0")
+        if isinstance(catalog, string_types):
+            catalog = api.get_tool(catalog)
+        self.catalog = catalog
+        self.query = query
+        self.job_id = job_id
+        self.commit_size = commit_size
+        self.log_size = log_size
+        self.resumable = resumable
+        self.total = 0
+        self.processed = 0
+        self.offset = 0
+        self.start = None
+
+    @property
+    def checkpoint_key(self):
+        return CHECKPOINT_KEY.format(self.job_id)
+
+    def get_checkpoint(self):
+        """Returns the persistent checkpoint of the job, created if necessary
+
+        The checkpoint keeps the UID of the last processed brain and the
+        number of brains processed so far. It is only persisted for resumable
+        jobs
+        """
+        if not self.resumable:
+            return {"uid": None, "processed": 0}
+        annotations = IAnnotations(api.get_portal())
+        checkpoint = annotations.get(self.checkpoint_key)
+        if checkpoint is None:
+            checkpoint = PersistentMapping()
+            checkpoint["uid"] = None
+            checkpoint["processed"] = 0
+            annotations[self.checkpoint_key] = checkpoint
+        return checkpoint
+
+    def remove_checkpoint(self):
+        """Removes the checkpoint of the job
+        """
+        if not self.resumable:
+            return
+        annotations = IAnnotations(api.get_portal())
+        annotations.pop(self.checkpoint_key, None)
+
+    def get_rids(self):
+        """Returns a tree set with the record ids of the query results, or of
+        all catalogued objects if the query is empty
+        """
+        # index the pending objects first, as the catalog does before searching
+        processQueue()
+        if not self.query:
+            return IITreeSet(self.catalog._catalog.paths.keys())
+        results = self.catalog(self.query)
+        rids = getattr(results, "_seq", None)
+        if rids is None:
+            rids = [brain.getRID() for brain in results]
+        return IITreeSet(rids)
+
+    def iter_rids(self, rids, after=None):
+        """Generator of (UID, record id) of the results in the order of their
+        UIDs, starting after the given UID
+        """
+        index = self.catalog._catalog.getIndex("UID")
+        forward = aq_base(index)._index
+        # the range search starts right after the UID in the tree, without
+        # iterating the UIDs before
+        items = forward.items(min=after, excludemin=after is not None)
+        for uid, rid in items:
+            if rid in rids:
+                yield uid, rid
+
+    def __len__(self):
+        return self.total
+
+    def __iter__(self):
+        checkpoint = self.get_checkpoint()
+        rids = self.get_rids()
+        self.total = len(rids)
+        self.offset = self.processed = checkpoint["processed"]
+        self.start = time.time()
+        if checkpoint["uid"]:
+            logger.info("{}: resuming after {} of {} objects"
+                        .format(self.job_id, self.offset, self.total))
+
+        uid = checkpoint["uid"]
+        while True:
+            # start a new iteration of the index after every batch, the
+            # buckets might have been invalidated or ghosted meanwhile
+            num = 0
+            for num, (uid, rid) in enumerate(self.iter_rids(rids, uid),
+                                             start=1):
+                yield self.catalog._catalog[rid]
+                self.processed += 1
+                if self.processed % self.log_size == 0:
+                    self.log_progress()
+                if num == self.commit_size:
+                    break
+            if num < self.commit_size:
+                break
+            self.commit(checkpoint, uid)
+
+        self.remove_checkpoint()
+        if self.processed % self.log_size:
+            self.log_progress()
+        logger.info("{}: {} objects processed [DONE]"
+                    .format(self.job_id, self.processed))
+
+    def commit(self, checkpoint, uid):
+        """Commits the transaction together with the checkpoint for resumable
+        jobs, sets a savepoint otherwise
+        """
+        checkpoint["uid"] = uid
+        checkpoint["processed"] = self.processed
+        if self.resumable:
+            transaction.commit()
+        else:
+            transaction.savepoint(optimistic=True)
+        self.catalog._p_jar.cacheMinimize()
+
+    def log_progress(self):
+        """Logs the number of processed objects, throughput and ETA
+        """
+        done = self.processed - self.offset
+        elapsed = time.time() - self.start
+        rate = done / elapsed if elapsed else 0.0
+        remaining = max(self.total - self.processed, 0)
+        eta = format_eta(remaining / rate) if rate else "-"
+        logger.info("{}: {}/{} objects ({:.1f} objects/s, ETA {})"
+                    .format(self.job_id, self.processed, self.total, rate,
+                            eta))